@@ -31,7 +31,7 @@ export function usePrototype() {
       }
       setState((prev) => ({ ...prev, loading: true, error: undefined }));
       try {
-        const result = await iterateProject(state.project.projectId, message);
+        const result = await iterateProject(state.project, message);
         setState({ loading: false, project: result });
         return result;
       } catch (error) {
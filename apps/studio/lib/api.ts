@@ -1,4 +1,5 @@
-import type { UIIR } from '@protoweaver/ui-ir';
+import { applyPatches } from '@protoweaver/ui-ir';
+import type { LayoutNode, UIIR, UIIRPatch } from '@protoweaver/ui-ir';
 
 export interface GenerateResponse {
   projectId: string;
@@ -10,20 +11,34 @@ export interface GenerateResponse {
   };
 }
 
+// 后端按字段名（snake_case）序列化 UI-IR。
+type ApiUIIR = Omit<UIIR, 'layoutTree' | 'createdAt' | 'dataSources'> & {
+  layout_tree: LayoutNode;
+  created_at: string;
+  data_sources: UIIR['dataSources'];
+};
+
 interface ApiResponse {
   project_id: string;
-  ui_ir: UIIR;
-  code_bundle: {
-    framework: string;
-    entry: string;
-    files: Record<string, string>;
-  };
+  ui_ir: ApiUIIR;
+  code_bundle: GenerateResponse['codeBundle'];
+}
+
+interface IterationApiResponse {
+  project_id: string;
+  revision: number;
+  patches: UIIRPatch[];
+  changed_files: Record<string, string>;
+}
+
+function mapUIIR({ layout_tree, created_at, data_sources, ...rest }: ApiUIIR): UIIR {
+  return { ...rest, layoutTree: layout_tree, createdAt: new Date(created_at), dataSources: data_sources };
 }
 
 function mapResponse(data: ApiResponse): GenerateResponse {
   return {
     projectId: data.project_id,
-    uiIR: data.ui_ir,
+    uiIR: mapUIIR(data.ui_ir),
     codeBundle: data.code_bundle,
   };
 }
@@ -41,8 +56,20 @@ export async function generatePrototype(payload: FormData): Promise<GenerateResp
   return mapResponse((await response.json()) as ApiResponse);
 }
 
-export async function iterateProject(projectId: string, message: string): Promise<GenerateResponse> {
-  const response = await fetch(`${API_BASE}/v1/projects/${projectId}/iterate`, {
+export async function getProject(projectId: string): Promise<GenerateResponse> {
+  const response = await fetch(`${API_BASE}/v1/projects/${projectId}`);
+  if (!response.ok) {
+    throw new Error(`加载失败: ${response.status}`);
+  }
+  return mapResponse((await response.json()) as ApiResponse);
+}
+
+/**
+ * 迭代只下载 UI-IR patch 与发生变化的文件，在本地应用到当前项目；
+ * 本地版本不是服务端的上一版本（例如其他会话也在修改）时重新拉取完整项目。
+ */
+export async function iterateProject(project: GenerateResponse, message: string): Promise<GenerateResponse> {
+  const response = await fetch(`${API_BASE}/v1/projects/${project.projectId}/iterate`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -52,5 +79,20 @@ export async function iterateProject(projectId: string, message: string): Promis
   if (!response.ok) {
     throw new Error(`迭代失败: ${response.status}`);
   }
-  return mapResponse((await response.json()) as ApiResponse);
+  const data = (await response.json()) as IterationApiResponse;
+  if (project.uiIR.metadata.revision !== data.revision - 1) {
+    return getProject(project.projectId);
+  }
+  return {
+    projectId: project.projectId,
+    uiIR: {
+      ...project.uiIR,
+      layoutTree: applyPatches(project.uiIR.layoutTree, data.patches),
+      metadata: { ...project.uiIR.metadata, revision: data.revision },
+    },
+    codeBundle: {
+      ...project.codeBundle,
+      files: { ...project.codeBundle.files, ...data.changed_files },
+    },
+  };
 }
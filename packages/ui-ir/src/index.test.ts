@@ -34,4 +34,19 @@ describe('ui-ir schema', () => {
     expect(findNode(patched, 'cta')?.text).toBe('立即体验');
     expect(findNode(patched, 'hero')?.text).toBe('欢迎使用 ProtoWeaver');
   });
+
+  it('inserts at the patch position and appends by default', () => {
+    const patched = applyPatches(sampleUIIR.layoutTree, [
+      { targetId: 'hero', op: 'insert', payload: { id: 'last', type: 'button' } },
+      { targetId: 'hero', op: 'insert', position: 0, payload: { id: 'first', type: 'image' } },
+    ]);
+    expect(findNode(patched, 'hero')?.children.map((child) => child.id)).toEqual(['first', 'cta', 'last']);
+  });
+
+  it('removes a node from its parent and shares untouched subtrees', () => {
+    const patched = applyPatch(sampleUIIR.layoutTree, { targetId: 'cta', op: 'remove' });
+    expect(findNode(patched, 'cta')).toBeNull();
+    expect(patched.children[1]).toBe(sampleUIIR.layoutTree.children[1]);
+    expect(() => applyPatch(patched, { targetId: 'root', op: 'remove' })).toThrow('Cannot remove the root node');
+  });
 });
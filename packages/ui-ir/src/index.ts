@@ -188,30 +188,47 @@ export const diffSchema = z.object({
 
 export type UIIRPatch = z.infer<typeof diffSchema>;
 
+/**
+ * 与后端 `apply_patch` 语义一致：insert 按 `position` 插入（缺省追加到末尾），remove 从父节点中删除目标。
+ */
 export function applyPatch(tree: LayoutNode, patch: UIIRPatch): LayoutNode {
   if (tree.id === patch.targetId) {
-    switch (patch.op) {
-      case 'remove':
-        throw new Error('Cannot remove the root node');
-      case 'replace':
-        return { ...tree, ...patch.payload } as LayoutNode;
-      case 'update':
-        return { ...tree, ...patch.payload } as LayoutNode;
-      case 'insert':
-        if (!patch.payload) {
-          throw new Error('Insert patch requires payload');
-        }
-        return {
-          ...tree,
-          children: [patch.payload as LayoutNode, ...tree.children],
-        };
-      default:
-        return tree;
+    if (patch.op === 'remove') {
+      throw new Error('Cannot remove the root node');
     }
+    return applyToTarget(tree, patch);
   }
 
-  const nextChildren = tree.children.map((child) => applyPatch(child, patch));
-  return { ...tree, children: nextChildren };
+  let changed = false;
+  const nextChildren: LayoutNode[] = [];
+  for (const child of tree.children) {
+    if (patch.op === 'remove' && child.id === patch.targetId) {
+      changed = true;
+      continue;
+    }
+    const next = applyPatch(child, patch);
+    changed ||= next !== child;
+    nextChildren.push(next);
+  }
+  return changed ? { ...tree, children: nextChildren } : tree;
+}
+
+function applyToTarget(node: LayoutNode, patch: UIIRPatch): LayoutNode {
+  switch (patch.op) {
+    case 'replace':
+    case 'update':
+      return { ...node, ...patch.payload } as LayoutNode;
+    case 'insert': {
+      if (!patch.payload) {
+        throw new Error('Insert patch requires payload');
+      }
+      const children = [...node.children];
+      children.splice(patch.position ?? children.length, 0, patch.payload as LayoutNode);
+      return { ...node, children };
+    }
+    default:
+      return node;
+  }
 }
 
 export function applyPatches(tree: LayoutNode, patches: UIIRPatch[]): LayoutNode {
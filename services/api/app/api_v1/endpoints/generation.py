@@ -1,21 +1,72 @@
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from typing import AsyncIterator, List
 
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+
+from ...core.config import settings
 from ...schemas.project import ProjectCreateResponse
-from ...services.pipeline import create_project
+from ...services.batch import BatchItem, BatchResult, iter_batch
+from ...services.executor import ExecutorSaturatedError, stage_executor
+from ...services.pipeline import create_project_async
+from ...services.serialization import dumps, encoded_response
+from ...services.uploads import UploadTooLargeError, stream_form_uploads
+from ..limits import MULTIPART_OVERHEAD, UploadRoute, body_limit
 
-router = APIRouter()
+router = APIRouter(route_class=UploadRoute)
 
 
 @router.post("", response_model=ProjectCreateResponse)
+@body_limit(lambda: settings.max_sketch_bytes + settings.max_audio_bytes + MULTIPART_OVERHEAD)
 async def create_project_endpoint(
+    request: Request,
     sketch: UploadFile = File(...),
     audio: UploadFile | None = File(None),
     transcript: str | None = Form(None),
-) -> ProjectCreateResponse:
+) -> Response:
     try:
-        sketch_bytes = await sketch.read()
-        audio_bytes = await audio.read() if audio else None
-        project = create_project(sketch_bytes, audio_bytes, transcript)
-        return project
+        sketch_upload, audio_upload = await stream_form_uploads(sketch, audio)
+        project = await create_project_async(sketch_upload, audio_upload, transcript)
+        return await encoded_response(request, lambda: project)
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except ExecutorSaturatedError:
+        raise
     except Exception as exc:  # pragma: no cover - fallback error mapping
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@router.post("/batch")
+@body_limit(lambda: settings.batch_max_items * (settings.max_sketch_bytes + MULTIPART_OVERHEAD))
+async def create_projects_batch(
+    sketches: List[UploadFile] = File(...),
+    transcripts: List[str] = Form([]),
+    full: bool = True,
+) -> StreamingResponse:
+    """一次请求生成多个项目，按完成顺序以 NDJSON 逐行返回结果，单项失败不影响其他项。
+
+    `transcripts` 与 `sketches` 按位置对应；并发数见 `PROTOWEAVER_BATCH_CONCURRENCY`。
+    """
+    if len(sketches) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.batch_max_items} sketches per batch")
+    items = []
+    try:
+        for index, sketch in enumerate(sketches):
+            stored, _ = await stream_form_uploads(sketch, None)
+            transcript = transcripts[index] if index < len(transcripts) else None
+            items.append(BatchItem(key=sketch.filename or f"sketch-{index}", sketch=stored, transcript=transcript or None))
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+
+    def encode_line(result: BatchResult) -> bytes:
+        return dumps(result.record(full=full)) + b"\n"
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for result in iter_batch(items, settings.batch_concurrency):
+            try:
+                line = await stage_executor.run("serialize", encode_line, result)
+            except ExecutorSaturatedError:
+                # 响应头已发出，无法再返回 503；该项已经生成，直接在事件循环上编码，不把它报告为失败。
+                line = encode_line(result)
+            yield line
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
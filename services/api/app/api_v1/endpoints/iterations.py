@@ -1,23 +1,51 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 
 from ...schemas.project import IterationRequest, IterationResponse
-from ...services.pipeline import apply_iteration
+from ...services.executor import stage_executor
+from ...services.pipeline import IterationResult, run_iteration
+from ...services.serialization import Encoded, EncodingKey, encode_for, encoded_body_response, request_encoding
+from ...services.store import RevisionConflictError
 
 router = APIRouter()
 
 
+def iteration_response(result: IterationResult, message: str, full: bool) -> IterationResponse:
+    project = result.project
+    revision = project.ui_ir.metadata.get("revision")
+    return IterationResponse(
+        project_id=project.project_id,
+        revision=revision,
+        patches=result.patches,
+        changed_files={path: project.code_bundle.files[path] for path in result.changed_files},
+        file_hashes=project.code_bundle.hashes,
+        diff={"message": message, "revision": revision},
+        ui_ir=project.ui_ir if full else None,
+        code_bundle=project.code_bundle if full else None,
+    )
+
+
+def encode_iteration(result: IterationResult, message: str, full: bool, key: EncodingKey) -> Encoded:
+    return encode_for(iteration_response(result, message, full), key)
+
+
+def _iterate(project_id: str, message: str, full: bool, key: EncodingKey) -> Encoded:
+    return encode_iteration(run_iteration(project_id, message), message, full, key)
+
+
 @router.post("/{project_id}/iterate", response_model=IterationResponse)
-async def iterate_project(project_id: str, payload: IterationRequest) -> IterationResponse:
+async def iterate_project(
+    project_id: str, payload: IterationRequest, request: Request, full: bool = False
+) -> Response:
+    """默认只返回 UI-IR patch 与发生变化的文件；`full=true` 时附带完整 UI-IR 与代码包。
+
+    响应与迭代在同一个阶段调用中编码：版本一旦提交，不会再因执行器饱和而返回失败。
+    """
+    key = request_encoding(request)
     try:
-        project = apply_iteration(project_id, payload.message)
+        encoded = await stage_executor.run("iterate", _iterate, project_id, payload.message, full, key)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
-
-    diff = {"message": payload.message, "revision": project.ui_ir.metadata.get("revision")}
-
-    return IterationResponse(
-        project_id=project.project_id,
-        ui_ir=project.ui_ir,
-        diff=diff,
-        code_bundle=project.code_bundle,
-    )
+    except RevisionConflictError as exc:
+        raise HTTPException(status_code=409, detail="Project was modified concurrently, please retry") from exc
+    return encoded_body_response(key, encoded)
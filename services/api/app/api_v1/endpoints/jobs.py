@@ -0,0 +1,54 @@
+from typing import AsyncIterator
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from ...core.config import settings
+from ...schemas.job import JobResponse
+from ...services.jobs import JobQueueFullError, job_manager
+from ...services.uploads import UploadTooLargeError, stream_form_uploads
+from ..limits import MULTIPART_OVERHEAD, UploadRoute, body_limit
+
+router = APIRouter(route_class=UploadRoute)
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+@body_limit(lambda: settings.max_sketch_bytes + settings.max_audio_bytes + MULTIPART_OVERHEAD)
+async def submit_job(
+    sketch: UploadFile = File(...),
+    audio: UploadFile | None = File(None),
+    transcript: str | None = Form(None),
+) -> JobResponse:
+    """排队任务已满时返回 503，在落盘上传内容之前先检查一次。"""
+    if job_manager.full:
+        raise HTTPException(status_code=503, detail="Too many queued generation jobs", headers={"Retry-After": "1"})
+    try:
+        sketch_upload, audio_upload = await stream_form_uploads(sketch, audio)
+        job = job_manager.submit(sketch_upload, audio_upload, transcript)
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"}) from exc
+    return job.to_response()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_response()
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """以 Server-Sent Events 推送任务的阶段进度，任务结束后关闭连接。"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events() -> AsyncIterator[str]:
+        async for event in job_manager.stream(job):
+            yield f"event: {event.stage}\ndata: {event.json(ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,14 +1,86 @@
-from fastapi import APIRouter, HTTPException
+import mimetypes
+from typing import Dict
 
-from ...schemas.project import ProjectRetrieveResponse
-from ...services.store import store
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from ...schemas.project import LayoutResponse, ProjectRetrieveResponse
+from ...services.archives import ARCHIVE_FORMATS, bundle_etag, file_etag, stream_archive
+from ...services.executor import stage_executor
+from ...services.serialization import encoded_response
+from ...services.store import ProjectState, store
 
 router = APIRouter()
 
 
-@router.get("/{project_id}", response_model=ProjectRetrieveResponse)
-async def get_project(project_id: str) -> ProjectRetrieveResponse:
+def _load(project_id: str) -> ProjectState:
     project = store.get(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return ProjectRetrieveResponse(project_id=project.project_id, ui_ir=project.ui_ir, code_bundle=project.code_bundle)
+    return project
+
+
+@router.get("/{project_id}", response_model=ProjectRetrieveResponse)
+async def get_project(project_id: str, request: Request) -> Response:
+    """编码结果按版本缓存在 `ProjectState` 上，同一版本的重复请求不再序列化。"""
+    project = _load(project_id)
+    return await encoded_response(
+        request,
+        lambda: {"project_id": project.project_id, "ui_ir": project.ui_ir, "code_bundle": project.code_bundle},
+        cache=project.encoded,
+    )
+
+
+@router.get("/{project_id}/layout", response_model=LayoutResponse)
+async def get_layout(project_id: str, request: Request) -> Response:
+    """布局树中每个节点的绝对坐标；首次访问整体求解，之后的迭代增量重排。"""
+    project = _load(project_id)
+    frame = await stage_executor.run("layout", lambda: project.layout_frame)
+    return await encoded_response(
+        request,
+        lambda: {
+            "project_id": project.project_id,
+            "revision": project.ui_ir.metadata.get("revision", 1),
+            "viewport_width": frame.viewport_width,
+            "boxes": frame.to_builtins(),
+        },
+    )
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+@router.get("/{project_id}/bundle")
+async def download_bundle(
+    project_id: str, request: Request, fmt: str = Query("zip", alias="format", pattern="^(zip|tar\\.gz)$")
+) -> Response:
+    """以 zip / tar.gz 流式导出代码包，压缩在线程池中逐文件进行。"""
+    project = _load(project_id)
+    bundle = project.code_bundle
+    etag = bundle_etag(bundle, fmt)
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{project_id}.{fmt}"'
+    return StreamingResponse(stream_archive(bundle, fmt), media_type=ARCHIVE_FORMATS[fmt], headers=headers)
+
+
+@router.get("/{project_id}/files/{path:path}")
+async def download_file(project_id: str, path: str, request: Request) -> Response:
+    """返回代码包中的单个文件，ETag 为文件的 sha256，未变化时返回 304。"""
+    bundle = _load(project_id).code_bundle
+    if path not in bundle.files:
+        raise HTTPException(status_code=404, detail="File not found")
+    etag = file_etag(bundle, path)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    media_type = mimetypes.guess_type(path)[0] or "text/plain"
+    if path.endswith((".ts", ".tsx", ".jsx")):
+        media_type = "text/plain"
+    return Response(bundle.files[path], media_type=f"{media_type}; charset=utf-8", headers=headers)
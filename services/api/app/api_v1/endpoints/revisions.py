@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from ...schemas.project import IterationResponse, RevisionHistoryResponse, RevisionResponse
+from ...services.executor import stage_executor
+from ...services.pipeline import get_revision, revert_project
+from ...services.revisions import RevisionNotFoundError, revision_log
+from ...services.serialization import Encoded, EncodingKey, encoded_body_response, encoded_response, request_encoding
+from ...services.store import RevisionConflictError, store
+from .iterations import encode_iteration
+
+router = APIRouter()
+
+
+def _revert(project_id: str, revision: int, full: bool, key: EncodingKey) -> Encoded:
+    return encode_iteration(revert_project(project_id, revision), f"revert to revision {revision}", full, key)
+
+
+@router.get("/{project_id}/revisions", response_model=RevisionHistoryResponse)
+async def list_revisions(project_id: str) -> RevisionHistoryResponse:
+    project = store.get(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return RevisionHistoryResponse(
+        project_id=project_id,
+        current_revision=project.ui_ir.metadata.get("revision", 1),
+        revisions=revision_log.history(project_id),
+    )
+
+
+@router.get("/{project_id}/revisions/{revision}", response_model=RevisionResponse)
+async def read_revision(project_id: str, revision: int, request: Request) -> Response:
+    """从最近的快照回放增量重建历史版本，回放长度不超过快照间隔。"""
+    try:
+        ui_ir, code_bundle = await stage_executor.run("revision", get_revision, project_id, revision)
+    except (ValueError, RevisionNotFoundError) as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return await encoded_response(
+        request,
+        lambda: {"project_id": project_id, "revision": revision, "ui_ir": ui_ir, "code_bundle": code_bundle},
+    )
+
+
+@router.post("/{project_id}/revisions/{revision}/revert", response_model=IterationResponse)
+async def revert_to_revision(project_id: str, revision: int, request: Request, full: bool = False) -> Response:
+    """恢复到历史版本；恢复会生成一个新版本，返回格式与 `/iterate` 相同。"""
+    key = request_encoding(request)
+    try:
+        encoded = await stage_executor.run("iterate", _revert, project_id, revision, full, key)
+    except (ValueError, RevisionNotFoundError) as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except RevisionConflictError as exc:
+        raise HTTPException(status_code=409, detail="Project was modified concurrently, please retry") from exc
+    return encoded_body_response(key, encoded)
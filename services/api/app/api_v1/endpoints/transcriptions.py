@@ -0,0 +1,59 @@
+from typing import AsyncIterator, List
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ...core.config import settings
+from ...services.audio import AudioDecodeError, TranscriptPart, TranscriptionSession, join_transcript
+from ...services.serialization import dumps
+
+router = APIRouter()
+
+
+def _segment_line(part: TranscriptPart) -> bytes:
+    return dumps({"index": part.index, "start": round(part.start, 3), "end": round(part.end, 3), "text": part.text}) + b"\n"
+
+
+@router.post("")
+async def create_transcription(request: Request) -> StreamingResponse:
+    """请求体为 WAV 原始字节（可分块上传），响应为 NDJSON。
+
+    上传过程中每个语音段结束即开始识别，识别与上传重叠进行；响应先按顺序逐行返回各段的
+    `{index, start, end, text}`，最后一行为 `{text, segments, speech_seconds, duration_seconds}`。
+    """
+    limit = settings.max_audio_bytes
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {limit} byte limit")
+
+    session = TranscriptionSession()
+    ready: List[TranscriptPart] = []
+    try:
+        async for chunk in request.stream():
+            if session.received + len(chunk) > limit:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds the {limit} byte limit")
+            ready.extend(await session.feed(chunk))
+        await session.close()
+    except AudioDecodeError as exc:
+        session.cancel()
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+    except BaseException:
+        session.cancel()
+        raise
+
+    async def lines() -> AsyncIterator[bytes]:
+        parts = list(ready)
+        for part in ready:
+            yield _segment_line(part)
+        async for part in session.results():
+            parts.append(part)
+            yield _segment_line(part)
+        summary = {
+            "text": join_transcript(parts),
+            "segments": len(parts),
+            "speech_seconds": round(sum(part.end - part.start for part in parts), 3),
+            "duration_seconds": round(session.duration, 3),
+        }
+        yield dumps(summary) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,62 @@
+from typing import AsyncGenerator, Callable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+
+F = TypeVar("F", bound=Callable)
+
+# multipart 分隔行、各部分的头部与普通表单字段所占的余量。
+MULTIPART_OVERHEAD = 1 << 20
+
+
+def body_limit(limit: Callable[[], int]) -> Callable[[F], F]:
+    """声明端点请求体的字节上限；`limit` 在每次请求时求值，便于测试中修改配置。"""
+
+    def decorate(endpoint: F) -> F:
+        endpoint.body_limit = limit  # type: ignore[attr-defined]
+        return endpoint
+
+    return decorate
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {limit} byte limit")
+
+
+class LimitedRequest(Request):
+    """读取请求体时累计字节数，超过上限立即中止，分块上传也不会被完整解析落盘。"""
+
+    limit = 0
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        received = 0
+        async for chunk in super().stream():
+            received += len(chunk)
+            if received > self.limit:
+                raise _too_large(self.limit)
+            yield chunk
+
+
+class UploadRoute(APIRoute):
+    """在 FastAPI 解析表单之前按 `body_limit` 检查请求体大小。
+
+    声明的 `Content-Length` 超限时直接返回 413；未声明长度时在读取过程中计数。
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Response]:
+        handler = super().get_route_handler()
+        limit_of: Optional[Callable[[], int]] = getattr(self.endpoint, "body_limit", None)
+        if limit_of is None:
+            return handler
+
+        async def limited_handler(request: Request) -> Response:
+            limit = limit_of()
+            declared = request.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > limit:
+                raise _too_large(limit)
+            limited = LimitedRequest(request.scope, request.receive)
+            limited.limit = limit
+            return await handler(limited)
+
+        return limited_handler
@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 
-from .endpoints import generation, iterations, projects
+from .endpoints import generation, iterations, jobs, projects, revisions, transcriptions
 
 api_router = APIRouter()
 api_router.include_router(generation.router, prefix="/projects", tags=["generation"])
 api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
 api_router.include_router(iterations.router, prefix="/projects", tags=["iterations"])
+api_router.include_router(revisions.router, prefix="/projects", tags=["revisions"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(transcriptions.router, prefix="/transcriptions", tags=["transcriptions"])
@@ -0,0 +1,68 @@
+"""ProtoWeaver 命令行入口。
+
+    # 离线批量生成：目录或 JSONL 清单 → JSONL / tar
+    protoweaver-api batch ../../data/samples --output out/samples.jsonl --concurrency 8
+    protoweaver-api batch manifest.jsonl --format tar --output out/samples.tar --resume
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from typing import Optional, Sequence
+
+from .core.config import settings
+from .services.batch import BATCH_FORMATS, BatchProgress, discover, run_batch
+from .services.executor import stage_executor
+
+
+def _report(progress: BatchProgress, every: int) -> None:
+    if progress.completed == progress.total or progress.completed % every == 0:
+        print(progress.describe(), file=sys.stderr, flush=True)
+
+
+def batch(args: argparse.Namespace) -> int:
+    items = discover(args.source)
+    if not items:
+        print(f"no sketches found in {args.source}", file=sys.stderr)
+        return 1
+    fmt = args.format or ("tar" if args.output.endswith(".tar") else "jsonl")
+    try:
+        progress = asyncio.run(
+            run_batch(
+                items,
+                args.output,
+                fmt=fmt,
+                concurrency=args.concurrency,
+                resume=args.resume,
+                on_progress=lambda current: _report(current, args.progress_every),
+            )
+        )
+    finally:
+        stage_executor.shutdown()
+    print(progress.describe(), file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="protoweaver-api", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="在进程内批量生成项目，无需启动 HTTP 服务")
+    batch_parser.add_argument("source", help="草图目录（同名 .wav/.txt 作为语音/转写）或 JSONL 清单")
+    batch_parser.add_argument("--output", required=True, help="结果路径，断点记录写在 <output>.checkpoint")
+    batch_parser.add_argument("--format", choices=BATCH_FORMATS, help="缺省按扩展名推断，.tar 为 tar，否则为 jsonl")
+    batch_parser.add_argument("--concurrency", type=int, default=settings.batch_concurrency)
+    batch_parser.add_argument("--resume", action="store_true", help="跳过 checkpoint 中已成功的项并追加输出")
+    batch_parser.add_argument("--progress-every", type=int, default=10, help="每完成多少项打印一次进度")
+    batch_parser.set_defaults(handler=batch)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import Dict, List
 
 from pydantic import BaseSettings, Field
 
@@ -10,6 +10,61 @@ class Settings(BaseSettings):
     storage_dir: str = "./uploads"
     codegen_host: str = "http://localhost:9000"
     worker_host: str = "http://localhost:9001"
+    cache_backend: str = "memory"
+    cache_dir: str = "./.cache/generation"
+    cache_max_entries: int = 512
+    cache_ttl_seconds: float = 3600
+    store_backend: str = "memory"
+    store_path: str = "./data/protoweaver.db"
+    store_pool_size: int = 4
+    store_hot_entries: int = 64
+    codegen_fragment_cache_entries: int = 8192
+    intent_cache_size: int = 1024
+    layout_viewport_width: int = 1280
+    batch_concurrency: int = 8
+    bundle_compress_level: int = 6
+    sketch_max_side: int = 768
+    sketch_tile_rows: int = 128
+    sketch_max_pixels: int = 64_000_000
+    sketch_min_box_ratio: float = 0.03
+    sketch_max_regions: int = 128
+    bundle_chunk_size: int = 64 * 1024
+    asr_backend: str = "mock"
+    audio_sample_rate: int = 16000
+    audio_chunk_bytes: int = 64 * 1024
+    vad_threshold_db: float = -45.0
+    vad_hangover_ms: int = 300
+    vad_max_segment_seconds: float = 15.0
+    models_dir: str = "../../models"
+    model_memory_cap_mb: int = 2048
+    model_idle_seconds: float = 900
+    model_preload: List[str] = Field(default_factory=list)
+    batch_max_items: int = 200
+    revision_snapshot_interval: int = 10
+    revision_retention: int = 200
+    executor_threads: int = 8
+    executor_processes: int = 0
+    executor_max_pending: int = 64
+    executor_process_stages: List[str] = Field(default_factory=lambda: ["sketch", "codegen"])
+    stage_concurrency: Dict[str, int] = Field(
+        default_factory=lambda: {"sketch": 4, "audio": 4, "asr": 4, "intent": 8, "codegen": 4}
+    )
+    job_consumers: int = 4
+    job_retention: int = 1000
+    job_queue_max: int = 256
+    upload_chunk_size: int = 1 << 20
+    max_sketch_bytes: int = 20 * 1024 * 1024
+    max_audio_bytes: int = 100 * 1024 * 1024
+    blob_backend: str = "local"
+    blob_bucket: str = "uploads"
+    blob_gc_interval_seconds: float = 3600
+    blob_gc_grace_seconds: float = 3600
+    trace_buffer_size: int = 512
+    response_compress_min_bytes: int = 1024
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 5
+    profiler_enabled: bool = False
+    profiler_interval_ms: float = 10
 
     class Config:
         env_prefix = "PROTOWEAVER_"
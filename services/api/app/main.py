@@ -1,13 +1,40 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from .api_v1.router import api_router
 from .core.config import settings
+from .services.blobs import blob_collector
+from .services.executor import ExecutorSaturatedError, stage_executor
+from .services.jobs import job_manager
+from .services.metrics import metrics, profiler, tracer
+from .services.models import model_registry
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    blob_collector.start()
+    model_registry.start(preload=settings.model_preload)
+    if profiler is not None:
+        profiler.start()
+    yield
+    if profiler is not None:
+        profiler.stop()
+    await blob_collector.stop()
+    await model_registry.stop()
+    job_manager.shutdown()
+    stage_executor.shutdown(wait=False)
+
 
 app = FastAPI(
     title="ProtoWeaver API",
     version="0.1.0",
     description="将手绘草图与语音描述转换为 Web 原型的后端服务",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -21,7 +48,42 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.api_prefix)
 
 
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated(_: Request, exc: ExecutorSaturatedError) -> JSONResponse:
+    """任一阶段因执行器饱和被拒绝时统一返回 503，由客户端稍后重试。"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 @app.get("/healthz", tags=["system"])
 async def healthz() -> dict[str, str]:
     """Kubernetes 友好的健康检查。"""
     return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["system"], response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus 文本格式的指标：阶段耗时直方图、排队深度、缓存命中与负载大小。"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/traces", tags=["system"])
+async def recent_traces(limit: int = 100) -> list[dict]:
+    """最近完成的 span，按结束时间排序。"""
+    return [vars(item) for item in tracer.recent(limit)]
+
+
+@app.get("/debug/profile", tags=["system"], response_class=PlainTextResponse)
+async def profile(reset: bool = False) -> PlainTextResponse:
+    """采样分析器累计的折叠栈，可直接输入 flamegraph.pl / speedscope。"""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    folded = profiler.folded()
+    if reset:
+        profiler.reset()
+    return PlainTextResponse(folded)
+
+
+@app.get("/debug/models", tags=["system"])
+async def model_stats() -> list[dict]:
+    """已登记模型的加载状态、加载/预热耗时与内存占用（共享的权重映射与私有内存）。"""
+    return [vars(item) for item in await asyncio.to_thread(model_registry.stats)]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from .project import ProjectCreateResponse
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class JobEvent(BaseModel):
+    stage: str
+    at: datetime = Field(default_factory=datetime.utcnow)
+    detail: Dict[str, Any] = Field(default_factory=dict)
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: JobStatus
+    stage: Optional[str] = None
+    events: List[JobEvent] = Field(default_factory=list)
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[ProjectCreateResponse] = None
+    error: Optional[str] = None
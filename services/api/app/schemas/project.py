@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -25,6 +25,7 @@ class LayoutNode(BaseModel):
     bindings: Dict[str, str] = Field(default_factory=dict)
     constraints: Dict[str, Any] = Field(default_factory=dict)
     events: List[Dict[str, Any]] = Field(default_factory=list)
+    bounds: Optional[Bounds] = None
     children: List['LayoutNode'] = Field(default_factory=list)
 
     class Config:
@@ -73,6 +74,7 @@ class CodeBundle(BaseModel):
     framework: str = "nextjs"
     entry: str = "app/page.tsx"
     files: Dict[str, str] = Field(default_factory=dict)
+    hashes: Dict[str, str] = Field(default_factory=dict)
 
 
 class ProjectCreateResponse(BaseModel):
@@ -85,12 +87,55 @@ class ProjectRetrieveResponse(ProjectCreateResponse):
     pass
 
 
+class LayoutResponse(BaseModel):
+    project_id: str
+    revision: int
+    viewport_width: float
+    boxes: Dict[str, Bounds]
+
+
+class UIIRPatch(BaseModel):
+    """与 `@protoweaver/ui-ir` 的 `diffSchema` 对应，序列化为 `targetId`；`position` 缺省时插入到末尾。"""
+
+    target_id: str = Field(..., alias="targetId")
+    op: Literal["replace", "remove", "insert", "update"]
+    payload: Optional[Dict[str, Any]] = None
+    position: Optional[int] = None
+
+    class Config:
+        allow_population_by_field_name = True
+
+
 class IterationRequest(BaseModel):
     message: str
 
 
 class IterationResponse(BaseModel):
     project_id: str
-    ui_ir: UIIRPayload
+    revision: int
+    patches: List[UIIRPatch] = Field(default_factory=list)
+    changed_files: Dict[str, str] = Field(default_factory=dict)
+    file_hashes: Dict[str, str] = Field(default_factory=dict)
     diff: Dict[str, Any]
+    ui_ir: Optional[UIIRPayload] = None
+    code_bundle: Optional[CodeBundle] = None
+
+
+class RevisionSummary(BaseModel):
+    revision: int
+    created_at: datetime
+    message: Optional[str] = None
+    is_snapshot: bool = False
+
+
+class RevisionHistoryResponse(BaseModel):
+    project_id: str
+    current_revision: int
+    revisions: List[RevisionSummary] = Field(default_factory=list)
+
+
+class RevisionResponse(BaseModel):
+    project_id: str
+    revision: int
+    ui_ir: UIIRPayload
     code_bundle: CodeBundle
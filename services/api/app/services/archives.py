@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import tarfile
+import zipfile
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from ..core.config import settings
+from ..schemas.project import CodeBundle
+from .cache import content_hash
+from .codegen import file_hash
+from .executor import ExecutorSaturatedError, stage_executor
+
+ARCHIVE_FORMATS: Dict[str, str] = {"zip": "application/zip", "tar.gz": "application/gzip"}
+# 固定的修改时间让同一代码包总是得到相同的归档字节，ETag 因此可以只由文件哈希决定。
+ARCHIVE_DATE_TIME = (2024, 1, 1, 0, 0, 0)
+ARCHIVE_MTIME = 1704067200  # 2024-01-01T00:00:00Z
+
+
+class _ChunkBuffer:
+    """只写缓冲区，供 zipfile/tarfile 以流模式写入；没有 `seek`/`tell`，两者都会按不可回退的流处理。"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def bundle_etag(bundle: CodeBundle, fmt: str = "") -> str:
+    """由各文件哈希计算的代码包 ETag，`fmt` 区分不同的归档格式。"""
+    parts = [fmt]
+    for path in sorted(bundle.files):
+        parts.extend((path, bundle.hashes.get(path) or file_hash(bundle.files[path])))
+    return f'"{content_hash(*parts)}"'
+
+
+def file_etag(bundle: CodeBundle, path: str) -> str:
+    return f'"{bundle.hashes.get(path) or file_hash(bundle.files[path])}"'
+
+
+def iter_archive(
+    bundle: CodeBundle, fmt: str, chunk_size: Optional[int] = None, compress_level: Optional[int] = None
+) -> Iterator[bytes]:
+    """逐文件压缩并产出归档数据，缓冲区攒够 `chunk_size` 时产出一块，整个归档不会同时驻留内存。"""
+    chunk_size = chunk_size or settings.bundle_chunk_size
+    level = settings.bundle_compress_level if compress_level is None else compress_level
+    buffer = _ChunkBuffer()
+    archive: "zipfile.ZipFile | tarfile.TarFile"
+    if fmt == "zip":
+        archive = zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level)  # type: ignore[arg-type]
+        compressor = None
+    elif fmt == "tar.gz":
+        # tarfile 自带的 "w|gz" 会把当前时间写进 gzip 头，这里自行包一层 mtime=0 的 GzipFile。
+        compressor = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=level, mtime=0)  # type: ignore[arg-type]
+        archive = tarfile.open(fileobj=compressor, mode="w|")
+    else:
+        raise ValueError(f"Unsupported archive format: {fmt}")
+
+    with archive:
+        for path in sorted(bundle.files):
+            data = bundle.files[path].encode("utf-8")
+            if isinstance(archive, zipfile.ZipFile):
+                info = zipfile.ZipInfo(path, date_time=ARCHIVE_DATE_TIME)
+                archive.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=level)
+            else:
+                info = tarfile.TarInfo(path)
+                info.size = len(data)
+                info.mtime = ARCHIVE_MTIME
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    if compressor is not None:
+        compressor.close()
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+async def stream_archive(bundle: CodeBundle, fmt: str) -> AsyncIterator[bytes]:
+    """异步逐块产出归档，压缩在 `stage_executor` 的线程池中进行，不阻塞事件循环。
+
+    响应头发出后无法再返回 503：执行器饱和时该块改在默认线程池中压缩；客户端断开时关闭归档生成器。
+    """
+    chunks = iter_archive(bundle, fmt)
+    try:
+        while True:
+            try:
+                chunk = await stage_executor.run("archive", next, chunks, None)
+            except ExecutorSaturatedError:
+                chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        try:
+            chunks.close()
+        except ValueError:  # 上一块仍在线程中压缩，生成器随后由 GC 回收
+            pass
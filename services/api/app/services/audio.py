@@ -0,0 +1,510 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import struct
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from ..core.config import Settings, settings
+from .executor import stage_executor
+from .metrics import metrics
+from .models import ModelRegistry, model_registry
+from .uploads import StoredUpload, UploadSource
+
+MOCK_TRANSCRIPT = "在 Hero 区域显示标题 ProtoWeaver，加一个立即体验按钮，下方放三个特性卡片"
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+audio_seconds = metrics.counter(
+    "protoweaver_audio_seconds", "Decoded audio duration by VAD decision", ("kind",)
+)
+
+
+class AudioDecodeError(ValueError):
+    """音频不是可识别的 WAV（RIFF/WAVE，PCM 8/16/24/32 位或 32/64 位浮点）。"""
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    sample_rate: int
+    channels: int
+    bits: int
+    floating: bool
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.channels * self.bits // 8
+
+
+def _to_float(data: bytes, fmt: AudioFormat) -> np.ndarray:
+    """把整帧字节转换为 [-1, 1] 的 float32 单声道采样。"""
+    if fmt.floating:
+        samples = np.frombuffer(data, dtype="<f4" if fmt.bits == 32 else "<f8").astype(np.float32)
+    elif fmt.bits == 8:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif fmt.bits == 16:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    elif fmt.bits == 24:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = ((values << 8) >> 8).astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648.0
+    if fmt.channels > 1:
+        samples = samples.reshape(-1, fmt.channels).mean(axis=1)
+    return samples
+
+
+class WavDecoder:
+    """增量 WAV 解码器：`feed` 任意切分的字节块，返回其中完整帧对应的采样。
+
+    data 块长度为 0 或 0xFFFFFFFF（边录边写的流式 WAV）时读到输入结束为止。
+    """
+
+    def __init__(self) -> None:
+        self.format: Optional[AudioFormat] = None
+        self._buffer = bytearray()
+        self._header_done = False
+        self._skip = 0
+        self._data_remaining: Optional[int] = None  # None 表示尚未进入 data 块
+        self.frames = 0
+
+    def _parse_fmt(self, body: bytes) -> AudioFormat:
+        if len(body) < 16:
+            raise AudioDecodeError("Truncated fmt chunk")
+        tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+        if tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+            tag = struct.unpack("<H", body[24:26])[0]
+        floating = tag == _WAVE_FORMAT_FLOAT
+        if tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_FLOAT) or channels == 0 or sample_rate == 0:
+            raise AudioDecodeError(f"Unsupported WAV encoding (format tag {tag:#x})")
+        if (floating and bits not in (32, 64)) or (not floating and bits not in (8, 16, 24, 32)):
+            raise AudioDecodeError(f"Unsupported sample width: {bits} bits")
+        return AudioFormat(sample_rate=sample_rate, channels=channels, bits=bits, floating=floating)
+
+    def feed(self, data: bytes) -> np.ndarray:
+        self._buffer += data
+        if not self._header_done:
+            if len(self._buffer) < 12:
+                return np.empty(0, dtype=np.float32)
+            if self._buffer[:4] != b"RIFF" or self._buffer[8:12] != b"WAVE":
+                raise AudioDecodeError("Not a RIFF/WAVE stream")
+            del self._buffer[:12]
+            self._header_done = True
+        while self._data_remaining is None:
+            if self._skip:
+                skipped = min(self._skip, len(self._buffer))
+                del self._buffer[:skipped]
+                self._skip -= skipped
+                if self._skip:
+                    return np.empty(0, dtype=np.float32)
+            if len(self._buffer) < 8:
+                return np.empty(0, dtype=np.float32)
+            chunk_id, size = bytes(self._buffer[:4]), struct.unpack("<I", self._buffer[4:8])[0]
+            if chunk_id == b"data":
+                if self.format is None:
+                    raise AudioDecodeError("data chunk before fmt chunk")
+                del self._buffer[:8]
+                self._data_remaining = -1 if size in (0, 0xFFFFFFFF) else size
+            elif chunk_id == b"fmt ":
+                if len(self._buffer) < 8 + size:
+                    return np.empty(0, dtype=np.float32)
+                self.format = self._parse_fmt(bytes(self._buffer[8 : 8 + size]))
+                del self._buffer[: 8 + size + (size & 1)]
+            else:
+                del self._buffer[:8]
+                self._skip = size + (size & 1)
+
+        assert self.format is not None
+        available = len(self._buffer)
+        if self._data_remaining >= 0:
+            available = min(available, self._data_remaining)
+        usable = available - available % self.format.frame_bytes
+        if usable <= 0:
+            return np.empty(0, dtype=np.float32)
+        samples = _to_float(bytes(self._buffer[:usable]), self.format)
+        del self._buffer[:usable]
+        if self._data_remaining >= 0:
+            self._data_remaining -= usable
+        self.frames += samples.size
+        return samples
+
+
+class Resampler:
+    """流式线性插值重采样，跨块保持相位连续；降采样前用长度为采样比的滑动平均做简单抗混叠。"""
+
+    def __init__(self, source_rate: int, target_rate: int) -> None:
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.step = source_rate / target_rate
+        self._position = 0.0  # 下一个输出采样在当前输入块（含上一块末尾采样）中的位置
+        self._tail = np.empty(0, dtype=np.float32)
+        self._taps = max(int(round(self.step)), 1) if self.step > 1 else 1
+        self._history = np.zeros(self._taps - 1, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.source_rate == self.target_rate or samples.size == 0:
+            return samples
+        if self._taps > 1:
+            extended = np.concatenate([self._history, samples])
+            cumulative = np.cumsum(extended, dtype=np.float64)
+            cumulative = np.concatenate([[0.0], cumulative])
+            samples = ((cumulative[self._taps :] - cumulative[: -self._taps]) / self._taps).astype(np.float32)
+            self._history = extended[-(self._taps - 1) :]
+        data = np.concatenate([self._tail, samples])
+        last = data.size - 1
+        if self._position > last:
+            self._tail = data[-1:]
+            self._position -= last
+            return np.empty(0, dtype=np.float32)
+        positions = np.arange(self._position, last + 1e-9, self.step)
+        output = np.interp(positions, np.arange(data.size), data).astype(np.float32)
+        self._position = positions[-1] + self.step - last
+        self._tail = data[-1:]
+        return output
+
+
+def normalize(samples: np.ndarray, peak: float = 0.9) -> np.ndarray:
+    """去直流并把峰值缩放到 `peak`，静音段原样返回。"""
+    centered = samples - samples.mean(dtype=np.float64) if samples.size else samples
+    maximum = float(np.abs(centered).max()) if centered.size else 0.0
+    if maximum < 1e-6:
+        return centered.astype(np.float32)
+    return (centered * (peak / maximum)).astype(np.float32)
+
+
+@dataclass
+class SpeechSegment:
+    index: int
+    start: float
+    end: float
+    samples: np.ndarray
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class EnergyVAD:
+    """基于帧能量的语音活动检测。
+
+    帧能量（dB）高于 `max(threshold_db, 噪声底 + margin_db)` 视为语音；噪声底每 1 秒的帧取一次低分位数并平滑跟踪，
+    与输入如何分块无关。
+    语音后连续静音超过 `hangover_ms` 才结束一段，段首尾各保留 `padding_ms`，单段超过 `max_segment_s` 时强制切分。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int = 30,
+        threshold_db: float = -45.0,
+        margin_db: float = 12.0,
+        hangover_ms: int = 300,
+        padding_ms: int = 150,
+        max_segment_s: float = 15.0,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.frame = max(sample_rate * frame_ms // 1000, 1)
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.hangover = max(hangover_ms // frame_ms, 1)
+        self.padding = padding_ms // frame_ms
+        self.max_frames = max(int(max_segment_s * 1000 // frame_ms), 1)
+        self.noise_db: Optional[float] = None
+        self.noise_window = max(1000 // frame_ms, 1)
+        self._window: List[np.ndarray] = []
+        self._window_filled = 0
+        self._pending = np.empty(0, dtype=np.float32)
+        self._preroll: Deque[np.ndarray] = deque(maxlen=max(self.padding, 1))
+        self._speech: List[np.ndarray] = []
+        self._silent_run = 0
+        self._frame_index = 0  # 已处理的帧数，用于计算时间戳
+        self._segment_start = 0
+        self._segments = 0
+
+    def _update_noise(self, floor: float) -> None:
+        # 噪声底下降时立即跟随，上升时缓慢跟随，避免长段语音把阈值抬高
+        self.noise_db = floor if self.noise_db is None or floor < self.noise_db else 0.9 * self.noise_db + 0.1 * floor
+        self._window = []
+        self._window_filled = 0
+
+    def _emit(self, end_frame: int) -> SpeechSegment:
+        samples = np.concatenate(self._speech)
+        segment = SpeechSegment(
+            index=self._segments,
+            start=self._segment_start * self.frame / self.sample_rate,
+            end=end_frame * self.frame / self.sample_rate,
+            samples=samples,
+            sample_rate=self.sample_rate,
+        )
+        self._segments += 1
+        self._speech = []
+        self._silent_run = 0
+        audio_seconds.inc(segment.duration, kind="speech")
+        return segment
+
+    def process(self, samples: np.ndarray) -> List[SpeechSegment]:
+        data = np.concatenate([self._pending, samples]) if self._pending.size else samples
+        count = data.size // self.frame
+        self._pending = data[count * self.frame :]
+        if count == 0:
+            return []
+        frames = data[: count * self.frame].reshape(count, self.frame)
+        energy = 10.0 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-10)
+        voiced = np.empty(count, dtype=bool)
+        position = 0
+        while position < count:
+            take = min(count - position, self.noise_window - self._window_filled)
+            block = energy[position : position + take]
+            floor = self.threshold_db if self.noise_db is None else max(self.threshold_db, self.noise_db + self.margin_db)
+            voiced[position : position + take] = block > floor
+            self._window.append(block)
+            self._window_filled += take
+            position += take
+            if self._window_filled == self.noise_window:
+                self._update_noise(float(np.percentile(np.concatenate(self._window), 10)))
+        audio_seconds.inc(float(count * self.frame - voiced.sum() * self.frame) / self.sample_rate, kind="silence")
+
+        segments: List[SpeechSegment] = []
+        for offset in range(count):
+            frame = frames[offset]
+            position = self._frame_index + offset
+            if self._speech:
+                self._speech.append(frame)
+                self._silent_run = 0 if voiced[offset] else self._silent_run + 1
+                if self._silent_run >= self.hangover:
+                    # 去掉超出尾部 padding 的静音帧
+                    trim = self._silent_run - self.padding
+                    if trim > 0:
+                        del self._speech[-trim:]
+                    segments.append(self._emit(position + 1 - max(trim, 0)))
+                elif len(self._speech) >= self.max_frames:
+                    segments.append(self._emit(position + 1))
+                    self._segment_start = position + 1
+                    self._speech = [np.empty(0, dtype=np.float32)]
+            elif voiced[offset]:
+                self._segment_start = position - len(self._preroll)
+                self._speech = [*self._preroll, frame]
+                self._preroll.clear()
+            elif self.padding:
+                self._preroll.append(frame)
+        self._frame_index += count
+        return segments
+
+    def flush(self) -> List[SpeechSegment]:
+        """输入结束：输出尚未结束的语音段。"""
+        if self._pending.size and self._speech:
+            self._speech.append(self._pending)
+        self._pending = np.empty(0, dtype=np.float32)
+        if not self._speech or not any(chunk.size for chunk in self._speech):
+            self._speech = []
+            return []
+        trailing = self._silent_run - self.padding
+        if trailing > 0:
+            del self._speech[-trailing:]
+        return [self._emit(self._frame_index - max(trailing, 0))]
+
+
+class ASRBackend(ABC):
+    """语音识别后端：输入归一化后的单段语音，返回文本。实现需要线程安全。"""
+
+    @abstractmethod
+    def transcribe(self, segment: SpeechSegment) -> str:
+        ...
+
+
+class MockASRBackend(ASRBackend):
+    """占位后端：按段序号依次返回示例转写中的分句。"""
+
+    def __init__(self, transcript: str = MOCK_TRANSCRIPT) -> None:
+        self.clauses = [clause for clause in transcript.split("，") if clause]
+
+    def transcribe(self, segment: SpeechSegment) -> str:
+        return self.clauses[segment.index % len(self.clauses)]
+
+
+class RegistryASRBackend(ASRBackend):
+    """通过模型注册表调用 `asr/<name>` 模型，`predict` 输入语音段、输出文本；识别期间模型不会被卸载。"""
+
+    def __init__(self, name: str, registry: Optional[ModelRegistry] = None) -> None:
+        self.name = name
+        self.registry = registry or model_registry
+
+    def transcribe(self, segment: SpeechSegment) -> str:
+        with self.registry.use(self.name) as model:
+            return str(model.predict([segment])[0])
+
+
+def load_asr_backend(spec: str) -> ASRBackend:
+    """`mock`、`model:<kind>/<name>`（注册表中的模型）或 `package.module:ClassName`（无参构造）。"""
+    if spec == "mock":
+        return MockASRBackend()
+    if spec.startswith("model:"):
+        return RegistryASRBackend(spec.removeprefix("model:"))
+    module_name, _, attribute = spec.partition(":")
+    backend = getattr(importlib.import_module(module_name), attribute)()
+    if not isinstance(backend, ASRBackend):
+        raise TypeError(f"{spec} is not an ASRBackend")
+    return backend
+
+
+@dataclass
+class TranscriptPart:
+    index: int
+    start: float
+    end: float
+    text: str
+
+
+class AudioFrontend:
+    """解码 → 重采样 → VAD 的流式前端，`feed` 返回本块输入中结束的语音段（已归一化）。"""
+
+    def __init__(self, config: Settings = settings) -> None:
+        self.config = config
+        self.decoder = WavDecoder()
+        self.resampler: Optional[Resampler] = None
+        self.vad = EnergyVAD(
+            config.audio_sample_rate,
+            threshold_db=config.vad_threshold_db,
+            hangover_ms=config.vad_hangover_ms,
+            max_segment_s=config.vad_max_segment_seconds,
+        )
+
+    @property
+    def duration(self) -> float:
+        fmt = self.decoder.format
+        return self.decoder.frames / fmt.sample_rate if fmt else 0.0
+
+    def _segments(self, segments: List[SpeechSegment]) -> List[SpeechSegment]:
+        for segment in segments:
+            segment.samples = normalize(segment.samples)
+        return segments
+
+    def feed(self, data: bytes) -> List[SpeechSegment]:
+        samples = self.decoder.feed(data)
+        if samples.size == 0:
+            return []
+        if self.resampler is None:
+            assert self.decoder.format is not None
+            self.resampler = Resampler(self.decoder.format.sample_rate, self.config.audio_sample_rate)
+        return self._segments(self.vad.process(self.resampler.process(samples)))
+
+    def finish(self) -> List[SpeechSegment]:
+        if self.decoder.format is None:
+            raise AudioDecodeError("Missing WAV header")
+        return self._segments(self.vad.flush())
+
+
+def _read_chunks(source: UploadSource, chunk_size: int) -> Iterator[bytes]:
+    if not isinstance(source, StoredUpload):
+        for start in range(0, len(source), chunk_size):
+            yield source[start : start + chunk_size]
+        return
+    with open(source.path, "rb") as handle:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def transcribe_chunks(chunks: Iterable[bytes], backend: Optional[ASRBackend] = None) -> Iterator[TranscriptPart]:
+    """同步版本：逐块解码，语音段一结束就交给 ASR 后端，按段顺序产出转写。"""
+    backend = backend or asr_backend
+    frontend = AudioFrontend()
+    for chunk in chunks:
+        for segment in frontend.feed(chunk):
+            yield TranscriptPart(segment.index, segment.start, segment.end, backend.transcribe(segment))
+    for segment in frontend.finish():
+        yield TranscriptPart(segment.index, segment.start, segment.end, backend.transcribe(segment))
+
+
+def join_transcript(parts: Iterable[TranscriptPart]) -> str:
+    return "，".join(part.text for part in parts if part.text)
+
+
+def transcribe(source: UploadSource, backend: Optional[ASRBackend] = None) -> str:
+    """分块读取上传的 WAV（不整体读入内存），只把语音段送入 ASR；不是 WAV 时抛出 `AudioDecodeError`。"""
+    return join_transcript(transcribe_chunks(_read_chunks(source, settings.audio_chunk_bytes), backend))
+
+
+class TranscriptionSession:
+    """异步流式转写会话：边接收音频边解码，每个语音段结束后立即在线程池中识别，多个段并发进行。
+
+    解码与 VAD 在 `audio` 阶段、识别在 `asr` 阶段执行，均不阻塞事件循环；结果始终按段顺序产出。
+    """
+
+    def __init__(self, backend: Optional[ASRBackend] = None) -> None:
+        self.backend = backend or asr_backend
+        self.frontend = AudioFrontend()
+        self.received = 0
+        self._segments: Deque[SpeechSegment] = deque()
+        self._pending: Deque["asyncio.Future[str]"] = deque()
+
+    def _dispatch(self, segments: List[SpeechSegment]) -> None:
+        for segment in segments:
+            self._segments.append(segment)
+            self._pending.append(asyncio.ensure_future(stage_executor.run("asr", self.backend.transcribe, segment)))
+
+    def _part(self, text: str) -> TranscriptPart:
+        segment = self._segments.popleft()
+        return TranscriptPart(segment.index, segment.start, segment.end, text)
+
+    @property
+    def duration(self) -> float:
+        return self.frontend.duration
+
+    async def feed(self, chunk: bytes) -> List[TranscriptPart]:
+        """送入一块音频，返回此时已按顺序完成识别的部分转写。"""
+        self.received += len(chunk)
+        self._dispatch(await stage_executor.run("audio", self.frontend.feed, chunk))
+        ready = []
+        while self._pending and self._pending[0].done():
+            ready.append(self._part(self._pending.popleft().result()))
+        return ready
+
+    async def close(self) -> None:
+        """输入结束：输出最后一个语音段；缺少 WAV 头时抛出 `AudioDecodeError`。"""
+        self._dispatch(await stage_executor.run("audio", self.frontend.finish))
+
+    async def results(self) -> AsyncIterator[TranscriptPart]:
+        """按顺序等待剩余的识别结果。"""
+        try:
+            while self._pending:
+                text = await self._pending[0]
+                self._pending.popleft()
+                yield self._part(text)
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._segments.clear()
+
+
+async def stream_transcription(
+    chunks: AsyncIterator[bytes], backend: Optional[ASRBackend] = None
+) -> AsyncIterator[TranscriptPart]:
+    session = TranscriptionSession(backend)
+    try:
+        async for chunk in chunks:
+            for part in await session.feed(chunk):
+                yield part
+        await session.close()
+        async for part in session.results():
+            yield part
+    finally:
+        session.cancel()
+
+
+asr_backend = load_asr_backend(settings.asr_backend)
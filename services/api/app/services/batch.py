@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import tarfile
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+from ..schemas.project import ProjectCreateResponse
+from .executor import ExecutorSaturatedError, stage_executor
+from .metrics import metrics
+from .pipeline import create_project_async
+from .serialization import dumps, to_builtins
+from .uploads import UploadSource, ingest_bytes
+
+logger = logging.getLogger(__name__)
+
+SKETCH_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+AUDIO_SUFFIXES = (".wav", ".m4a", ".mp3", ".ogg")
+TRANSCRIPT_SUFFIX = ".txt"
+BATCH_FORMATS = ("jsonl", "tar")
+
+batch_items = metrics.counter("protoweaver_batch_items", "Batch generation items by status", ("status",))
+
+BatchInput = Union[Path, UploadSource]
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """批量生成的一项输入；`key` 在一批中唯一，用于结果命名与断点续跑。"""
+
+    key: str
+    sketch: BatchInput
+    audio: Optional[BatchInput] = None
+    transcript: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    key: str
+    status: str
+    project: Optional[ProjectCreateResponse] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "succeeded"
+
+    def record(self, full: bool = True) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "key": self.key,
+            "status": self.status,
+            "project_id": self.project.project_id if self.project else None,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        if full and self.project is not None:
+            record["ui_ir"] = to_builtins(self.project.ui_ir)
+            record["code_bundle"] = to_builtins(self.project.code_bundle)
+        return record
+
+
+@dataclass
+class BatchProgress:
+    total: int
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def completed(self) -> int:
+        return self.skipped + self.succeeded + self.failed
+
+    @property
+    def rate(self) -> float:
+        """本次运行实际处理的条目每秒完成数（不含断点续跑跳过的条目）。"""
+        elapsed = time.monotonic() - self.started_at
+        return (self.succeeded + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        rate = self.rate
+        return (self.total - self.completed) / rate if rate > 0 else None
+
+    def update(self, result: BatchResult) -> None:
+        if result.succeeded:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def describe(self) -> str:
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "-"
+        return (
+            f"{self.completed}/{self.total} done ({self.succeeded} ok, {self.failed} failed, "
+            f"{self.skipped} skipped) {self.rate:.1f} items/s eta {eta}"
+        )
+
+
+def _companion(sketch: Path, suffixes: Iterable[str]) -> Optional[Path]:
+    for suffix in suffixes:
+        candidate = sketch.with_suffix(suffix)
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def discover(source: Union[str, Path]) -> List[BatchItem]:
+    """从目录或清单文件收集输入。
+
+    - 目录：递归查找草图，同名的音频（`.wav`/`.m4a`/...）与转写文本（`.txt`）作为附带输入；
+    - 清单（JSONL）：每行 `{"sketch": ..., "audio": ..., "transcript": ..., "key": ...}`，路径相对清单所在目录。
+    """
+    source = Path(source)
+    if source.is_dir():
+        items = []
+        for sketch in sorted(path for path in source.rglob("*") if path.suffix.lower() in SKETCH_SUFFIXES):
+            transcript_path = _companion(sketch, (TRANSCRIPT_SUFFIX,))
+            items.append(
+                BatchItem(
+                    key=sketch.relative_to(source).as_posix(),
+                    sketch=sketch,
+                    audio=_companion(sketch, AUDIO_SUFFIXES),
+                    transcript=transcript_path.read_text(encoding="utf-8").strip() if transcript_path else None,
+                )
+            )
+        return items
+
+    items = []
+    base = source.parent
+    for number, line in enumerate(source.read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        if "sketch" not in entry:
+            raise ValueError(f"{source}:{number}: missing 'sketch'")
+        items.append(
+            BatchItem(
+                key=str(entry.get("key") or entry["sketch"]),
+                sketch=base / entry["sketch"],
+                audio=base / entry["audio"] if entry.get("audio") else None,
+                transcript=entry.get("transcript"),
+            )
+        )
+    return items
+
+
+def _load(source: Optional[BatchInput]) -> Optional[UploadSource]:
+    if isinstance(source, Path):
+        return ingest_bytes(source.read_bytes())
+    return source
+
+
+async def process_item(item: BatchItem, retries: int = 5) -> BatchResult:
+    """生成一项；失败不会抛出，而是记录在结果中。执行器饱和时退避重试。"""
+    start = time.perf_counter()
+    try:
+        sketch = await stage_executor.run("upload", _load, item.sketch)
+        audio = await stage_executor.run("upload", _load, item.audio) if item.audio is not None else None
+        for attempt in range(retries + 1):
+            try:
+                project = await create_project_async(sketch, audio, item.transcript)
+                break
+            except ExecutorSaturatedError:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(0.05 * 2**attempt)
+    except Exception as exc:
+        logger.warning("批量生成 %s 失败: %s", item.key, exc)
+        batch_items.inc(status="failed")
+        return BatchResult(item.key, "failed", error=str(exc) or type(exc).__name__, elapsed=time.perf_counter() - start)
+    batch_items.inc(status="succeeded")
+    return BatchResult(item.key, "succeeded", project=project, elapsed=time.perf_counter() - start)
+
+
+async def iter_batch(items: Iterable[BatchItem], concurrency: int) -> AsyncIterator[BatchResult]:
+    """并发处理 `items`，最多同时进行 `concurrency` 项，按完成顺序产出结果。
+
+    输入按需拉取，消费者处理结果期间不会启动新的项，内存占用与批量大小无关。
+    """
+    pending: Set["asyncio.Task[BatchResult]"] = set()
+    source: Iterator[BatchItem] = iter(items)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max(concurrency, 1):
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(process_item(item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class BatchWriter(ABC):
+    """批量结果输出；`append=True` 时在已有输出之后追加（断点续跑）。"""
+
+    def __init__(self, path: Union[str, Path], append: bool = False) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.append = append
+
+    @abstractmethod
+    def write(self, result: BatchResult) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class JsonlBatchWriter(BatchWriter):
+    """每项一行 JSON，包含状态、UI-IR 与代码包；失败项只有错误信息。"""
+
+    def __init__(self, path: Union[str, Path], append: bool = False) -> None:
+        super().__init__(path, append)
+        self._file = self.path.open("ab" if append else "wb")
+
+    def write(self, result: BatchResult) -> None:
+        self._file.write(dumps(result.record()) + b"\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TarBatchWriter(BatchWriter):
+    """每个成功项写为 `<key>/ui-ir.json` 与 `<key>/<代码文件>`；使用未压缩 tar 以支持追加。"""
+
+    def __init__(self, path: Union[str, Path], append: bool = False) -> None:
+        super().__init__(path, append)
+        self._tar = tarfile.open(self.path, "a" if append and self.path.exists() else "w")
+
+    def _add(self, name: str, content: bytes) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(content))
+
+    def write(self, result: BatchResult) -> None:
+        if result.project is None:
+            return
+        key = PurePosixPath(result.key)
+        prefix = key.with_suffix("") if key.suffix.lower() in SKETCH_SUFFIXES else key
+        self._add(f"{prefix}/ui-ir.json", dumps(to_builtins(result.project.ui_ir), indent=True))
+        for path, content in result.project.code_bundle.files.items():
+            self._add(f"{prefix}/{path}", content.encode("utf-8"))
+        self._tar.fileobj.flush()  # type: ignore[union-attr]
+
+    def close(self) -> None:
+        self._tar.close()
+
+
+def open_writer(path: Union[str, Path], fmt: str, append: bool = False) -> BatchWriter:
+    if fmt == "jsonl":
+        return JsonlBatchWriter(path, append)
+    if fmt == "tar":
+        return TarBatchWriter(path, append)
+    raise ValueError(f"Unsupported batch format: {fmt}")
+
+
+class Checkpoint:
+    """记录已成功的 key（JSONL），结果写入输出之后才追加，续跑时跳过这些项。"""
+
+    def __init__(self, path: Union[str, Path], resume: bool = False) -> None:
+        self.path = Path(path)
+        self.completed: Set[str] = set()
+        if resume and self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry.get("status") == "succeeded":
+                        self.completed.add(entry["key"])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a" if resume else "w", encoding="utf-8")
+
+    def record(self, result: BatchResult) -> None:
+        self._file.write(json.dumps(result.record(full=False), ensure_ascii=False) + "\n")
+        self._file.flush()
+        if result.succeeded:
+            self.completed.add(result.key)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def checkpoint_path(output: Union[str, Path]) -> Path:
+    output = Path(output)
+    return output.with_name(f"{output.name}.checkpoint")
+
+
+async def run_batch(
+    items: List[BatchItem],
+    output: Union[str, Path],
+    fmt: str = "jsonl",
+    concurrency: int = 8,
+    resume: bool = False,
+    on_progress: Optional[Callable[[BatchProgress], None]] = None,
+) -> BatchProgress:
+    """处理整批输入并写入 `output`，进度记录在 `<output>.checkpoint`；`resume=True` 时跳过已成功的项。"""
+    checkpoint = Checkpoint(checkpoint_path(output), resume=resume)
+    writer = open_writer(output, fmt, append=resume)
+    remaining = [item for item in items if item.key not in checkpoint.completed]
+    progress = BatchProgress(total=len(items), skipped=len(items) - len(remaining))
+    try:
+        async for result in iter_batch(remaining, concurrency):
+            await stage_executor.run("serialize", writer.write, result)
+            checkpoint.record(result)
+            progress.update(result)
+            if on_progress is not None:
+                on_progress(progress)
+    finally:
+        writer.close()
+        checkpoint.close()
+    return progress
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from ..core.config import Settings, settings
+from .store import ProjectStore, store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    digest: str
+    size: int
+    modified_at: float
+
+
+@dataclass
+class GCStats:
+    scanned: int = 0
+    live: int = 0
+    deleted: int = 0
+    freed_bytes: int = 0
+    stale_parts: int = 0
+
+
+class BlobStore(ABC):
+    """按 sha256 寻址的上传存储，相同内容只保存一份。
+
+    新内容先写入 `staging_path()` 返回的临时文件，计算出摘要后再由 `put_file` 原子地移动到位。
+    登记与 GC 删除共用 `_lock`：刷新时间戳与“检查时间戳后删除”互斥，刚被重复上传的 blob 不会被删掉。
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self._staging = self.root / "staging"
+        self._staging.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def path(self, digest: str) -> Path:
+        """blob 的本地路径，供 mmap 等只读访问。"""
+
+    @abstractmethod
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        ...
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def staging_path(self) -> Path:
+        return self._staging / f"{uuid.uuid4().hex}.part"
+
+    def put_file(self, digest: str, source: Path) -> bool:
+        """把暂存文件登记为 `digest`；内容已存在时丢弃暂存文件并刷新时间戳，返回是否新写入。"""
+        target = self.path(digest)
+        with self._lock:
+            if self._touch(target):
+                source.unlink(missing_ok=True)
+                return False
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, target)
+            self._on_stored(digest, target)
+        return True
+
+    def put_bytes(self, content: bytes) -> Tuple[str, bool]:
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if self._touch(self.path(digest)):
+                return digest, False
+        staging = self.staging_path()
+        staging.write_bytes(content)
+        return digest, self.put_file(digest, staging)
+
+    @staticmethod
+    def _touch(target: Path) -> bool:
+        """刷新已有 blob 的时间戳；blob 不存在（或刚被 GC 删除）时返回 False，由调用方重新写入。"""
+        try:
+            os.utime(target)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, digest: str) -> None:
+        self.path(digest).unlink(missing_ok=True)
+
+    def delete_if_stale(self, digest: str, cutoff: float) -> Optional[int]:
+        """持锁重新 stat，时间戳仍早于 `cutoff` 时删除并返回其大小；期间被重新上传的 blob 保留。"""
+        with self._lock:
+            try:
+                stat = self.path(digest).stat()
+            except FileNotFoundError:
+                return None
+            if stat.st_mtime >= cutoff:
+                return None
+            self.delete(digest)
+            return stat.st_size
+
+    def _on_stored(self, digest: str, target: Path) -> None:
+        """子类可在 blob 写入后记录额外元数据。"""
+
+    def compact(self, grace_seconds: float, now: Optional[float] = None) -> int:
+        """清理超过宽限期的暂存文件（中断的上传）与空的分片目录，返回清理的暂存文件数。"""
+        cutoff = (now if now is not None else time.time()) - grace_seconds
+        removed = 0
+        for part in self._staging.glob("*.part"):
+            try:
+                if part.stat().st_mtime < cutoff:
+                    part.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        for directory in sorted(self._blob_root().glob("**/"), key=lambda p: len(p.parts), reverse=True):
+            if directory != self._blob_root() and not any(directory.iterdir()):
+                directory.rmdir()
+        return removed
+
+    @abstractmethod
+    def _blob_root(self) -> Path:
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统布局：`sha256/ab/cd/<digest>`，两级分片避免单目录文件过多。"""
+
+    def _blob_root(self) -> Path:
+        return self.root / "sha256"
+
+    def path(self, digest: str) -> Path:
+        return self._blob_root() / digest[:2] / digest[2:4] / digest
+
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        for path in self._blob_root().glob("*/*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield BlobInfo(digest=path.name, size=stat.st_size, modified_at=stat.st_mtime)
+
+
+class ObjectStoreBlobStore(BlobStore):
+    """模拟对象存储的本地后端：`<bucket>/objects/<key>` 保存内容，`<bucket>/meta/<key>.json` 保存元数据。
+
+    对象只写一次、按 key 覆盖，目录结构与 S3/MinIO 的 bucket + key 对应，便于迁移到真实对象存储。
+    """
+
+    def __init__(self, root: str, bucket: str = "uploads") -> None:
+        super().__init__(root)
+        self.bucket = self.root / bucket
+        (self.bucket / "meta").mkdir(parents=True, exist_ok=True)
+
+    def _blob_root(self) -> Path:
+        return self.bucket / "objects"
+
+    @staticmethod
+    def key(digest: str) -> str:
+        return f"sha256-{digest}"
+
+    def path(self, digest: str) -> Path:
+        return self._blob_root() / self.key(digest)
+
+    def _meta_path(self, digest: str) -> Path:
+        return self.bucket / "meta" / f"{self.key(digest)}.json"
+
+    def _on_stored(self, digest: str, target: Path) -> None:
+        meta = {"key": self.key(digest), "sha256": digest, "size": target.stat().st_size, "created_at": time.time()}
+        self._meta_path(digest).write_text(json.dumps(meta), encoding="utf-8")
+
+    def delete(self, digest: str) -> None:
+        super().delete(digest)
+        self._meta_path(digest).unlink(missing_ok=True)
+
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        prefix = len(self.key(""))
+        for path in self._blob_root().glob("sha256-*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield BlobInfo(digest=path.name[prefix:], size=stat.st_size, modified_at=stat.st_mtime)
+
+
+def blob_refcounts(projects: ProjectStore) -> Counter:
+    """统计各 blob 被项目资产引用的次数（以项目存储为准），只读取资产摘要，不加载完整项目。"""
+    return Counter(projects.asset_digests())
+
+
+def collect_garbage(
+    blobs: BlobStore, projects: ProjectStore, grace_seconds: float, now: Optional[float] = None
+) -> GCStats:
+    """删除没有项目引用且超过宽限期的 blob。
+
+    宽限期保护刚上传、尚未写入项目的内容；重复上传会刷新 blob 的时间戳。
+    """
+    now = now if now is not None else time.time()
+    refcounts = blob_refcounts(projects)
+    stats = GCStats()
+    for blob in blobs.iter_blobs():
+        stats.scanned += 1
+        if refcounts[blob.digest] > 0:
+            stats.live += 1
+            continue
+        if now - blob.modified_at < grace_seconds:
+            continue
+        freed = blobs.delete_if_stale(blob.digest, now - grace_seconds)
+        if freed is None:
+            continue
+        stats.deleted += 1
+        stats.freed_bytes += freed
+    stats.stale_parts = blobs.compact(grace_seconds, now)
+    return stats
+
+
+class BlobCollector:
+    """后台定期执行 `collect_garbage` 的任务，随应用生命周期启停。"""
+
+    def __init__(self, blobs: BlobStore, projects: ProjectStore, interval: float, grace_seconds: float) -> None:
+        self.blobs = blobs
+        self.projects = projects
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def run_once(self) -> GCStats:
+        with self._lock:
+            stats = collect_garbage(self.blobs, self.projects, self.grace_seconds)
+        if stats.deleted or stats.stale_parts:
+            logger.info("blob GC 删除 %d 个对象（%d 字节），清理 %d 个暂存文件", stats.deleted, stats.freed_bytes, stats.stale_parts)
+        return stats
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("blob GC 失败")
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def create_blob_store(config: Settings) -> BlobStore:
+    if config.blob_backend == "local":
+        return LocalBlobStore(config.storage_dir)
+    if config.blob_backend == "object":
+        return ObjectStoreBlobStore(config.storage_dir, config.blob_bucket)
+    raise ValueError(f"Unknown blob backend: {config.blob_backend}")
+
+
+blob_store = create_blob_store(settings)
+blob_collector = BlobCollector(
+    blob_store, store, settings.blob_gc_interval_seconds, settings.blob_gc_grace_seconds
+)
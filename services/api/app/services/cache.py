@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import math
+import os
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from ..core.config import Settings, settings
+from .metrics import metrics
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+cache_requests = metrics.counter("protoweaver_cache_requests", "Stage cache lookups by result", ("stage", "result"))
+cache_entries = metrics.gauge("protoweaver_cache_entries", "Entries held by the generation cache")
+
+
+def content_hash(*parts: Union[bytes, str, None]) -> str:
+    """对若干输入计算稳定的 sha256 摘要，作为内容寻址的缓存键。"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            digest.update(b"\x00")
+            continue
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class CacheBackend(ABC):
+    """缓存后端接口，`get` 未命中时返回 `default`。"""
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内 LRU + TTL 缓存。"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class DiskCacheBackend(CacheBackend):
+    """基于文件的缓存，按摘要前缀分片存放 pickle 文件。
+
+    与 `MemoryCacheBackend` 一致，TTL 从写入时算起（mtime），读取不会延长有效期；
+    读取时显式刷新 atime，淘汰按 atime 近似 LRU，超出上限时一次淘汰到 `evict_ratio` 以下。
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_entries: int = 4096,
+        ttl_seconds: Optional[float] = None,
+        evict_ratio: float = 0.9,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_ratio = evict_ratio
+        self._lock = threading.Lock()
+        self._count = sum(1 for _ in self.directory.glob("*/*.pkl"))
+
+    def _path(self, key: str) -> Path:
+        shard = key.rpartition("-")[2][:2]
+        return self.directory / shard / f"{key}.pkl"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return default
+        if self.ttl_seconds and stat.st_mtime + self.ttl_seconds <= time.time():
+            self.delete(key)
+            return default
+        try:
+            with path.open("rb") as handle:
+                value = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.delete(key)
+            return default
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:  # 读取后被并发淘汰，已读到的值仍然有效
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with tmp_path.open("wb") as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            existed = path.exists()
+            os.replace(tmp_path, path)
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*/*.pkl"):
+            try:
+                entries.append((path.stat().st_atime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort(key=lambda item: item[0])
+        target = math.ceil(self.max_entries * self.evict_ratio)
+        overflow = max(len(entries) - target, 0)
+        for _, path in entries[:overflow]:
+            path.unlink(missing_ok=True)
+        self._count = len(entries) - overflow
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        with self._lock:
+            if path.exists():
+                path.unlink(missing_ok=True)
+                self._count = max(self._count - 1, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.directory.glob("*/*.pkl"):
+                path.unlink(missing_ok=True)
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class StageCache:
+    """按流水线阶段划分命名空间的内容寻址缓存，并记录每个阶段的命中率。
+
+    缓存值在写入与读取时都会深拷贝，调用方可以放心修改返回的对象。
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+        self.stats: Dict[str, CacheStats] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, hit: bool) -> None:
+        cache_requests.inc(stage=stage, result="hit" if hit else "miss")
+        with self._lock:
+            stats = self.stats.setdefault(stage, CacheStats())
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    def lookup(self, stage: str, key: str) -> Tuple[bool, Any]:
+        value = self.backend.get(f"{stage}-{key}", _MISSING)
+        if value is _MISSING:
+            self._record(stage, hit=False)
+            return False, None
+        self._record(stage, hit=True)
+        return True, copy.deepcopy(value)
+
+    def store(self, stage: str, key: str, value: Any) -> None:
+        self.backend.set(f"{stage}-{key}", copy.deepcopy(value))
+
+    def get_or_compute(self, stage: str, key: str, compute: Callable[[], T]) -> T:
+        hit, value = self.lookup(stage, key)
+        if hit:
+            return value
+        value = compute()
+        self.store(stage, key, value)
+        return value
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self.stats.clear()
+
+
+def build_cache(config: Settings) -> StageCache:
+    ttl = config.cache_ttl_seconds or None
+    if config.cache_backend == "disk":
+        backend: CacheBackend = DiskCacheBackend(config.cache_dir, config.cache_max_entries, ttl)
+    elif config.cache_backend == "memory":
+        backend = MemoryCacheBackend(config.cache_max_entries, ttl)
+    else:
+        raise ValueError(f"Unknown cache backend: {config.cache_backend}")
+    return StageCache(backend)
+
+
+generation_cache = build_cache(settings)
+cache_entries.set_function(lambda: len(generation_cache.backend))
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..core.config import settings
+from ..schemas.project import CodeBundle, LayoutNode, UIIRPayload
+from .cache import MemoryCacheBackend, content_hash
+from .metrics import metrics
+from .templates import Template
+
+fragment_requests = metrics.counter(
+    "protoweaver_codegen_fragments", "JSX fragment cache lookups by result", ("result",)
+)
+
+
+@dataclass(frozen=True)
+class FileRenderer:
+    """描述一个产物文件：输出路径、渲染函数以及它读取的 UI-IR 路径。
+
+    `depends_on` 中的路径用 `.` 分隔（如 `metadata.accent`），为空表示与 UI-IR 无关的静态文件。
+    """
+
+    path: str
+    render: Callable[[UIIRPayload], str]
+    depends_on: Tuple[str, ...] = ()
+
+
+def _is_affected(depends_on: Tuple[str, ...], changed: Iterable[str]) -> bool:
+    for dependency in depends_on:
+        for path in changed:
+            if path == dependency or dependency.startswith(f"{path}.") or path.startswith(f"{dependency}."):
+                return True
+    return False
+
+
+def file_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def generate_code(
+    ui_ir: UIIRPayload,
+    previous: Optional[CodeBundle] = None,
+    changed: Optional[Iterable[str]] = None,
+) -> CodeBundle:
+    """渲染代码包。
+
+    同时传入上一版代码包 `previous` 与本次修改过的 UI-IR 路径 `changed` 时，
+    只重新渲染依赖这些路径的文件，其余文件直接沿用上一版内容与哈希。
+    """
+    changed_paths = set(changed) if changed is not None else None
+    files: Dict[str, str] = {}
+    hashes: Dict[str, str] = {}
+    for renderer in RENDERERS:
+        reusable = (
+            previous is not None
+            and changed_paths is not None
+            and renderer.path in previous.files
+            and not _is_affected(renderer.depends_on, changed_paths)
+        )
+        if reusable:
+            content = previous.files[renderer.path]
+            hashes[renderer.path] = previous.hashes.get(renderer.path) or file_hash(content)
+        else:
+            content = renderer.render(ui_ir)
+            hashes[renderer.path] = file_hash(content)
+        files[renderer.path] = content
+
+    return CodeBundle(framework="nextjs", entry="app/page.tsx", files=files, hashes=hashes)
+
+
+def changed_files(previous: CodeBundle, current: CodeBundle) -> List[str]:
+    """返回两个代码包之间内容发生变化（含新增）的文件路径。"""
+    return [path for path, digest in current.hashes.items() if previous.hashes.get(path) != digest]
+
+
+@lru_cache(maxsize=1)
+def _render_package_json() -> str:
+    return json.dumps(
+        {
+            "name": "proto-preview",
+            "private": True,
+            "scripts": {
+                "dev": "next dev",
+                "build": "next build",
+                "start": "next start",
+            },
+            "dependencies": {
+                "next": "^14.1.0",
+                "react": "^18.2.0",
+                "react-dom": "^18.2.0",
+                "tailwindcss": "^3.4.1",
+            },
+        },
+        indent=2,
+        ensure_ascii=False,
+    )
+
+
+def _js(value: Optional[str]) -> str:
+    """JSX 表达式形式的字符串字面量，避免文本中的引号或花括号破坏生成的代码。"""
+    return "{" + json.dumps(value, ensure_ascii=False) + "}"
+
+
+def _href(node: LayoutNode) -> str:
+    for event in node.events[:1]:
+        action = event.get("action")
+        if isinstance(action, dict) and isinstance(action.get("payload"), dict):
+            href = action["payload"].get("href")
+            if isinstance(href, str):
+                return href
+    return "#"
+
+
+@dataclass(frozen=True)
+class NodeTemplate:
+    """某一类节点的 JSX 片段模板，可用的插值为 `id`、`type`、`text`、`href` 与块插槽 `children`。"""
+
+    template: Template
+    default_text: str = ""
+
+    def render_into(self, node: LayoutNode, out: List[str], indent: str) -> None:
+        self.template.render_into(
+            out,
+            indent,
+            id=_js(node.id),
+            type=_js(node.type),
+            text=_js(node.text if node.text is not None else self.default_text),
+            href=_js(_href(node)),
+            children=lambda buffer, child_indent: _write_children(node, buffer, child_indent),
+        )
+
+
+NODE_TEMPLATES: Dict[str, NodeTemplate] = {
+    "hero": NodeTemplate(
+        Template("""
+            <section data-node-id={{ id }} className="flex flex-col items-center gap-6 py-16">
+              <h1 className="text-4xl font-bold text-slate-900">{{ text }}</h1>
+              <div className="flex gap-4">
+                {{> children }}
+              </div>
+            </section>
+        """),
+        "欢迎使用 ProtoWeaver",
+    ),
+    "button": NodeTemplate(
+        Template("""
+            <Link href={{ href }} data-node-id={{ id }} className="px-6 py-3 rounded-lg bg-blue-600 text-white">
+              {{ text }}
+            </Link>
+        """),
+        "点击",
+    ),
+    "section": NodeTemplate(
+        Template("""
+            <section data-node-id={{ id }} className="grid md:grid-cols-3 gap-6">
+              {{> children }}
+            </section>
+        """)
+    ),
+    "card": NodeTemplate(
+        Template("""
+            <div data-node-id={{ id }} className="rounded-xl border border-slate-200 bg-white p-6 shadow-sm">
+              <h3 className="text-lg font-semibold text-slate-900">{{ text }}</h3>
+            </div>
+        """),
+        "功能描述",
+    ),
+}
+DEFAULT_NODE_TEMPLATE = NodeTemplate(
+    Template("""
+        <div data-node-id={{ id }} className="p-4 border border-dashed border-slate-300">
+          <span className="text-xs uppercase tracking-wide text-slate-500">{{ type }}</span>
+          {{> children }}
+        </div>
+    """)
+)
+
+PAGE_TEMPLATE = Template("""
+    'use client';
+
+    import React from 'react';
+    import Link from 'next/link';
+
+    export default function Page() {
+      return (
+        <main className="min-h-screen bg-slate-50 text-slate-900">
+          <div className="mx-auto flex max-w-5xl flex-col gap-12 px-6 py-16">
+            {{> tree }}
+          </div>
+        </main>
+      );
+    }
+""")
+
+# 子树摘要按节点对象缓存：布局树按不可变方式更新，未修改的子树在迭代之间是同一个对象，
+# 缓存项持有节点引用，保证 id() 不会被复用。
+_subtree_digests = MemoryCacheBackend(max_entries=settings.codegen_fragment_cache_entries)
+# JSX 片段按 (子树摘要, 缩进) 缓存，相同内容的子树在不同版本、不同项目之间复用。
+fragment_cache = MemoryCacheBackend(max_entries=settings.codegen_fragment_cache_entries)
+
+
+def subtree_digest(node: LayoutNode) -> str:
+    """节点及其子树中参与 JSX 渲染的字段（id/type/text/href）的摘要。"""
+    key = str(id(node))
+    entry = _subtree_digests.get(key)
+    if entry is not None and entry[0] is node:
+        return entry[1]
+    digest = content_hash(node.id, node.type, node.text, _href(node), *(subtree_digest(child) for child in node.children))
+    _subtree_digests.set(key, (node, digest))
+    return digest
+
+
+def _write_children(node: LayoutNode, out: List[str], indent: str) -> None:
+    for child in node.children:
+        _write_node(child, out, indent)
+
+
+def _write_node(node: LayoutNode, out: List[str], indent: str) -> None:
+    key = f"{subtree_digest(node)}:{len(indent)}"
+    fragment = fragment_cache.get(key)
+    fragment_requests.inc(result="miss" if fragment is None else "hit")
+    if fragment is None:
+        buffer: List[str] = []
+        NODE_TEMPLATES.get(node.type, DEFAULT_NODE_TEMPLATE).render_into(node, buffer, indent)
+        fragment = "".join(buffer)
+        fragment_cache.set(key, fragment)
+    out.append(fragment)
+
+
+def _render_next_page(ui_ir: UIIRPayload) -> str:
+    # 页面只依赖 layout_tree，不写入 id/created_at，相同布局因此得到相同的代码，便于按内容缓存。
+    return PAGE_TEMPLATE.render(tree=lambda out, indent: _write_node(ui_ir.layout_tree, out, indent))
+
+
+@lru_cache(maxsize=1)
+def _render_layout() -> str:
+    return """import './globals.css';
+import type { Metadata } from 'next';
+
+export const metadata: Metadata = {
+  title: 'ProtoWeaver Preview',
+  description: 'Generated by ProtoWeaver',
+};
+
+export default function RootLayout({ children }: { children: React.ReactNode }) {
+  return (
+    <html lang="zh-CN">
+      <body>{children}</body>
+    </html>
+  );
+}
+"""
+
+
+@lru_cache(maxsize=1)
+def _render_tailwind() -> str:
+    return """/** @type {import('tailwindcss').Config} */
+module.exports = {
+  content: ['./app/**/*.{ts,tsx,js,jsx}', './components/**/*.{ts,tsx,js,jsx}'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
+"""
+
+
+@lru_cache(maxsize=1)
+def _render_postcss() -> str:
+    return """module.exports = {
+  plugins: {
+    tailwindcss: {},
+    autoprefixer: {},
+  },
+};
+"""
+
+
+GLOBALS_TEMPLATE = Template("""
+    @tailwind base;
+    @tailwind components;
+    @tailwind utilities;
+
+    :root {
+      --accent: {{ accent }};
+    }
+
+    body {
+      font-family: 'Inter', sans-serif;
+    }
+""")
+
+
+def _render_globals(ui_ir: UIIRPayload) -> str:
+    accent = ui_ir.metadata.get("accent", "#3b82f6") if ui_ir.metadata else "#3b82f6"
+    return GLOBALS_TEMPLATE.render(accent=str(accent))
+
+
+RENDERERS: Tuple[FileRenderer, ...] = (
+    FileRenderer("package.json", lambda _: _render_package_json()),
+    FileRenderer("app/page.tsx", _render_next_page, ("layout_tree",)),
+    FileRenderer("app/layout.tsx", lambda _: _render_layout()),
+    FileRenderer("tailwind.config.js", lambda _: _render_tailwind()),
+    FileRenderer("postcss.config.js", lambda _: _render_postcss()),
+    FileRenderer("globals.css", _render_globals, ("metadata.accent",)),
+)
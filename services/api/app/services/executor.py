@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
+
+from ..core.config import Settings, settings
+from .metrics import metrics, span
+
+T = TypeVar("T")
+
+executor_wait = metrics.histogram(
+    "protoweaver_executor_wait_seconds", "Time a stage call waited for its concurrency slot", ("stage",)
+)
+executor_pending = metrics.gauge("protoweaver_executor_pending", "Stage calls currently queued or running")
+executor_rejected = metrics.counter(
+    "protoweaver_executor_rejected", "Stage calls rejected because the executor was saturated", ("stage",)
+)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """排队中的阶段任务已达上限，调用方应稍后重试。"""
+
+
+class StageExecutor:
+    """把流水线阶段从事件循环调度到线程池 / 进程池执行。
+
+    - `process_stages` 中的 CPU 密集阶段在进程池执行（`process_workers` 为 0 时退回线程池）；
+    - `stage_limits` 限制每个阶段的并发数，超出的调用在事件循环上等待，不占用池中的线程；
+    - 所有阶段合计的在途调用超过 `max_pending` 时直接抛出 `ExecutorSaturatedError`。
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = 8,
+        process_workers: int = 0,
+        max_pending: int = 64,
+        stage_limits: Optional[Dict[str, int]] = None,
+        process_stages: Iterable[str] = (),
+    ) -> None:
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_pending = max_pending
+        self.stage_limits = dict(stage_limits or {})
+        self.process_stages = frozenset(process_stages)
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _pool(self, stage: str) -> Executor:
+        with self._lock:
+            if stage in self.process_stages and self.process_workers > 0:
+                if self._processes is None:
+                    self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+                return self._processes
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="pw-stage")
+            return self._threads
+
+    def _semaphore(self, stage: str) -> Optional[asyncio.Semaphore]:
+        limit = self.stage_limits.get(stage)
+        if not limit:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if stage not in semaphores:
+                semaphores[stage] = asyncio.Semaphore(limit)
+            return semaphores[stage]
+
+    async def run(self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                executor_rejected.inc(stage=stage)
+                raise ExecutorSaturatedError(f"Too many pending pipeline tasks ({self._pending})")
+            self._pending += 1
+        try:
+            semaphore = self._semaphore(stage)
+            call = functools.partial(fn, *args, **kwargs)
+            loop = asyncio.get_running_loop()
+            queued_at = time.perf_counter()
+            if semaphore is None:
+                executor_wait.observe(0.0, stage=stage)
+                with span(stage):
+                    return await loop.run_in_executor(self._pool(stage), call)
+            async with semaphore:
+                executor_wait.observe(time.perf_counter() - queued_at, stage=stage)
+                with span(stage):
+                    return await loop.run_in_executor(self._pool(stage), call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            threads, processes = self._threads, self._processes
+            self._threads = self._processes = None
+        if threads is not None:
+            threads.shutdown(wait=wait)
+        if processes is not None:
+            processes.shutdown(wait=wait)
+
+
+def build_executor(config: Settings) -> StageExecutor:
+    return StageExecutor(
+        thread_workers=config.executor_threads,
+        process_workers=config.executor_processes,
+        max_pending=config.executor_max_pending,
+        stage_limits=config.stage_concurrency,
+        process_stages=config.executor_process_stages,
+    )
+
+
+stage_executor = build_executor(settings)
+executor_pending.set_function(lambda: stage_executor.pending)
@@ -0,0 +1,574 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+import uuid
+from collections import deque
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Any, Callable, Dict, Generic, Iterable, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from ..core.config import settings
+from ..schemas.project import LayoutNode, UIIRPatch
+from .layout_index import LayoutIndex
+from .metrics import metrics
+from .patches import node_payload
+
+T = TypeVar("T")
+
+intent_commands = metrics.counter("protoweaver_intent_commands", "Commands recognised in iteration messages", ("action",))
+
+
+@dataclass(frozen=True)
+class Lexeme:
+    """词表中的一个词条：`kind` 为 action/component/pronoun/ordinal/count/all/position/style/separator。"""
+
+    kind: str
+    value: Any = None
+    plural: bool = False
+
+
+@dataclass(frozen=True)
+class Match(Generic[T]):
+    start: int
+    end: int
+    value: T
+
+
+class Automaton(Generic[T]):
+    """Aho-Corasick 多模式匹配：所有词条编译进同一个自动机，一次扫描找出全部命中，耗时与词表大小无关。
+
+    纯 ASCII 字母数字的词条要求两侧是单词边界（`-`/`_` 也视为单词字符，`cta-button` 不会命中 `button`）。
+    """
+
+    def __init__(self, terms: Mapping[str, T]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[Tuple[int, T], ...]] = [()]
+        self._bounded: Dict[str, bool] = {}
+        for term, value in terms.items():
+            self._add(term, value)
+        self._link()
+
+    def _add(self, term: str, value: T) -> None:
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = ((len(term), value),)
+        self._bounded[term] = term.isascii() and term[0].isalnum() and term[-1].isalnum()
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, target in self._goto[state].items():
+                queue.append(target)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(char, 0)
+                self._fail[target] = link if link != target else 0
+                self._output[target] = self._output[target] + self._output[self._fail[target]]
+
+    def find_all(self, text: str) -> List[Match[T]]:
+        goto, fail, output = self._goto, self._fail, self._output
+        matches: List[Match[T]] = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                matches.append(Match(position + 1 - length, position + 1, value))
+        return matches
+
+    def find(self, text: str) -> List[Match[T]]:
+        """最左最长、互不重叠的命中。"""
+        selected: List[Match[T]] = []
+        end = 0
+        for match in sorted(self.find_all(text), key=lambda item: (item.start, item.start - item.end)):
+            if match.start < end or not self._on_boundary(text, match):
+                continue
+            selected.append(match)
+            end = match.end
+        return selected
+
+    def _on_boundary(self, text: str, match: Match[T]) -> bool:
+        if not self._bounded.get(text[match.start : match.end]):
+            return True
+        before = text[match.start - 1] if match.start > 0 else " "
+        after = text[match.end] if match.end < len(text) else " "
+        return not (_is_word_char(before) or _is_word_char(after))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and (char.isalnum() or char in "-_")
+
+
+_CN_NUMBERS = {"一": 1, "两": 2, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+_EN_COUNTS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+_EN_ORDINALS = {"first": 0, "second": 1, "third": 2, "fourth": 3, "fifth": 4, "last": -1}
+_CN_CLASSIFIERS = ("个", "张", "块", "排")
+
+COLORS = {
+    "#ef4444": ("红色", "红", "red"),
+    "#f97316": ("橙色", "orange"),
+    "#eab308": ("黄色", "yellow"),
+    "#22c55e": ("绿色", "green"),
+    "#3b82f6": ("蓝色", "blue"),
+    "#8b5cf6": ("紫色", "purple"),
+    "#111827": ("黑色", "black"),
+    "#ffffff": ("白色", "white"),
+    "#6b7280": ("灰色", "gray", "grey"),
+}
+
+VOCABULARY: Dict[str, Dict[Any, Tuple[str, ...]]] = {
+    "action": {
+        "add": ("添加", "新增", "增加", "加", "加上", "插入", "放", "放置", "add", "insert", "create", "append", "put"),
+        "remove": ("删除", "删掉", "去掉", "移除", "拿掉", "remove", "delete", "drop"),
+        "move": ("移动", "移到", "挪到", "放到", "移至", "move"),
+        "restyle": ("改成", "改为", "换成", "设为", "设置为", "变成", "染成", "make", "change", "turn", "paint", "restyle"),
+    },
+    "component": {
+        "button": ("按钮", "button"),
+        "card": ("卡片", "card"),
+        "section": ("区块", "分区", "section"),
+        "hero": ("首屏", "横幅", "hero", "banner"),
+        "input": ("输入框", "input", "textbox"),
+        "image": ("图片", "image", "picture"),
+        "text": ("文本", "文字", "段落", "text", "paragraph"),
+    },
+    "pronoun": {None: ("它们", "它", "them", "it", "they")},
+    "all": {True: ("所有", "全部", "每个", "all", "every")},
+    "position": {
+        "start": ("顶部", "最上面", "最前面", "开头", "前面", "top", "beginning", "start", "front"),
+        "end": ("底部", "最下面", "最后面", "末尾", "后面", "下方", "bottom", "end"),
+    },
+    "style": {
+        ("fontWeight", 700): ("加粗", "粗体", "bold"),
+        ("borderRadius", 12): ("圆角", "rounded"),
+        **{("color", color): terms for color, terms in COLORS.items()},
+    },
+    "separator": {None: ("，", ",", "。", ".", "；", ";", "然后", "接着", "then")},
+}
+
+_PLURALS = {"button": ("buttons",), "card": ("cards",), "section": ("sections",), "input": ("inputs",), "image": ("images",)}
+
+
+def build_vocabulary() -> Dict[str, Lexeme]:
+    """展开默认词表：动作 × 组件类型 × 序数/数量/位置/样式，中英文同一张表。"""
+    terms: Dict[str, Lexeme] = {}
+    for kind, groups in VOCABULARY.items():
+        for value, words in groups.items():
+            for word in words:
+                terms[word] = Lexeme(kind, value)
+    for component, words in _PLURALS.items():
+        for word in words:
+            terms[word] = Lexeme("component", component, plural=True)
+    for numeral, number in _CN_NUMBERS.items():
+        for classifier in _CN_CLASSIFIERS:
+            terms[f"{numeral}{classifier}"] = Lexeme("count", number)
+            terms[f"第{numeral}{classifier}"] = Lexeme("ordinal", number - 1)
+        terms[f"第{numeral}"] = Lexeme("ordinal", number - 1)
+    for classifier in _CN_CLASSIFIERS:
+        terms[f"最后一{classifier}"] = Lexeme("ordinal", -1)
+    terms["最后"] = Lexeme("ordinal", -1)
+    terms.update({word: Lexeme("count", number) for word, number in _EN_COUNTS.items()})
+    terms.update({word: Lexeme("ordinal", number) for word, number in _EN_ORDINALS.items()})
+    return terms
+
+
+@dataclass(frozen=True)
+class Target:
+    """指令中提到的节点：按类型（可带序数或“全部”）或按 id 引用；`anaphor` 指代上一条指令操作过的节点。"""
+
+    type: Optional[str] = None
+    ref: Optional[str] = None
+    ordinal: Optional[int] = None
+    all: bool = False
+    anaphor: bool = False
+    start: int = 0
+
+
+@dataclass(frozen=True)
+class Command:
+    action: str
+    subject: Optional[Target] = None
+    destination: Optional[Target] = None
+    count: int = 1
+    text: Optional[str] = None
+    position: Optional[str] = None
+    style: Tuple[Tuple[str, Any], ...] = ()
+
+
+_QUOTED = re.compile(r"[\"“「『']([^\"”」』']+)[\"”」』']")
+_QUOTE_MARK = "\ue000"  # 引号内容在匹配前替换为私用区字符，避免其中的词被当作指令
+_REF = re.compile(r"#?[a-z0-9][a-z0-9_-]*")
+_HEX_COLOR = re.compile(r"#(?:[0-9a-f]{3}|[0-9a-f]{6})")
+_CJK_FILLER = re.compile(r"[的了个只\s]+")
+_MAX_COUNT = 10
+
+
+def normalize_message(message: str) -> str:
+    """NFKC 规整全角字符并合并空白；引号内的文字保留原样，其余部分转小写。"""
+    text = " ".join(unicodedata.normalize("NFKC", message).split())
+    parts = []
+    position = 0
+    for match in _QUOTED.finditer(text):
+        parts.append(text[position : match.start()].lower())
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(text[position:].lower())
+    return "".join(parts)
+
+
+@dataclass
+class _Clause:
+    start: int
+    end: int
+    lexemes: List[Match[Lexeme]] = field(default_factory=list)
+
+
+class IntentEngine:
+    """基于规则的指令解析：词表编译为一个自动机，单次扫描得到词条，再按子句填充槽位得到 `Command`。
+
+    解析结果按规整后的消息缓存（`PROTOWEAVER_INTENT_CACHE_SIZE`），同一指令重复出现时不再扫描；
+    生成 patch 依赖当前布局，每次通过 `LayoutIndex` 解析目标节点。
+    """
+
+    def __init__(self, vocabulary: Optional[Mapping[str, Lexeme]] = None, cache_size: int = 1024) -> None:
+        self.vocabulary: Dict[str, Lexeme] = dict(vocabulary if vocabulary is not None else build_vocabulary())
+        self.cache_size = cache_size
+        self._compile()
+
+    def _compile(self) -> None:
+        self.automaton: Automaton[Lexeme] = Automaton(self.vocabulary)
+        self._parse_normalized: Callable[[str], Tuple[Command, ...]] = lru_cache(maxsize=self.cache_size)(self._parse)
+
+    def register(self, terms: Mapping[str, Lexeme]) -> None:
+        """追加词条并重新编译；匹配仍是一次扫描，新增词条不会让单条消息变慢。"""
+        self.vocabulary.update(terms)
+        self._compile()
+
+    def parse(self, message: str) -> Tuple[Command, ...]:
+        return self._parse_normalized(normalize_message(message))
+
+    def cache_info(self) -> Any:
+        return self._parse_normalized.cache_info()  # type: ignore[attr-defined]
+
+    def first_color(self, message: str) -> Optional[str]:
+        """消息中第一个提到的颜色（颜色词或十六进制色值），不要求出现在指令中。"""
+        scan = _QUOTED.sub(_QUOTE_MARK, normalize_message(message))
+        found = [
+            (match.start, match.value.value[1])
+            for match in self.automaton.find(scan)
+            if match.value.kind == "style" and match.value.value[0] == "color"
+        ]
+        found.extend((word.start(), word.group(0)) for word in _REF.finditer(scan) if _HEX_COLOR.fullmatch(word.group(0)))
+        return min(found)[1] if found else None
+
+    def _parse(self, text: str) -> Tuple[Command, ...]:
+        quoted = [match.group(1) for match in _QUOTED.finditer(text)]
+        scan = _QUOTED.sub(_QUOTE_MARK, text)
+        clauses = [_Clause(0, 0)]
+        for match in self.automaton.find(scan):
+            if match.value.kind == "separator":
+                clauses[-1].end = match.start
+                clauses.append(_Clause(match.end, match.end))
+            else:
+                clauses[-1].lexemes.append(match)
+        clauses[-1].end = len(scan)
+
+        commands: List[Command] = []
+        quotes = iter(quoted)
+        previous_action: Optional[str] = None
+        for clause in clauses:
+            texts = [next(quotes, "") for _ in range(scan.count(_QUOTE_MARK, clause.start, clause.end))]
+            command = self._clause_command(scan, clause, texts, previous_action)
+            if command is not None:
+                commands.append(command)
+                previous_action = command.action
+        return tuple(commands)
+
+    def _clause_command(
+        self, scan: str, clause: _Clause, quoted: List[str], previous_action: Optional[str]
+    ) -> Optional[Command]:
+        action: Optional[Match[Lexeme]] = None
+        mentions: List[Target] = []
+        count: Optional[Match[Lexeme]] = None
+        position: Optional[str] = None
+        style: Dict[str, Any] = {}
+        ordinal: Optional[int] = None
+        select_all = False
+        cursor = clause.start
+
+        def take_refs(until: int) -> None:
+            for word in _REF.finditer(scan, cursor, until):
+                ref = word.group(0)
+                if _HEX_COLOR.fullmatch(ref):
+                    style["color"] = ref
+                elif ref.startswith("#") or any(char in ref for char in "-_0123456789"):
+                    mentions.append(Target(ref=ref.lstrip("#"), start=word.start()))
+
+        for match in clause.lexemes:
+            take_refs(match.start)
+            cursor = match.end
+            lexeme = match.value
+            if lexeme.kind == "action" and action is None:
+                action = match
+            elif lexeme.kind == "component":
+                mentions.append(
+                    Target(type=lexeme.value, ordinal=ordinal, all=select_all or lexeme.plural, start=match.start)
+                )
+                ordinal, select_all = None, False
+            elif lexeme.kind == "pronoun":
+                mentions.append(Target(anaphor=True, start=match.start))
+            elif lexeme.kind == "ordinal":
+                ordinal = lexeme.value
+            elif lexeme.kind == "all":
+                select_all = True
+            elif lexeme.kind == "count":
+                count = match
+            elif lexeme.kind == "position":
+                position = lexeme.value
+            elif lexeme.kind == "style":
+                key, value = lexeme.value
+                style[key] = value
+        take_refs(clause.end)
+        mentions.sort(key=lambda target: target.start)
+
+        # 没有动作词的子句只沿用上一子句的动作；单独的样式词（“我喜欢红色按钮”）不构成指令。
+        kind = action.value.value if action is not None else previous_action
+        if kind is None or (not mentions and not style and kind != "add"):
+            return None
+        # 删除/移动必须指向组件，只带样式词的子句（如“删除红色”）无法执行。
+        if kind in ("remove", "move") and not mentions:
+            return None
+        if kind == "add":
+            after = [target for target in mentions if action is None or target.start >= action.start]
+            subject = next((target for target in after if target.type), None) or next(
+                (target for target in reversed(mentions) if target.type), None
+            )
+            if subject is None:
+                return None
+            others = [target for target in mentions if target is not subject]
+            text = quoted[0] if quoted else self._gap_text(scan, clause.lexemes, subject)
+            number = count.value.value if count is not None else 1
+            return Command(
+                "add",
+                subject=replace(subject, ordinal=None, all=False),
+                destination=others[0] if others else None,
+                count=max(1, min(number, _MAX_COUNT)),
+                text=text,
+                position=position,
+                style=tuple(sorted(style.items())),
+            )
+        if kind == "move":
+            destination = mentions[-1] if len(mentions) > 1 else None
+            return Command("move", subject=mentions[0], destination=destination, position=position)
+        if kind == "restyle":
+            if not style:
+                return None
+            # 省略主语（“把按钮改成红色，加粗”）等同于“它”，指代上一条指令操作过的节点。
+            subject = mentions[0] if mentions else Target(anaphor=True, start=clause.start)
+            return Command("restyle", subject=subject, style=tuple(sorted(style.items())))
+        return Command("remove", subject=mentions[0])
+
+    @staticmethod
+    def _gap_text(scan: str, lexemes: Sequence[Match[Lexeme]], subject: Target) -> Optional[str]:
+        """中文指令里紧跟在动作/数量词之后、组件词之前的文字作为节点文本，例如“加一个立即体验按钮”。"""
+        anchor = None
+        for match in lexemes:
+            if match.end > subject.start:
+                break
+            anchor = match
+        if anchor is None or anchor.value.kind not in ("action", "count"):
+            return None
+        gap = _CJK_FILLER.sub("", scan[anchor.end : subject.start])
+        if not gap or gap.isascii():
+            return None
+        return gap
+
+
+# 新增节点的默认内容，按组件类型区分。
+NEW_COMPONENTS: Dict[str, Dict[str, Any]] = {
+    "button": {"prefix": "cta", "text": "新增按钮"},
+    "card": {"prefix": "card", "text": "新卡片"},
+    "section": {"prefix": "section", "layout": {"direction": "row", "gap": 16}},
+    "hero": {"prefix": "hero", "text": "新横幅"},
+    "input": {"prefix": "input", "placeholder": "请输入"},
+    "image": {"prefix": "image"},
+    "text": {"prefix": "text", "text": "新文本"},
+}
+_TEXT_COLOR_TYPES = {"text", "input"}
+
+
+def _new_node(component: str, text: Optional[str], style: Sequence[Tuple[str, Any]] = ()) -> LayoutNode:
+    spec = NEW_COMPONENTS.get(component, {"prefix": component})
+    fields = {key: value for key, value in spec.items() if key != "prefix"}
+    if style:
+        fields["style"] = {_style_key(component, key): value for key, value in style}
+    if text is not None:
+        fields["placeholder" if component == "input" else "text"] = text
+    if component == "button":
+        fields["events"] = [
+            {
+                "id": f"evt-{uuid.uuid4().hex[:6]}",
+                "trigger": "onClick",
+                "action": {"type": "emit", "payload": {"event": "custom"}},
+            }
+        ]
+    return LayoutNode(id=f"{spec['prefix']}-{uuid.uuid4().hex[:6]}", type=component, **fields)
+
+
+def _preorder(root: LayoutNode) -> Iterable[LayoutNode]:
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def _of_type(index: LayoutIndex, node_type: str) -> List[LayoutNode]:
+    """文档顺序的同类型节点（不含根节点），序数按此顺序解释。"""
+    return [node for node in _preorder(index.root) if node.type == node_type and node is not index.root]
+
+
+def resolve(
+    index: LayoutIndex, target: Target, default: str = "first", antecedents: Sequence[str] = ()
+) -> List[LayoutNode]:
+    """把指令中的目标解析为节点；未指定序数时按 `default`（first/last/all）选择，代词解析为 `antecedents`。"""
+    if target.anaphor:
+        return [node for node in map(index.get, antecedents) if node is not None]
+    if target.ref is not None:
+        node = index.get(target.ref)
+        return [node] if node is not None else []
+    nodes = _of_type(index, target.type or "")
+    if not nodes:
+        return []
+    if target.ordinal is not None:
+        return [nodes[target.ordinal]] if -len(nodes) <= target.ordinal < len(nodes) else []
+    if target.all or default == "all":
+        return nodes
+    return [nodes[-1] if default == "last" else nodes[0]]
+
+
+def _container(
+    index: LayoutIndex, component: str, destination: Optional[Target], antecedents: Sequence[str]
+) -> Optional[LayoutNode]:
+    """新增节点的父节点：指定了目标时插入目标，否则按钮默认进入 hero，其余放在同类节点旁边或根节点下。"""
+    if destination is not None:
+        nodes = resolve(index, destination, antecedents=antecedents)
+        return nodes[0] if nodes else None
+    if component == "button":
+        hero = index.get("hero") or next(iter(_of_type(index, "hero")), None)
+        if hero is not None:
+            return hero
+    siblings = _of_type(index, component)
+    if siblings:
+        return index.parent(siblings[-1].id) or index.root
+    return index.root
+
+
+def _within(index: LayoutIndex, node_id: str, ancestor_id: str) -> bool:
+    return ancestor_id in index.path(node_id)
+
+
+def _style_key(node_type: str, key: str) -> str:
+    """颜色作用于文字类组件的文字颜色，其余组件的背景色。"""
+    if key == "color" and node_type not in _TEXT_COLOR_TYPES:
+        return "background"
+    return key
+
+
+def plan_command(index: LayoutIndex, command: Command, antecedents: Sequence[str] = ()) -> List[UIIRPatch]:
+    """按当前布局把一条指令转换为 patch，并立即应用到 `index`，后续指令看到的是更新后的树。
+
+    `antecedents` 为上一条指令新增或修改的节点，代词与省略主语的目标解析为这些节点。
+    """
+    patches: List[UIIRPatch] = []
+
+    def emit(patch: UIIRPatch) -> None:
+        index.apply(patch)
+        patches.append(patch)
+
+    if command.action == "add" and command.subject is not None:
+        component = command.subject.type or "text"
+        container = _container(index, component, command.destination, antecedents)
+        if container is None:
+            return patches
+        for number in range(command.count):
+            text = command.text if command.count == 1 or command.text is None else f"{command.text} {number + 1}"
+            position = number if command.position == "start" else None
+            node = _new_node(component, text, command.style)
+            emit(UIIRPatch(target_id=container.id, op="insert", payload=node_payload(node), position=position))
+    elif command.action == "remove" and command.subject is not None:
+        for node in resolve(index, command.subject, default="last", antecedents=antecedents):
+            if node is not index.root and node.id in index:
+                emit(UIIRPatch(target_id=node.id, op="remove"))
+    elif command.action == "move" and command.subject is not None:
+        nodes = resolve(index, command.subject, antecedents=antecedents)
+        if not nodes or nodes[0] is index.root:
+            return patches
+        node = nodes[0]
+        if command.destination is not None:
+            destinations = resolve(index, command.destination, antecedents=antecedents)
+            parent = destinations[0] if destinations else None
+        else:
+            parent = index.parent(node.id)
+        if parent is None or _within(index, parent.id, node.id) or (command.destination is None and command.position is None):
+            return patches
+        emit(UIIRPatch(target_id=node.id, op="remove"))
+        position = 0 if command.position == "start" else None
+        emit(UIIRPatch(target_id=parent.id, op="insert", payload=node_payload(node), position=position))
+    elif command.action == "restyle" and command.subject is not None:
+        for node in resolve(index, command.subject, default="all", antecedents=antecedents):
+            style = {**node.style, **{_style_key(node.type, key): value for key, value in command.style}}
+            if style != node.style:
+                emit(UIIRPatch(target_id=node.id, op="update", payload={"style": style}))
+    if patches:
+        intent_commands.inc(action=command.action)
+    return patches
+
+
+def plan_patches(index: LayoutIndex, message: str, engine: Optional[IntentEngine] = None) -> List[UIIRPatch]:
+    """解析迭代指令并生成 patch 列表；patch 已依次应用到 `index`，`index.root` 即新的布局树。"""
+    patches: List[UIIRPatch] = []
+    antecedents: List[str] = []
+    for command in (engine or intent_engine).parse(message):
+        planned = plan_command(index, command, antecedents)
+        patches.extend(planned)
+        antecedents = _touched(planned)
+    return patches
+
+
+def _touched(patches: Sequence[UIIRPatch]) -> List[str]:
+    """一条指令新增、修改或移动后的节点 id（删除的节点除外），供下一条指令的代词引用。"""
+    touched: List[str] = []
+    for patch in patches:
+        if patch.op == "insert" and patch.payload:
+            touched.append(patch.payload["id"])
+        elif patch.op in ("update", "replace"):
+            touched.append(patch.target_id)
+    return touched
+
+
+def describe(message: Optional[str], engine: Optional[IntentEngine] = None) -> Dict[str, str]:
+    """从语音转写中提取全局意图：摘要与首个提到的颜色（作为主题强调色）。"""
+    if not message:
+        return {}
+    intent = {"summary": message, "tone": "modern", "accent_color": "#3b82f6"}
+    color = (engine or intent_engine).first_color(message)
+    if color is not None:
+        intent["accent_color"] = color
+    return intent
+
+
+intent_engine = IntentEngine(cache_size=settings.intent_cache_size)
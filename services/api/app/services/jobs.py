@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import Settings, settings
+from ..schemas.job import JobEvent, JobResponse, JobStatus
+from ..schemas.project import ProjectCreateResponse
+from .metrics import metrics, span
+from .pipeline import create_project_async
+from .uploads import UploadSource
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+job_wait = metrics.histogram("protoweaver_job_wait_seconds", "Time a generation job spent queued before starting")
+job_results = metrics.counter("protoweaver_jobs", "Finished generation jobs by status", ("status",))
+job_queue_depth = metrics.gauge("protoweaver_job_queue_depth", "Generation jobs waiting for a consumer")
+
+
+class JobQueueFullError(RuntimeError):
+    """排队中的任务已达上限，调用方应稍后重试。"""
+
+
+@dataclass
+class GenerationJob:
+    """一次异步生成任务，字段含义与 `services/worker` 中的 `MockTask` 对应。"""
+
+    job_id: str
+    sketch: UploadSource
+    audio: Optional[UploadSource]
+    transcript: Optional[str]
+    status: JobStatus = "queued"
+    events: List[JobEvent] = field(default_factory=list)
+    result: Optional[ProjectCreateResponse] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_response(self) -> JobResponse:
+        return JobResponse(
+            job_id=self.job_id,
+            status=self.status,
+            stage=self.events[-1].stage if self.events else None,
+            events=list(self.events),
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+            result=self.result,
+            error=self.error,
+        )
+
+
+class JobManager:
+    """生成任务队列：提交后立即返回 job id，由后台消费者依次执行流水线。
+
+    消费者运行在独立线程的事件循环中，与请求所在的事件循环解耦；
+    订阅者通过 `stream` 在各自的事件循环上接收阶段事件。排队中的任务超过 `max_queued` 时拒绝提交。
+    """
+
+    def __init__(self, consumers: int = 4, retention: int = 1000, max_queued: int = 256) -> None:
+        self.consumers = consumers
+        self.retention = retention
+        self.max_queued = max_queued
+        self._queued = 0
+        self._jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[JobEvent]"]]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[GenerationJob]"] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    self._queue = asyncio.Queue()
+                    for _ in range(self.consumers):
+                        loop.create_task(self._consume())
+                    ready.set()
+                    loop.run_forever()
+                    # 停止后取消仍在等待的消费者，避免事件循环被回收时留下未完成的协程。
+                    tasks = asyncio.all_tasks(loop)
+                    for task in tasks:
+                        task.cancel()
+                    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                    loop.close()
+
+                self._thread = threading.Thread(target=run, name="pw-jobs", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, sketch: UploadSource, audio: Optional[UploadSource], transcript: Optional[str]) -> GenerationJob:
+        job = GenerationJob(job_id=uuid.uuid4().hex, sketch=sketch, audio=audio, transcript=transcript)
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise JobQueueFullError(f"Too many queued generation jobs ({self._queued})")
+            self._queued += 1
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+        loop = self._ensure_started()
+        loop.call_soon_threadsafe(self._queue.put_nowait, job)  # type: ignore[union-attr]
+        logger.info("收到生成任务 %s", job.job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def full(self) -> bool:
+        return self._queued >= self.max_queued
+
+    def _evict_finished(self) -> None:
+        overflow = len(self._jobs) - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATUSES]:
+            if overflow <= 0:
+                break
+            del self._jobs[job_id]
+            overflow -= 1
+
+    def _publish(self, job: GenerationJob, stage: str, status: Optional[JobStatus] = None, **detail: object) -> None:
+        event = JobEvent(stage=stage, detail=detail)
+        with self._lock:
+            job.events.append(event)
+            job.updated_at = event.at
+            if status is not None:
+                job.status = status
+            subscribers = list(self._subscribers.get(job.job_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    async def _consume(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            with self._lock:
+                self._queued -= 1
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: GenerationJob) -> None:
+        job_wait.observe((datetime.utcnow() - job.created_at).total_seconds())
+        self._publish(job, "started", status="running")
+        try:
+            with span("job", job_id=job.job_id):
+                result = await create_project_async(
+                    job.sketch,
+                    job.audio,
+                    job.transcript,
+                    on_stage=lambda stage: self._publish(job, stage),
+                )
+        except Exception as exc:
+            logger.exception("生成任务 %s 失败", job.job_id)
+            job.error = str(exc)
+            job_results.inc(status="failed")
+            self._publish(job, "failed", status="failed", error=str(exc))
+            return
+        finally:
+            job.sketch, job.audio = b"", None
+        job.result = result
+        job_results.inc(status="succeeded")
+        self._publish(job, "completed", status="succeeded", project_id=result.project_id)
+
+    async def stream(self, job: GenerationJob) -> AsyncIterator[JobEvent]:
+        """依次产出任务已有及后续的阶段事件，任务结束后停止。
+
+        接收任务对象而不是 id：任务在订阅前被保留策略移出 `_jobs` 时仍能读到完整事件。
+        """
+        queue: "asyncio.Queue[JobEvent]" = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        job_id = job.job_id
+        with self._lock:
+            history = list(job.events)
+            self._subscribers.setdefault(job_id, []).append(entry)
+        try:
+            for event in history:
+                yield event
+            if history and history[-1].stage in ("completed", "failed"):
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event.stage in ("completed", "failed"):
+                    return
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(job_id, [])
+                if entry in subscribers:
+                    subscribers.remove(entry)
+                if not subscribers:
+                    self._subscribers.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+
+
+def build_job_manager(config: Settings) -> JobManager:
+    return JobManager(consumers=config.job_consumers, retention=config.job_retention, max_queued=config.job_queue_max)
+
+
+job_manager = build_job_manager(settings)
+job_queue_depth.set_function(lambda: job_manager.queue_depth)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ..schemas.project import LayoutNode, UIIRPatch
+from .patches import PatchError, apply_to_target, rebuild_path
+
+
+class LayoutIndex:
+    """布局树的 id 索引：id → 节点、父节点 id 与深度，均为 O(1) 查询。
+
+    通过 `apply` 应用 patch 时只更新受影响的节点（目标路径上的祖先与增删的子树），
+    不会重新遍历整棵树。
+    """
+
+    def __init__(self, root: LayoutNode) -> None:
+        self.root = root
+        self._nodes: Dict[str, LayoutNode] = {}
+        self._parents: Dict[str, Optional[str]] = {}
+        self._depths: Dict[str, int] = {}
+        self._add_subtree(root, None, 0)
+
+    @classmethod
+    def build(cls, root: LayoutNode) -> "LayoutIndex":
+        return cls(root)
+
+    def copy(self) -> "LayoutIndex":
+        """复制出一个独立的索引：映射表浅复制（C 层面的 dict 拷贝），节点对象共享；之后各自 `apply` 互不影响。"""
+        clone = object.__new__(LayoutIndex)
+        clone.root = self.root
+        clone._nodes = dict(self._nodes)
+        clone._parents = dict(self._parents)
+        clone._depths = dict(self._depths)
+        return clone
+
+    def _add_subtree(self, node: LayoutNode, parent_id: Optional[str], depth: int) -> None:
+        stack = [(node, parent_id, depth)]
+        while stack:
+            current, parent, level = stack.pop()
+            self._nodes[current.id] = current
+            self._parents[current.id] = parent
+            self._depths[current.id] = level
+            stack.extend((child, current.id, level + 1) for child in current.children)
+
+    def _drop_subtree(self, node: LayoutNode) -> None:
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._nodes.pop(current.id, None)
+            self._parents.pop(current.id, None)
+            self._depths.pop(current.id, None)
+            stack.extend(current.children)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._nodes)
+
+    def get(self, node_id: str) -> Optional[LayoutNode]:
+        return self._nodes.get(node_id)
+
+    def parent(self, node_id: str) -> Optional[LayoutNode]:
+        parent_id = self._parents.get(node_id)
+        return self._nodes[parent_id] if parent_id is not None else None
+
+    def depth(self, node_id: str) -> int:
+        return self._depths[node_id]
+
+    def path(self, node_id: str) -> List[str]:
+        """从根到该节点的 id 路径，开销与深度成正比。"""
+        if node_id not in self._nodes:
+            raise KeyError(node_id)
+        path: List[str] = []
+        current: Optional[str] = node_id
+        while current is not None:
+            path.append(current)
+            current = self._parents[current]
+        path.reverse()
+        return path
+
+    def find_by_type(self, node_type: str) -> List[LayoutNode]:
+        return [node for node in self._nodes.values() if node.type == node_type]
+
+    def apply(self, patch: UIIRPatch) -> LayoutNode:
+        """应用 patch 并同步索引，返回新的根节点；原树保持不变。"""
+        if patch.target_id not in self._nodes:
+            raise PatchError(f"Patch target not found: {patch.target_id}")
+        ids = self.path(patch.target_id)
+        path = [self._nodes[node_id] for node_id in ids]
+        target = path[-1]
+        replacement = apply_to_target(target, patch, is_root=len(path) == 1)
+        rebuilt = rebuild_path(path, replacement)
+
+        parent_id = ids[-2] if len(ids) > 1 else None
+        depth = len(ids) - 1
+        if replacement is None:
+            self._drop_subtree(target)
+        elif patch.op == "insert":
+            existing = {id(child) for child in target.children}
+            inserted = next(child for child in replacement.children if id(child) not in existing)
+            self._add_subtree(inserted, target.id, depth + 1)
+        elif replacement.id != target.id or replacement.children is not target.children:
+            self._drop_subtree(target)
+            self._add_subtree(replacement, parent_id, depth)
+        for node in rebuilt:
+            if node is not None:
+                self._nodes[node.id] = node
+
+        self.root = rebuilt[0]  # type: ignore[assignment]
+        return self.root
+
+    def apply_all(self, patches: Iterable[UIIRPatch]) -> LayoutNode:
+        for patch in patches:
+            self.apply(patch)
+        return self.root
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..schemas.project import Bounds, LayoutNode, UIIRPatch
+from .layout_index import LayoutIndex
+
+Box = Tuple[float, float, float, float]
+Size = Tuple[float, float]
+
+# 叶子节点的固有尺寸（宽, 高），有文本时取与文本尺寸的较大值。
+INTRINSIC_SIZES: Dict[str, Size] = {
+    "button": (120.0, 40.0),
+    "input": (240.0, 40.0),
+    "image": (320.0, 180.0),
+    "badge": (64.0, 24.0),
+    "chart": (480.0, 240.0),
+    "table": (480.0, 240.0),
+}
+TEXT_LINE_HEIGHT = 24.0
+TEXT_PADDING = {"button": 32.0, "badge": 16.0, "input": 24.0}
+
+# 交叉轴对齐方式，对应 constraints.horizontalAlign / verticalAlign。
+ALIGN_CODES = {"stretch": 0, "start": 1, "center": 2, "end": 3}
+
+
+def text_width(text: str) -> float:
+    """按 UTF-8 字节数粗略估算文本宽度：ASCII 8px，CJK 等三字节字符 16px。"""
+    return float(8 * len(text) + 4 * (len(text.encode("utf-8")) - len(text)))
+
+
+def _padding(value: Any) -> Tuple[float, float, float, float]:
+    if isinstance(value, (int, float)):
+        return (float(value),) * 4  # type: ignore[return-value]
+    if isinstance(value, (list, tuple)) and len(value) == 4:
+        return tuple(float(item or 0) for item in value)  # type: ignore[return-value]
+    return (0.0, 0.0, 0.0, 0.0)
+
+
+def _number(value: Any, default: float) -> float:
+    return float(value) if isinstance(value, (int, float)) else default
+
+
+# 未设置 layout / constraints 的节点占绝大多数，直接使用默认行。
+_DEFAULT_GEOMETRY = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, math.nan, math.nan)
+_DEFAULT_CONSTRAINTS = (0.0, 0.0, math.inf, math.inf, 0.0, 1.0, 0.0, 0.0)
+
+
+def _geometry(layout: Dict[str, Any]) -> Tuple[float, ...]:
+    """(是否行方向, gap, 上右下左 padding, 固定宽, 固定高)"""
+    return (
+        1.0 if layout.get("direction") == "row" else 0.0,
+        _number(layout.get("gap"), 0.0),
+        *_padding(layout.get("padding")),
+        _number(layout.get("width"), math.nan),
+        _number(layout.get("height"), math.nan),
+    )
+
+
+def _constraint_row(constraints: Dict[str, Any]) -> Tuple[float, ...]:
+    """(最小宽, 最小高, 最大宽, 最大高, grow, shrink, 水平对齐, 垂直对齐)"""
+    return (
+        _number(constraints.get("minWidth"), 0.0),
+        _number(constraints.get("minHeight"), 0.0),
+        _number(constraints.get("maxWidth"), math.inf),
+        _number(constraints.get("maxHeight"), math.inf),
+        _number(constraints.get("grow"), 0.0),
+        _number(constraints.get("shrink"), 1.0),
+        float(ALIGN_CODES.get(constraints.get("horizontalAlign"), 0)),
+        float(ALIGN_CODES.get(constraints.get("verticalAlign"), 0)),
+    )
+
+
+@dataclass
+class _Flat:
+    """子树按先序展开后的列式数组；`levels[d]` 为深度 d 的节点下标，同一父节点的子节点在其中连续。"""
+
+    ids: List[str]
+    nodes: List[LayoutNode]
+    parent: np.ndarray
+    row: np.ndarray
+    gap: np.ndarray
+    padding: np.ndarray  # (n, 4)：上右下左
+    fixed: np.ndarray  # (n, 2)：layout.width/height，未指定为 nan
+    minimum: np.ndarray  # (n, 2)
+    maximum: np.ndarray  # (n, 2)
+    grow: np.ndarray
+    shrink: np.ndarray
+    align: np.ndarray  # (n, 2)：horizontalAlign / verticalAlign 编码
+    base: np.ndarray  # (n, 2)：叶子（或已知尺寸节点）的固有尺寸
+    levels: List[np.ndarray]
+
+
+def _flatten(root: LayoutNode, known: Optional[Mapping[str, Size]] = None) -> _Flat:
+    """展开子树；`known` 中的节点（根除外）不再展开，直接以已知尺寸作为固有尺寸。"""
+    ids: List[str] = []
+    nodes: List[LayoutNode] = []
+    parents: List[int] = []
+    depths: List[int] = []
+    geometry: List[Tuple[float, ...]] = []
+    constraints: List[Tuple[float, ...]] = []
+    base: List[Size] = []
+
+    stack: List[Tuple[LayoutNode, int, int]] = [(root, -1, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        index = len(ids)
+        ids.append(node.id)
+        nodes.append(node)
+        parents.append(parent)
+        depths.append(depth)
+        row = _geometry(node.layout) if node.layout else _DEFAULT_GEOMETRY
+        constraints.append(_constraint_row(node.constraints) if node.constraints else _DEFAULT_CONSTRAINTS)
+        if known is not None and parent >= 0 and node.id in known:
+            geometry.append(row)
+            base.append(known[node.id])
+            continue
+        width, height = INTRINSIC_SIZES.get(node.type, (0.0, 0.0))
+        if node.children:
+            if node.text:
+                # 容器自身的文本作为标题行，占据内容区顶部，子节点从其下方开始排列。
+                row = (row[0], row[1], row[2] + TEXT_LINE_HEIGHT + row[1], *row[3:])
+                width, height = text_width(node.text) + row[3] + row[5], row[2] + row[4]
+            stack.extend((child, index, depth + 1) for child in reversed(node.children))
+        elif node.text:
+            width = max(width, text_width(node.text) + TEXT_PADDING.get(node.type, 0.0))
+            height = max(height, TEXT_LINE_HEIGHT)
+        geometry.append(row)
+        base.append((width, height))
+
+    depth_array = np.asarray(depths, dtype=np.int32)
+    # 稳定排序保持先序，同一深度内同一父节点的子节点连续且按兄弟顺序排列。
+    order = np.argsort(depth_array, kind="stable")
+    bounds = np.searchsorted(depth_array[order], np.arange(int(depth_array.max()) + 2))
+    geometry_array = np.asarray(geometry, dtype=float)
+    constraint_array = np.asarray(constraints, dtype=float)
+    return _Flat(
+        ids=ids,
+        nodes=nodes,
+        parent=np.asarray(parents, dtype=np.int64),
+        row=geometry_array[:, 0] > 0,
+        gap=geometry_array[:, 1],
+        padding=geometry_array[:, 2:6],
+        fixed=geometry_array[:, 6:8],
+        minimum=constraint_array[:, 0:2],
+        maximum=constraint_array[:, 2:4],
+        grow=constraint_array[:, 4],
+        shrink=constraint_array[:, 5],
+        align=constraint_array[:, 6:8].astype(np.int8),
+        base=np.asarray(base, dtype=float),
+        levels=[order[bounds[level] : bounds[level + 1]] for level in range(len(bounds) - 1)],
+    )
+
+
+def _clamp(values: np.ndarray, fixed: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    values = np.where(np.isnan(fixed), values, fixed)
+    return np.minimum(np.maximum(values, low), high)
+
+
+def _groups(flat: _Flat, kids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """一层子节点按父节点分组：返回 (组起点, 父节点下标, 组大小)。"""
+    parents = flat.parent[kids]
+    starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+    counts = np.diff(np.r_[starts, kids.size])
+    return starts, parents[starts], counts
+
+
+def _measure(flat: _Flat) -> np.ndarray:
+    """自底向上计算每个节点的内容尺寸 (n, 2)：行方向容器宽度为子节点宽度之和加间距、高度取最大值，列方向相反。"""
+    size = _clamp(flat.base, flat.fixed, flat.minimum, flat.maximum)
+    for kids in reversed(flat.levels[1:]):
+        if kids.size == 0:
+            continue
+        starts, parents, counts = _groups(flat, kids)
+        child = size[kids]
+        total = np.add.reduceat(child, starts, axis=0)
+        largest = np.maximum.reduceat(child, starts, axis=0)
+        gaps = flat.gap[parents] * (counts - 1)
+        row = flat.row[parents]
+        width = np.where(row, total[:, 0] + gaps, largest[:, 0])
+        height = np.where(row, largest[:, 1], total[:, 1] + gaps)
+        padding = flat.padding[parents]
+        content = np.stack([width + padding[:, 1] + padding[:, 3], height + padding[:, 0] + padding[:, 2]], axis=1)
+        content = np.maximum(content, flat.base[parents])
+        size[parents] = _clamp(content, flat.fixed[parents], flat.minimum[parents], flat.maximum[parents])
+    return size
+
+
+def _arrange(flat: _Flat, size: np.ndarray, origin: Box) -> np.ndarray:
+    """自顶向下按层放置子节点，返回绝对坐标 (n, 4)：x, y, width, height。
+
+    主轴上按 `grow` 分配剩余空间、按 `shrink × 基准尺寸` 分摊溢出；交叉轴默认拉伸，
+    `horizontalAlign`/`verticalAlign` 为 start/center/end 时保持内容尺寸并对齐。
+    """
+    boxes = np.zeros((len(flat.ids), 4))
+    boxes[0] = origin
+    for kids in flat.levels[1:]:
+        if kids.size == 0:
+            continue
+        starts, parents, counts = _groups(flat, kids)
+        row = np.repeat(flat.row[parents], counts)
+        main_axis = np.where(row, 0, 1)
+        cross_axis = 1 - main_axis
+        take = np.arange(kids.size)
+
+        padding = flat.padding[parents]
+        inner = np.empty((parents.size, 4))
+        inner[:, 0] = boxes[parents, 0] + padding[:, 3]
+        inner[:, 1] = boxes[parents, 1] + padding[:, 0]
+        inner[:, 2] = np.maximum(boxes[parents, 2] - padding[:, 1] - padding[:, 3], 0)
+        inner[:, 3] = np.maximum(boxes[parents, 3] - padding[:, 0] - padding[:, 2], 0)
+        inner = np.repeat(inner, counts, axis=0)
+        gap = np.repeat(flat.gap[parents], counts)
+
+        measured = size[kids]
+        main = measured[take, main_axis]
+        available = inner[take, 2 + main_axis]
+        free = available - np.repeat(np.add.reduceat(main, starts) + flat.gap[parents] * (counts - 1), counts)
+        grow = flat.grow[kids]
+        grow_total = np.repeat(np.add.reduceat(grow, starts), counts)
+        weight = flat.shrink[kids] * main
+        weight_total = np.repeat(np.add.reduceat(weight, starts), counts)
+        main = main + np.where((free > 0) & (grow_total > 0), free * grow / np.where(grow_total > 0, grow_total, 1), 0)
+        main = main + np.where((free < 0) & (weight_total > 0), free * weight / np.where(weight_total > 0, weight_total, 1), 0)
+        main = np.minimum(np.maximum(main, flat.minimum[kids, main_axis]), flat.maximum[kids, main_axis])
+
+        step = main + gap
+        end = np.cumsum(step)
+        offset = end - step - np.repeat((end - step)[starts], counts)
+
+        align = flat.align[kids, cross_axis]
+        span = inner[take, 2 + cross_axis]
+        stretch = (align == 0) & np.isnan(flat.fixed[kids, cross_axis])
+        cross = np.where(stretch, span, measured[take, cross_axis])
+        cross = np.minimum(np.maximum(cross, flat.minimum[kids, cross_axis]), flat.maximum[kids, cross_axis])
+        shift = np.select([align == 2, align == 3], [(span - cross) / 2, span - cross], 0.0)
+
+        placed = np.empty((kids.size, 4))
+        placed[take, main_axis] = inner[take, main_axis] + offset
+        placed[take, cross_axis] = inner[take, cross_axis] + shift
+        placed[take, 2 + main_axis] = main
+        placed[take, 2 + cross_axis] = cross
+        boxes[kids] = placed
+    return boxes
+
+
+@dataclass
+class LayoutFrame:
+    """一棵布局树的求解结果：各节点的绝对坐标（`boxes`）与内容尺寸（`measured`，供增量重排使用）。
+
+    `nodes`/`parents` 记录求解时的树结构，增量重排据此清理被替换子树的旧条目；对象本身视为不可变。
+    """
+
+    root: LayoutNode
+    viewport_width: float
+    boxes: Dict[str, Box]
+    measured: Dict[str, Size]
+    parents: Dict[str, Optional[str]]
+    nodes: Dict[str, LayoutNode]
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def bounds(self, node_id: str) -> Bounds:
+        x, y, width, height = self.boxes[node_id]
+        return Bounds(x=round(x, 2), y=round(y, 2), width=round(width, 2), height=round(height, 2))
+
+    def to_builtins(self) -> Dict[str, Dict[str, float]]:
+        return {
+            node_id: {"x": round(x, 2), "y": round(y, 2), "width": round(w, 2), "height": round(h, 2)}
+            for node_id, (x, y, w, h) in self.boxes.items()
+        }
+
+
+def _solve_subtree(node: LayoutNode, origin: Optional[Box], viewport_width: float) -> Tuple[_Flat, np.ndarray, np.ndarray]:
+    flat = _flatten(node)
+    size = _measure(flat)
+    if origin is None:
+        origin = (0.0, 0.0, viewport_width, float(size[0, 1]))
+    return flat, size, _arrange(flat, size, origin)
+
+
+def _records(
+    flat: _Flat, size: np.ndarray, boxes: np.ndarray, root_parent: Optional[str]
+) -> Tuple[Dict[str, Box], Dict[str, Size], Dict[str, Optional[str]], Dict[str, LayoutNode]]:
+    ids = flat.ids
+    parent_ids: List[Optional[str]] = [root_parent] + [ids[index] for index in flat.parent[1:].tolist()]
+    return (
+        dict(zip(ids, map(tuple, boxes.tolist()))),  # type: ignore[arg-type]
+        dict(zip(ids, map(tuple, size.tolist()))),  # type: ignore[arg-type]
+        dict(zip(ids, parent_ids)),
+        dict(zip(ids, flat.nodes)),
+    )
+
+
+def solve_layout(root: LayoutNode, viewport_width: Optional[float] = None) -> LayoutFrame:
+    """对整棵树做一次批量求解：根节点宽度为视口宽度，高度为内容高度。"""
+    viewport_width = float(viewport_width or settings.layout_viewport_width)
+    flat, size, boxes = _solve_subtree(root, None, viewport_width)
+    box_map, measured, parents, nodes = _records(flat, size, boxes, None)
+    return LayoutFrame(root, viewport_width, box_map, measured, parents, nodes)
+
+
+def _measure_node(node: LayoutNode, measured: Mapping[str, Size]) -> Size:
+    """只展开到尺寸未知的后代，已知尺寸的子树直接复用。"""
+    flat = _flatten(node, known=measured)
+    width, height = _measure(flat)[0].tolist()
+    return width, height
+
+
+def _same(left: Optional[Size], right: Size) -> bool:
+    return left is not None and abs(left[0] - right[0]) < 1e-6 and abs(left[1] - right[1]) < 1e-6
+
+
+def _affects_parent(node: LayoutNode, parent: LayoutNode, previous: Optional[Size], size: Size) -> bool:
+    """尺寸变化是否改变父节点对子节点的排列：主轴尺寸总是相关，交叉轴尺寸只在不拉伸时相关。"""
+    if previous is None:
+        return True
+    row = parent.layout.get("direction") == "row"
+    main, cross = (0, 1) if row else (1, 0)
+    if abs(previous[main] - size[main]) > 1e-6:
+        return True
+    if abs(previous[cross] - size[cross]) <= 1e-6:
+        return False
+    return ALIGN_CODES.get(node.constraints.get("verticalAlign" if row else "horizontalAlign"), 0) != 0
+
+
+def dirty_nodes(frame: LayoutFrame, index: LayoutIndex, patches: Iterable[UIIRPatch]) -> List[str]:
+    """patch 影响到的、仍在新树中的节点：目标本身，以及删除/替换时原来的父节点。"""
+    dirty: List[str] = []
+    for patch in patches:
+        candidates = [patch.target_id]
+        if patch.op in ("remove", "replace"):
+            candidates.append(frame.parents.get(patch.target_id))  # type: ignore[arg-type]
+        dirty.extend(node_id for node_id in candidates if node_id is not None and node_id in index)
+    return dirty
+
+
+def relayout(frame: LayoutFrame, index: LayoutIndex, dirty: Iterable[str]) -> LayoutFrame:
+    """增量重排：只重新求解受影响的子树，返回新的 `LayoutFrame`，原 frame 不变。
+
+    从每个脏节点的父节点开始向上重新测量，直到内容尺寸不再变化；沿途尺寸变化会影响其父节点排列的，
+    把重排起点提升到该父节点。起点自身的盒子因此不变，只需以原来的盒子为原点重排其子树。
+    多个脏节点得到的子树互相包含时只重排最外层。
+    """
+    root = index.root
+    dirty = sorted(set(dirty), key=index.depth, reverse=True)
+    measured = dict(frame.measured)
+    # 脏节点及其祖先的旧尺寸作废，测量时沿这些路径重新展开，其余子树直接复用旧尺寸。
+    stale = {ancestor_id for node_id in dirty for ancestor_id in index.path(node_id)}
+    for node_id in stale:
+        measured.pop(node_id, None)
+
+    layout_roots = set()
+    for node_id in dirty:
+        node = index.get(node_id)
+        assert node is not None
+        measured[node_id] = _measure_node(node, measured)
+        layout_root = current = index.parent(node_id) or node
+        while True:
+            size = measured[current.id] = _measure_node(current, measured)
+            previous = frame.measured.get(current.id)
+            if _same(previous, size):
+                break
+            parent = index.parent(current.id)
+            if parent is None:
+                # 根节点宽度固定为视口宽度，只有高度变化才需要重排。
+                if previous is None or abs(previous[1] - size[1]) > 1e-6:
+                    layout_root = current
+                break
+            if _affects_parent(current, parent, previous, size):
+                layout_root = parent
+            current = parent
+        layout_roots.add(layout_root.id)
+    if root.id in layout_roots:
+        return solve_layout(root, frame.viewport_width)
+    # 停止点以上的祖先尺寸未变，恢复旧值。
+    for node_id in stale:
+        if node_id not in measured and node_id in frame.measured:
+            measured[node_id] = frame.measured[node_id]
+
+    outermost = [
+        node_id
+        for node_id in layout_roots
+        if not any(ancestor in layout_roots for ancestor in index.path(node_id)[:-1])
+    ]
+    boxes = dict(frame.boxes)
+    parents = dict(frame.parents)
+    nodes = dict(frame.nodes)
+    # 先清理所有旧子树再写入新结果：跨子树移动的节点不会被后清理的旧子树误删。
+    for node_id in outermost:
+        stack = [frame.nodes[node_id]] if node_id in frame.nodes else []
+        while stack:
+            node = stack.pop()
+            for table in (boxes, measured, parents, nodes):
+                table.pop(node.id, None)  # type: ignore[attr-defined]
+            stack.extend(node.children)
+    for node_id in outermost:
+        node = index.get(node_id)
+        parent = index.parent(node_id)
+        assert node is not None
+        origin = None if node is root else frame.boxes[node_id]
+        flat, size, solved = _solve_subtree(node, origin, frame.viewport_width)
+        new_boxes, new_measured, new_parents, new_nodes = _records(flat, size, solved, parent.id if parent else None)
+        boxes.update(new_boxes)
+        measured.update(new_measured)
+        parents.update(new_parents)
+        nodes.update(new_nodes)
+        # 祖先路径上的节点在新树中是复制出的新对象，同步引用以便下一次增量重排遍历到正确的子节点。
+        for ancestor_id in index.path(node_id)[:-1]:
+            nodes[ancestor_id] = index.get(ancestor_id)  # type: ignore[assignment]
+    return LayoutFrame(root, frame.viewport_width, boxes, measured, parents, nodes)
+
+
+def apply_bounds(root: LayoutNode, frame: LayoutFrame) -> LayoutNode:
+    """把求解结果写入各节点的 `bounds`，返回新树；坐标未变的子树与原树共享。"""
+
+    def visit(node: LayoutNode) -> LayoutNode:
+        children = [visit(child) for child in node.children]
+        bounds = frame.bounds(node.id)
+        if bounds == node.bounds and all(new is old for new, old in zip(children, node.children)):
+            return node
+        return node.copy(update={"bounds": bounds, "children": children})
+
+    return visit(root)
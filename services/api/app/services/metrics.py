@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import contextvars
+import math
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import Counter as _Tally
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..core.config import Settings, settings
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(float(1 << shift) for shift in range(10, 31, 2))
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    """带标签的指标基类，`samples` 产出 Prometheus 文本格式所需的样本。"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]:
+        ...
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total", self._labels(key), value
+
+
+class Gauge(Metric):
+    """瞬时值；也可以通过 `set_function` 在采集时读取，例如队列深度。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Union[float, Dict[LabelValues, float]]]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], Union[float, Dict[LabelValues, float]]]) -> None:
+        self._function = function
+
+    def samples(self) -> Iterator[Sample]:
+        if self._function is not None:
+            result = self._function()
+            items = list(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), float(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            totals[0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            items = [(key, list(counts), totals[0]) for key, (counts, totals) in self._series.items()]
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """进程内指标注册表，同名指标重复注册时返回已有实例。"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式（0.0.4）输出全部指标。"""
+        lines: List[str] = []
+        with self._lock:
+            registered = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+span_duration = metrics.histogram(
+    "protoweaver_span_duration_seconds", "Duration of traced pipeline spans", ("span",)
+)
+span_errors = metrics.counter("protoweaver_span_errors", "Traced spans that raised an exception", ("span",))
+payload_bytes = metrics.histogram(
+    "protoweaver_payload_bytes", "Size of uploads and generated payloads", ("kind",), buckets=SIZE_BUCKETS
+)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: float
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+
+class Tracer:
+    """轻量级 span 记录：耗时写入 `protoweaver_span_duration_seconds`，最近的 span 保存在环形缓冲区。
+
+    父子关系通过 contextvars 传递，因此 `asyncio.gather` 派生的任务会继承当前 trace。
+    """
+
+    def __init__(self, buffer_size: int = 512) -> None:
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("pw_span", default=None)
+        self._recent: Deque[Span] = deque(maxlen=buffer_size)
+
+    @contextmanager
+    def span(self, name: str, **attributes: object) -> Iterator[Span]:
+        parent = self._current.get()
+        current = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            started_at=time.time(),
+            attributes=dict(attributes),
+        )
+        token = self._current.set(current)
+        start = time.perf_counter()
+        try:
+            yield current
+        except BaseException as exc:
+            current.error = type(exc).__name__
+            span_errors.inc(span=name)
+            raise
+        finally:
+            current.duration = time.perf_counter() - start
+            self._current.reset(token)
+            span_duration.observe(current.duration, span=name)
+            self._recent.append(current)
+
+    def recent(self, limit: Optional[int] = None) -> List[Span]:
+        spans = list(self._recent)
+        return spans[-limit:] if limit else spans
+
+
+class SamplingProfiler:
+    """定时采样所有线程的调用栈，按折叠栈（flamegraph 输入格式）累计次数。"""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64) -> None:
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks: _Tally = _Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pw-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout=1)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own)
+
+    def sample(self, exclude: Optional[int] = None) -> None:
+        collected = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude:
+                continue
+            names: List[str] = []
+            while frame is not None and len(names) < self.max_depth:
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            collected.append(";".join(reversed(names)))
+        with self._lock:
+            self._stacks.update(collected)
+
+    def folded(self) -> str:
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+
+
+def build_profiler(config: Settings) -> Optional[SamplingProfiler]:
+    if not config.profiler_enabled:
+        return None
+    return SamplingProfiler(interval=config.profiler_interval_ms / 1000)
+
+
+tracer = Tracer(buffer_size=settings.trace_buffer_size)
+span = tracer.span
+profiler = build_profiler(settings)
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Type, Union
+
+import numpy as np
+
+from ..core.config import Settings, settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 与仓库根目录 `models/` 下的占位目录一致。
+MODEL_KINDS = ("cv", "asr", "nlu", "codegen")
+MANIFEST = "model.json"
+
+model_load_seconds = metrics.histogram(
+    "protoweaver_model_load_seconds", "Model load and warmup time", ("model", "phase")
+)
+model_evictions = metrics.counter("protoweaver_model_evictions", "Models unloaded by the registry", ("reason",))
+model_resident_bytes = metrics.gauge(
+    "protoweaver_model_resident_bytes", "Resident size of loaded models (shared weight pages + private memory)", ("model",)
+)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """`models/<kind>/<name>/model.json` 描述的一个模型。
+
+    `loader` 为 `mock` 或 `package.module:ClassName`（`Model` 子类），`options` 原样传给模型。
+    """
+
+    name: str
+    kind: str
+    path: Path
+    loader: str = "mock"
+    warmup_batch: int = 1
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_manifest(cls, manifest: Path) -> "ModelSpec":
+        entry = json.loads(manifest.read_text(encoding="utf-8"))
+        directory = manifest.parent
+        return cls(
+            name=f"{directory.parent.name}/{directory.name}",
+            kind=directory.parent.name,
+            path=directory,
+            loader=entry.get("loader", "mock"),
+            warmup_batch=int(entry.get("warmup_batch", 1)),
+            options=entry.get("options", {}),
+        )
+
+
+def map_weights(directory: Path) -> Dict[str, np.ndarray]:
+    """以只读 mmap 打开目录下的 `.npy` 权重。
+
+    映射与文件共享页缓存：多个 worker 进程加载同一模型时物理内存只有一份，未访问的页也不会读入。
+    """
+    return {path.stem: np.load(path, mmap_mode="r") for path in sorted(directory.glob("*.npy"))}
+
+
+def _mapped_rss(paths: Iterable[str]) -> Optional[Dict[str, int]]:
+    """读一次 `/proc/self/smaps`，按文件统计这些映射中实际驻留的字节数；非 Linux 返回 None。"""
+    totals = dict.fromkeys(paths, 0)
+    try:
+        lines = Path("/proc/self/smaps").read_text().splitlines()
+    except OSError:
+        return None
+    current: Optional[str] = None
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        if not fields[0].endswith(":") or "-" in fields[0]:
+            # 映射区间的首行：地址 权限 偏移 设备 inode 路径
+            current = fields[5] if len(fields) >= 6 and fields[5] in totals else None
+        elif current is not None and fields[0] == "Rss:":
+            totals[current] += int(fields[1]) * 1024
+    return totals
+
+
+def _weight_paths(model: "Model") -> List[str]:
+    return [str(Path(array.filename).resolve()) for array in model.weights.values() if isinstance(array, np.memmap) and array.filename]
+
+
+class Model(ABC):
+    """由注册表管理的模型；权重为只读 mmap 数组，`predict` 需要线程安全。"""
+
+    def __init__(self, spec: ModelSpec, weights: Dict[str, np.ndarray]) -> None:
+        self.spec = spec
+        self.weights = weights
+
+    @abstractmethod
+    def predict(self, inputs: Sequence[Any]) -> List[Any]:
+        ...
+
+    def warmup_inputs(self) -> List[Any]:
+        """预热批次；默认不预热。"""
+        return []
+
+    @property
+    def mapped_bytes(self) -> int:
+        return sum(array.nbytes for array in self.weights.values() if isinstance(array, np.memmap))
+
+    @property
+    def private_bytes(self) -> int:
+        """进程私有的内存（例如解压或转换后的权重），子类按需覆盖。"""
+        return sum(array.nbytes for array in self.weights.values() if not isinstance(array, np.memmap))
+
+    def close(self) -> None:
+        """卸载时调用，释放权重以外的资源（例如推理会话）；mmap 权重在最后一个引用释放后自动解除映射。"""
+
+
+class MockModel(Model):
+    """本地模拟模型：`projection.npy` 为 (输入维度, 输出维度) 的矩阵，`predict` 对每个输入做一次投影。"""
+
+    def __init__(self, spec: ModelSpec, weights: Dict[str, np.ndarray]) -> None:
+        super().__init__(spec, weights)
+        if "projection" not in weights:
+            raise ValueError(f"{spec.name}: missing projection.npy")
+        self.calls = 0
+
+    def predict(self, inputs: Sequence[Any]) -> List[Any]:
+        self.calls += 1
+        batch = np.stack([np.asarray(item, dtype=np.float32) for item in inputs])
+        return list(batch @ self.weights["projection"])
+
+    def warmup_inputs(self) -> List[Any]:
+        dimension = self.weights["projection"].shape[0]
+        return [np.zeros(dimension, dtype=np.float32)] * self.spec.warmup_batch
+
+
+def write_mock_model(
+    root: Union[str, Path], kind: str, name: str, dims: Sequence[int] = (64, 16), seed: int = 0, warmup_batch: int = 2
+) -> Path:
+    """在 `root/<kind>/<name>/` 写入一个模拟模型（清单 + 随机投影权重），供测试与本地开发使用。"""
+    directory = Path(root) / kind / name
+    directory.mkdir(parents=True, exist_ok=True)
+    weights = np.random.default_rng(seed).standard_normal(tuple(dims)).astype(np.float32)
+    np.save(directory / "projection.npy", weights)
+    manifest = {"loader": "mock", "warmup_batch": warmup_batch}
+    (directory / MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+    return directory
+
+
+def _model_class(loader: str) -> Type[Model]:
+    if loader == "mock":
+        return MockModel
+    module_name, _, attribute = loader.partition(":")
+    model_class = getattr(importlib.import_module(module_name), attribute)
+    if not (isinstance(model_class, type) and issubclass(model_class, Model)):
+        raise TypeError(f"{loader} is not a Model subclass")
+    return model_class
+
+
+@dataclass
+class ModelStats:
+    name: str
+    kind: str
+    loaded: bool = False
+    loads: int = 0
+    uses: int = 0
+    in_use: int = 0
+    load_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    mapped_bytes: int = 0
+    private_bytes: int = 0
+    resident_bytes: Optional[int] = None
+    last_used: Optional[float] = None
+
+    @property
+    def footprint(self) -> int:
+        return self.mapped_bytes + self.private_bytes
+
+
+@dataclass
+class _Entry:
+    spec: ModelSpec
+    stats: ModelStats
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    model: Optional[Model] = None
+
+
+class ModelRegistry:
+    """模型注册表：首次使用时加载并预热，按内存上限与空闲时间卸载。
+
+    - 模型名为 `<kind>/<name>`，由 `discover` 扫描 `models/` 或 `register` 手动登记；
+    - 权重通过 mmap 映射，同一节点上的多个进程共享物理页；
+    - 已加载模型的 `mapped_bytes + private_bytes` 之和超过 `memory_cap` 时，按最近最少使用卸载未在使用中的模型；
+    - `evict_idle` 卸载超过 `idle_seconds` 未使用的模型，`start` 后由后台任务定期执行；
+    - 驻留内存（`/proc/self/smaps`）在加载后、`stats()` 与后台任务中刷新，指标抓取只读缓存值。
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path, None] = None,
+        memory_cap: int = 0,
+        idle_seconds: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.root = Path(root) if root is not None else None
+        self.memory_cap = memory_cap
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()
+        self._task: Optional[asyncio.Task] = None
+        if self.root is not None:
+            self.discover(self.root)
+
+    def discover(self, root: Union[str, Path]) -> List[str]:
+        names = []
+        for kind in MODEL_KINDS:
+            for manifest in sorted(Path(root).glob(f"{kind}/*/{MANIFEST}")):
+                spec = ModelSpec.from_manifest(manifest)
+                self.register(spec)
+                names.append(spec.name)
+        return names
+
+    def register(self, spec: ModelSpec) -> None:
+        with self._lock:
+            if spec.name not in self._entries:
+                self._entries[spec.name] = _Entry(spec, ModelStats(spec.name, spec.kind))
+
+    def names(self, kind: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return sorted(name for name, entry in self._entries.items() if kind is None or entry.spec.kind == kind)
+
+    def _entry(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+        return entry
+
+    def _load(self, entry: _Entry) -> Model:
+        spec = entry.spec
+        start = time.perf_counter()
+        model = _model_class(spec.loader)(spec, map_weights(spec.path))
+        loaded = time.perf_counter()
+        inputs = model.warmup_inputs()
+        if inputs:
+            model.predict(inputs)
+        warmed = time.perf_counter()
+        stats = entry.stats
+        stats.loaded = True
+        stats.loads += 1
+        stats.load_seconds = loaded - start
+        stats.warmup_seconds = warmed - loaded
+        stats.mapped_bytes = model.mapped_bytes
+        stats.private_bytes = model.private_bytes
+        model_load_seconds.observe(stats.load_seconds, model=spec.name, phase="load")
+        model_load_seconds.observe(stats.warmup_seconds, model=spec.name, phase="warmup")
+        logger.info("模型 %s 加载 %.3fs，预热 %.3fs，权重 %d 字节", spec.name, stats.load_seconds, stats.warmup_seconds, stats.mapped_bytes)
+        return model
+
+    def _acquire(self, name: str) -> Model:
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.model is None:
+                entry.model = self._load(entry)
+                loaded = True
+            else:
+                loaded = False
+            with self._lock:
+                entry.stats.uses += 1
+                entry.stats.in_use += 1
+                entry.stats.last_used = self.clock()
+            model = entry.model
+        if loaded:
+            self.refresh_resident()
+            self._enforce_cap()
+        return model
+
+    def _release(self, name: str) -> None:
+        entry = self._entry(name)
+        with self._lock:
+            entry.stats.in_use -= 1
+            entry.stats.last_used = self.clock()
+
+    def get(self, name: str) -> Model:
+        """返回已加载的模型，必要时先加载并预热；调用方持有的引用在模型被卸载后仍然可用。"""
+        model = self._acquire(name)
+        self._release(name)
+        return model
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Model]:
+        """使用期间模型不会被卸载。"""
+        model = self._acquire(name)
+        try:
+            yield model
+        finally:
+            self._release(name)
+
+    def preload(self, names: Sequence[str]) -> None:
+        for name in names:
+            self.get(name)
+
+    def _preload_logged(self, names: Sequence[str]) -> None:
+        try:
+            self.preload(names)
+        except Exception:
+            logger.exception("模型预加载失败")
+
+    def unload(self, name: str, reason: str = "manual") -> bool:
+        """卸载模型；自动回收（`reason` 不是 manual）时跳过使用中的模型。"""
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.model is None or (reason != "manual" and entry.stats.in_use > 0):
+                return False
+            entry.model.close()
+            entry.model = None
+            entry.stats.loaded = False
+            entry.stats.resident_bytes = None
+        model_evictions.inc(reason=reason)
+        logger.info("卸载模型 %s（%s）", name, reason)
+        return True
+
+    def _loaded(self) -> List[_Entry]:
+        with self._lock:
+            return [entry for entry in self._entries.values() if entry.model is not None]
+
+    def _enforce_cap(self) -> List[str]:
+        if self.memory_cap <= 0:
+            return []
+        evicted = []
+        with self._lock:
+            loaded = self._loaded()
+            total = sum(entry.stats.footprint for entry in loaded)
+            candidates = sorted(
+                (entry for entry in loaded if entry.stats.in_use == 0), key=lambda entry: entry.stats.last_used or 0.0
+            )
+        for entry in candidates:
+            if total <= self.memory_cap:
+                break
+            footprint = entry.stats.footprint
+            if self.unload(entry.spec.name, reason="memory"):
+                total -= footprint
+                evicted.append(entry.spec.name)
+        return evicted
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        if self.idle_seconds <= 0:
+            return []
+        now = self.clock() if now is None else now
+        with self._lock:
+            idle = [
+                entry.spec.name
+                for entry in self._loaded()
+                if entry.stats.in_use == 0
+                and entry.stats.last_used is not None
+                and now - entry.stats.last_used >= self.idle_seconds
+            ]
+        return [name for name in idle if self.unload(name, reason="idle")]
+
+    def refresh_resident(self) -> None:
+        """重新统计已加载模型的驻留字节数（权重映射实际驻留的页加私有内存），所有模型共用一次 smaps 读取。"""
+        loaded = [(entry, entry.model) for entry in self._loaded()]
+        paths = {id(model): _weight_paths(model) for _, model in loaded if model is not None}
+        mapped = _mapped_rss(path for group in paths.values() for path in group)
+        for entry, model in loaded:
+            if model is None:
+                continue
+            resident = None if mapped is None else sum(mapped[path] for path in paths[id(model)]) + model.private_bytes
+            with self._lock:
+                if entry.model is model:
+                    entry.stats.resident_bytes = resident
+
+    def stats(self) -> List[ModelStats]:
+        """各模型的加载耗时与内存占用；`resident_bytes` 为本进程中权重映射实际驻留的字节数加私有内存。"""
+        self.refresh_resident()
+        with self._lock:
+            return [ModelStats(**vars(entry.stats)) for _, entry in sorted(self._entries.items())]
+
+    def resident_bytes(self) -> Dict[tuple, float]:
+        """指标抓取时调用，只读缓存的驻留字节数，不解析 smaps。"""
+        with self._lock:
+            loaded = [entry.stats for entry in self._entries.values() if entry.stats.loaded]
+        return {(stats.name,): float(stats.resident_bytes or stats.footprint) for stats in loaded}
+
+    def _maintain(self) -> None:
+        self.evict_idle()
+        self.refresh_resident()
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self._maintain)
+            except Exception:
+                logger.exception("模型后台维护失败")
+
+    def start(self, preload: Sequence[str] = (), refresh_seconds: float = 60.0) -> None:
+        loop = asyncio.get_running_loop()
+        if preload:
+            loop.run_in_executor(None, self._preload_logged, list(preload))
+        if self._task is None:
+            interval = min(self.idle_seconds / 4, refresh_seconds) if self.idle_seconds > 0 else refresh_seconds
+            self._task = loop.create_task(self._loop(max(interval, 1.0)))
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# `services/api`，相对路径的 `models_dir` 以此为基准，与启动时的工作目录无关。
+API_ROOT = Path(__file__).resolve().parents[2]
+
+
+def create_model_registry(config: Settings) -> ModelRegistry:
+    root = (API_ROOT / config.models_dir).resolve()
+    return ModelRegistry(
+        root if root.is_dir() else None,
+        memory_cap=config.model_memory_cap_mb * 1024 * 1024,
+        idle_seconds=config.model_idle_seconds,
+    )
+
+
+model_registry = create_model_registry(settings)
+model_resident_bytes.set_function(model_registry.resident_bytes)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..schemas.project import LayoutNode
+
+# LayoutNode 中除 id / type / children 外的字段；取值为 None 或空容器时不存储。
+OPTIONAL_FIELDS: Tuple[str, ...] = (
+    "name",
+    "text",
+    "role",
+    "placeholder",
+    "layout",
+    "style",
+    "bindings",
+    "constraints",
+    "events",
+    "bounds",
+)
+CONTAINER_FIELDS = frozenset({"layout", "style", "bindings", "constraints", "events"})
+
+
+def _empty(name: str) -> Any:
+    if name == "events":
+        return []
+    return {} if name in CONTAINER_FIELDS else None
+
+
+class NodeTable:
+    """布局树的列式紧凑表示，按先序存储。
+
+    - `ids`、`types` 与 `parents`（父节点下标，根为 -1）按列存储，`type` 字符串经过 intern；
+    - 其余字段稀疏存储在 `columns[field][index]` 中，None 与空容器不占空间；
+    - 容器值与原布局树共享引用，表本身视为不可变。
+
+    只在 API 边界通过 `from_layout` / `to_layout` 与 pydantic 模型互相转换。
+    """
+
+    __slots__ = ("ids", "types", "parents", "columns", "_children", "_positions")
+
+    def __init__(self, ids: List[str], types: List[str], parents: "array[int]", columns: Dict[str, Dict[int, Any]]):
+        self.ids = ids
+        self.types = types
+        self.parents = parents
+        self.columns = columns
+        self._children: Optional[Tuple["array[int]", "array[int]"]] = None
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_layout(cls, root: LayoutNode) -> "NodeTable":
+        ids: List[str] = []
+        types: List[str] = []
+        parents = array("i")
+        columns: Dict[str, Dict[int, Any]] = {name: {} for name in OPTIONAL_FIELDS}
+        stack: List[Tuple[LayoutNode, int]] = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(ids)
+            ids.append(node.id)
+            types.append(sys.intern(node.type))
+            parents.append(parent)
+            values = node.__dict__
+            for name in OPTIONAL_FIELDS:
+                value = values[name]
+                if value:
+                    columns[name][index] = value
+                elif value is not None and name not in CONTAINER_FIELDS:
+                    columns[name][index] = value  # 保留空字符串，与 None 区分
+            stack.extend((child, index) for child in reversed(node.children))
+        return cls(ids, types, parents, {name: column for name, column in columns.items() if column})
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _child_index(self) -> Tuple["array[int]", "array[int]"]:
+        """CSR 形式的子节点索引：`offsets[i]:offsets[i + 1]` 是节点 i 的子节点在 `order` 中的范围。"""
+        if self._children is None:
+            counts = [0] * (len(self) + 1)
+            for parent in self.parents:
+                if parent >= 0:
+                    counts[parent + 1] += 1
+            offsets = array("i", counts)
+            for index in range(1, len(offsets)):
+                offsets[index] += offsets[index - 1]
+            order = array("i", [0]) * offsets[-1]
+            cursor = list(offsets[:-1])
+            for index, parent in enumerate(self.parents):
+                if parent >= 0:
+                    order[cursor[parent]] = index
+                    cursor[parent] += 1
+            self._children = (offsets, order)
+        return self._children
+
+    def children(self, index: int) -> List[int]:
+        offsets, order = self._child_index()
+        return list(order[offsets[index] : offsets[index + 1]])
+
+    def index_of(self, node_id: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {node_id: index for index, node_id in enumerate(self.ids)}
+        return self._positions.get(node_id)
+
+    def get(self, index: int, name: str, default: Any = None) -> Any:
+        column = self.columns.get(name)
+        return column.get(index, default) if column else default
+
+    def to_layout(self) -> LayoutNode:
+        """重建 pydantic 布局树。
+
+        数据来自已校验的树，因此与 `LayoutNode.construct` 一样跳过校验，
+        并直接按字段顺序写入 `__dict__`，省去 `construct` 逐字段求默认值的开销。
+        """
+        built: List[Optional[LayoutNode]] = [None] * len(self)
+        pending: List[List[LayoutNode]] = [[] for _ in range(len(self))]
+        columns = [(name, self.columns.get(name)) for name in OPTIONAL_FIELDS]
+        for index in range(len(self) - 1, -1, -1):
+            children = pending[index]
+            children.reverse()
+            values: Dict[str, Any] = {"id": self.ids[index], "type": self.types[index]}
+            fields_set = {"id", "type", "children"}
+            for name, column in columns:
+                if column is not None and index in column:
+                    values[name] = column[index]
+                    fields_set.add(name)
+                else:
+                    values[name] = _empty(name)
+            values["children"] = children
+            node = LayoutNode.__new__(LayoutNode)
+            object.__setattr__(node, "__dict__", values)
+            object.__setattr__(node, "__fields_set__", fields_set)
+            built[index] = node
+            parent = self.parents[index]
+            if parent >= 0:
+                pending[parent].append(node)
+        return built[0]  # type: ignore[return-value]
+
+    def nbytes(self) -> int:
+        """表结构本身占用的近似字节数（不含与原树共享的容器值）。"""
+        size = sys.getsizeof(self.ids) + sys.getsizeof(self.types) + sys.getsizeof(self.parents)
+        size += sum(sys.getsizeof(node_id) for node_id in self.ids)
+        size += sum(sys.getsizeof(column) for column in self.columns.values())
+        return size
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from ..schemas.project import Bounds, LayoutNode, UIIRPatch
+
+# 参与 update 比较的字段；id 与 children 由 diff 单独处理。
+_SCALAR_FIELDS = tuple(name for name in LayoutNode.__fields__ if name not in {"id", "children"})
+
+
+class PatchError(ValueError):
+    """Patch 无法应用到当前布局树。"""
+
+
+def _coerce_node(value: Any) -> LayoutNode:
+    return value if isinstance(value, LayoutNode) else LayoutNode.parse_obj(value)
+
+
+def _coerce_update(payload: Dict[str, Any]) -> Dict[str, Any]:
+    update = dict(payload)
+    if "children" in update:
+        update["children"] = [_coerce_node(child) for child in update["children"] or []]
+    if isinstance(update.get("bounds"), dict):
+        update["bounds"] = Bounds.parse_obj(update["bounds"])
+    return update
+
+
+def apply_to_target(node: LayoutNode, patch: UIIRPatch, is_root: bool) -> Optional[LayoutNode]:
+    if patch.op == "remove":
+        if is_root:
+            raise PatchError("Cannot remove the root node")
+        return None
+    if patch.op in ("replace", "update"):
+        return node.copy(update=_coerce_update(patch.payload or {}))
+    if patch.op == "insert":
+        if not patch.payload:
+            raise PatchError("Insert patch requires payload")
+        position = len(node.children) if patch.position is None else patch.position
+        children = list(node.children)
+        children.insert(position, _coerce_node(patch.payload))
+        return node.copy(update={"children": children})
+    raise PatchError(f"Unsupported patch op: {patch.op}")
+
+
+def _find_path(tree: LayoutNode, target_id: str) -> Optional[List[LayoutNode]]:
+    stack: List[tuple[LayoutNode, List[LayoutNode]]] = [(tree, [tree])]
+    while stack:
+        node, path = stack.pop()
+        if node.id == target_id:
+            return path
+        for child in reversed(node.children):
+            stack.append((child, path + [child]))
+    return None
+
+
+def rebuild_path(path: Sequence[LayoutNode], replacement: Optional[LayoutNode]) -> List[Optional[LayoutNode]]:
+    """用 `replacement` 替换路径末端节点，并沿路径向上复制祖先，返回新的路径（根在前）。
+
+    只有从根到目标的节点会被复制，其余子树与旧版本共享；`replacement` 为 None 表示删除。
+    """
+    rebuilt: List[Optional[LayoutNode]] = [replacement]
+    current = replacement
+    for depth in range(len(path) - 1, 0, -1):
+        parent, child = path[depth - 1], path[depth]
+        children = list(parent.children)
+        index = next(i for i, item in enumerate(children) if item is child)
+        if current is None:
+            del children[index]
+        else:
+            children[index] = current
+        current = parent.copy(update={"children": children})
+        rebuilt.append(current)
+    if current is None:
+        raise PatchError("Cannot remove the root node")
+    rebuilt.reverse()
+    return rebuilt
+
+
+def apply_patch(tree: LayoutNode, patch: UIIRPatch) -> LayoutNode:
+    """`packages/ui-ir` 中 `applyPatch` 的 Python 版本，返回新树且不修改 `tree`。
+
+    与 TS 版本一致，`replace` 与 `update` 都会把 payload 合并进目标节点；
+    `insert` 在 `position` 处插入子节点，未指定时追加到末尾。
+    """
+    path = _find_path(tree, patch.target_id)
+    if path is None:
+        raise PatchError(f"Patch target not found: {patch.target_id}")
+    return rebuild_path(path, apply_to_target(path[-1], patch, is_root=len(path) == 1))[0]
+
+
+def apply_patches(tree: LayoutNode, patches: Iterable[UIIRPatch]) -> LayoutNode:
+    for patch in patches:
+        tree = apply_patch(tree, patch)
+    return tree
+
+
+def node_payload(node: LayoutNode) -> Dict[str, Any]:
+    """节点的紧凑表示，省略默认值字段。"""
+    return node.dict(exclude_defaults=True)
+
+
+def _longest_increasing_run(values: Sequence[int]) -> set[int]:
+    """返回最长递增子序列所在的下标集合，用于找出无需移动的子节点。"""
+    if not values:
+        return set()
+    tails: List[int] = []
+    tail_indexes: List[int] = []
+    previous: List[int] = [-1] * len(values)
+    for index, value in enumerate(values):
+        position = bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[position] = value
+            tail_indexes[position] = index
+        previous[index] = tail_indexes[position - 1] if position else -1
+    result = set()
+    cursor = tail_indexes[-1]
+    while cursor != -1:
+        result.add(cursor)
+        cursor = previous[cursor]
+    return result
+
+
+def diff_trees(old: LayoutNode, new: LayoutNode) -> List[UIIRPatch]:
+    """计算把 `old` 变为 `new` 的 patch 列表，按顺序应用即可还原 `new`。
+
+    两棵树共享的子树（同一对象）会被直接跳过，因此在结构共享的版本之间，
+    开销与变更规模成正比而不是与树的大小成正比。
+    """
+    if old is new:
+        return []
+    if old.id != new.id:
+        return [UIIRPatch(target_id=old.id, op="replace", payload=new.dict())]
+    removes: List[UIIRPatch] = []
+    inserts: List[UIIRPatch] = []
+    updates: List[UIIRPatch] = []
+    _diff_node(old, new, removes, inserts, updates)
+    # 先删除再插入：跨父节点移动的节点不会在中间状态下出现重复 id。
+    return removes + inserts + updates
+
+
+def _diff_node(
+    old: LayoutNode,
+    new: LayoutNode,
+    removes: List[UIIRPatch],
+    inserts: List[UIIRPatch],
+    updates: List[UIIRPatch],
+) -> None:
+    if old is new:
+        return
+    changes = {
+        name: getattr(new, name) for name in _SCALAR_FIELDS if getattr(old, name) != getattr(new, name)
+    }
+    if changes:
+        updates.append(UIIRPatch(target_id=new.id, op="update", payload=changes))
+    if old.children is new.children:
+        return
+
+    old_positions = {child.id: index for index, child in enumerate(old.children)}
+
+    common = [child for child in new.children if child.id in old_positions]
+    kept_indexes = _longest_increasing_run([old_positions[child.id] for child in common])
+    kept = {common[index].id for index in kept_indexes}
+
+    for child in old.children:
+        if child.id not in kept:
+            removes.append(UIIRPatch(target_id=child.id, op="remove"))
+    for position, child in enumerate(new.children):
+        if child.id not in kept:
+            inserts.append(
+                UIIRPatch(target_id=new.id, op="insert", position=position, payload=node_payload(child))
+            )
+    for child in new.children:
+        if child.id in kept:
+            _diff_node(old.children[old_positions[child.id]], child, removes, inserts, updates)
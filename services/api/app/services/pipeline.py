@@ -1,14 +1,29 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import uuid
+from dataclasses import dataclass, replace
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Optional
-
-from ..core.config import settings
-from ..schemas.project import Asset, CodeBundle, LayoutNode, ProjectCreateResponse, UIIRPayload
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from ..schemas.project import Asset, CodeBundle, LayoutNode, ProjectCreateResponse, UIIRPatch, UIIRPayload
+from .audio import MOCK_TRANSCRIPT, AudioDecodeError, transcribe
+from .cache import content_hash, generation_cache
+from .codegen import changed_files, generate_code
+from .executor import stage_executor
+from .intents import describe, plan_patches
+from .layout_index import LayoutIndex
+from .layout_solver import dirty_nodes, relayout
+from .metrics import payload_bytes, span
+from .patches import diff_trees
+from .revisions import revision_log
 from .store import ProjectState, store
+from .uploads import StoredUpload, UploadSource, ingest
+from .vision import detect_layout
+
+T = TypeVar("T")
+
+PIPELINE_STAGES = ("sketch_parsed", "transcript_ready", "ui_ir_fused", "code_generated")
 
 SAMPLE_COMPONENTS: List[Dict[str, object]] = [
     {
@@ -43,19 +58,18 @@ SAMPLE_COMPONENTS: List[Dict[str, object]] = [
 ]
 
 
-def _storage_path() -> Path:
-    path = Path(settings.storage_dir)
-    path.mkdir(parents=True, exist_ok=True)
-    return path
-
+@dataclass
+class IterationResult:
+    project: ProjectState
+    patches: List[UIIRPatch]
+    changed_files: List[str]
 
-def _save_upload(content: bytes, suffix: str) -> str:
-    file_path = _storage_path() / f"{uuid.uuid4()}.{suffix}"
-    file_path.write_bytes(content)
-    return str(file_path)
 
-
-def parse_sketch(sketch_bytes: bytes) -> LayoutNode:
+def parse_sketch(sketch: UploadSource) -> LayoutNode:
+    """检测草图中的框选区域生成布局树；无法解码或没有检测到区域时退回示例组件。"""
+    detected = detect_layout(sketch)
+    if detected is not None:
+        return detected
     root = LayoutNode(
         id="root",
         type="page",
@@ -66,20 +80,18 @@ def parse_sketch(sketch_bytes: bytes) -> LayoutNode:
     return root
 
 
-def transcribe_audio(audio_bytes: Optional[bytes]) -> Optional[str]:
-    if audio_bytes is None:
+def transcribe_audio(audio: Optional[UploadSource]) -> Optional[str]:
+    """流式解码 WAV 并只转写语音段；全是静音时返回 None，非 WAV 音频退回示例转写。"""
+    if audio is None:
         return None
-    return "在 Hero 区域显示标题 ProtoWeaver，加一个立即体验按钮，下方放三个特性卡片"
+    try:
+        return transcribe(audio) or None
+    except AudioDecodeError:
+        return MOCK_TRANSCRIPT
 
 
 def interpret_intent(transcript: Optional[str]) -> Dict[str, str]:
-    if not transcript:
-        return {}
-    return {
-        "summary": transcript,
-        "tone": "modern",
-        "accent_color": "#3b82f6",
-    }
+    return describe(transcript)
 
 
 def fuse_modalities(layout: LayoutNode, intent: Dict[str, str], assets: List[Asset]) -> UIIRPayload:
@@ -100,174 +112,51 @@ def fuse_modalities(layout: LayoutNode, intent: Dict[str, str], assets: List[Ass
     )
 
 
-def generate_code(ui_ir: UIIRPayload) -> CodeBundle:
-    files: Dict[str, str] = {}
-    files["package.json"] = json.dumps(
-        {
-            "name": "proto-preview",
-            "private": True,
-            "scripts": {
-                "dev": "next dev",
-                "build": "next build",
-                "start": "next start",
-            },
-            "dependencies": {
-                "next": "^14.1.0",
-                "react": "^18.2.0",
-                "react-dom": "^18.2.0",
-                "tailwindcss": "^3.4.1",
-            },
-        },
-        indent=2,
-        ensure_ascii=False,
+def _codegen_key(ui_ir: UIIRPayload) -> str:
+    # 只对代码生成实际读取的字段取哈希，见 codegen.RENDERERS 中的 depends_on。
+    return content_hash(
+        ui_ir.json(include={"layout_tree": ..., "metadata": {"accent"}}, sort_keys=True, ensure_ascii=False)
     )
 
-    files["app/page.tsx"] = _render_next_page(ui_ir)
-    files["app/layout.tsx"] = _render_layout()
-    files["tailwind.config.js"] = _render_tailwind()
-    files["postcss.config.js"] = _render_postcss()
-    files["globals.css"] = _render_globals(ui_ir)
-
-    return CodeBundle(framework="nextjs", entry="app/page.tsx", files=files)
-
-
-def _render_next_page(ui_ir: UIIRPayload) -> str:
-    from textwrap import dedent
-
-    data_json = json.dumps(ui_ir.dict(), ensure_ascii=False, indent=2)
-    template = dedent("""
-    'use client';
-
-    import React from 'react';
-    import Link from 'next/link';
-
-    const data = __DATA__;
-
-    function renderNode(node) {
-      const common = { key: node.id };
-      switch (node.type) {
-        case 'hero':
-          return (
-            <section {...common} className="flex flex-col items-center gap-6 py-16">
-              <h1 className="text-4xl font-bold text-slate-900">{node.text ?? '欢迎使用 ProtoWeaver'}</h1>
-              <div className="flex gap-4">
-                {node.children?.map(renderNode)}
-              </div>
-            </section>
-          );
-        case 'button':
-          return (
-            <Link href={node?.events?.[0]?.action?.payload?.href ?? '#'} {...common} className="px-6 py-3 rounded-lg bg-blue-600 text-white">
-              {node.text ?? '点击'}
-            </Link>
-          );
-        case 'section':
-          return (
-            <section {...common} className="grid md:grid-cols-3 gap-6">
-              {node.children?.map(renderNode)}
-            </section>
-          );
-        case 'card':
-          return (
-            <div {...common} className="rounded-xl border border-slate-200 bg-white p-6 shadow-sm">
-              <h3 className="text-lg font-semibold text-slate-900">{node.text ?? '功能描述'}</h3>
-            </div>
-          );
-        default:
-          return (
-            <div {...common} className="p-4 border border-dashed border-slate-300">
-              <span className="text-xs uppercase tracking-wide text-slate-500">{node.type}</span>
-              {node.children?.map(renderNode)}
-            </div>
-          );
-      }
-    }
-
-    export default function Page() {
-      const tree = data.layout_tree;
-      return (
-        <main className="min-h-screen bg-slate-50 text-slate-900">
-          <div className="mx-auto flex max-w-5xl flex-col gap-12 px-6 py-16">
-            {renderNode(tree)}
-          </div>
-        </main>
-      );
-    }
-    """)
-
-    return template.replace('__DATA__', data_json)
-
-
-def _render_layout() -> str:
-    return """import './globals.css';
-import type { Metadata } from 'next';
-
-export const metadata: Metadata = {
-  title: 'ProtoWeaver Preview',
-  description: 'Generated by ProtoWeaver',
-};
 
-export default function RootLayout({ children }: { children: React.ReactNode }) {
-  return (
-    <html lang="zh-CN">
-      <body>{children}</body>
-    </html>
-  );
-}
-"""
+def _has_content(source: Optional[UploadSource]) -> bool:
+    if isinstance(source, StoredUpload):
+        return source.size > 0
+    return bool(source)
 
 
-def _render_tailwind() -> str:
-    return """/** @type {import('tailwindcss').Config} */
-module.exports = {
-  content: ['./app/**/*.{ts,tsx,js,jsx}', './components/**/*.{ts,tsx,js,jsx}'],
-  theme: {
-    extend: {},
-  },
-  plugins: [],
-};
-"""
+def _save_uploads(
+    sketch: UploadSource, audio: Optional[UploadSource]
+) -> Tuple[StoredUpload, Optional[StoredUpload]]:
+    sketch_upload = ingest(sketch)
+    payload_bytes.observe(sketch_upload.size, kind="sketch")
+    if not _has_content(audio):
+        return sketch_upload, None
+    audio_upload = ingest(audio)
+    payload_bytes.observe(audio_upload.size, kind="audio")
+    return sketch_upload, audio_upload
 
 
-def _render_postcss() -> str:
-    return """module.exports = {
-  plugins: {
-    tailwindcss: {},
-    autoprefixer: {},
-  },
-};
-"""
-
-
-def _render_globals(ui_ir: UIIRPayload) -> str:
-    accent = ui_ir.metadata.get("accent", "#3b82f6") if ui_ir.metadata else "#3b82f6"
-    return f"""@tailwind base;
-@tailwind components;
-@tailwind utilities;
-
-:root {{
-  --accent: {accent};
-}}
-
-body {{
-  font-family: 'Inter', sans-serif;
-}}
-"""
-
-
-def create_project(sketch_bytes: bytes, audio_bytes: Optional[bytes], transcript: Optional[str]) -> ProjectCreateResponse:
-    sketch_path = _save_upload(sketch_bytes, "png")
-    audio_path = _save_upload(audio_bytes, "wav") if audio_bytes else None
-
-    layout_tree = parse_sketch(sketch_bytes)
-    transcript_text = transcript or transcribe_audio(audio_bytes)
-    intent = interpret_intent(transcript_text)
-
+def _build_assets(
+    sketch: StoredUpload, audio: Optional[StoredUpload], transcript_text: Optional[str]
+) -> List[Asset]:
     assets: List[Asset] = [
-        Asset(id=f"sketch-{uuid.uuid4().hex[:6]}", kind="sketch", uri=sketch_path),
+        Asset(
+            id=f"sketch-{uuid.uuid4().hex[:6]}",
+            kind="sketch",
+            uri=sketch.path,
+            metadata={"sha256": sketch.sha256, "size": sketch.size},
+        ),
     ]
-    if audio_path:
-        assets.append(Asset(id=f"audio-{uuid.uuid4().hex[:6]}", kind="audio", uri=audio_path))
+    if audio:
+        assets.append(
+            Asset(
+                id=f"audio-{uuid.uuid4().hex[:6]}",
+                kind="audio",
+                uri=audio.path,
+                metadata={"sha256": audio.sha256, "size": audio.size},
+            )
+        )
     if transcript_text:
         assets.append(
             Asset(
@@ -277,39 +166,179 @@ def create_project(sketch_bytes: bytes, audio_bytes: Optional[bytes], transcript
                 metadata={"text": transcript_text},
             )
         )
+    return assets
+
 
-    ui_ir = fuse_modalities(layout_tree, intent, assets)
-    code_bundle = generate_code(ui_ir)
+def _persist(ui_ir: UIIRPayload, code_bundle: CodeBundle) -> ProjectCreateResponse:
     project_state = ProjectState(project_id=ui_ir.id, ui_ir=ui_ir, code_bundle=code_bundle)
+    bundle_size = sum(len(content.encode("utf-8")) for content in code_bundle.files.values())
+    payload_bytes.observe(bundle_size, kind="code_bundle")
     store.save(project_state)
-
+    revision_log.record(ui_ir.id, ui_ir, message="create")
     return ProjectCreateResponse(project_id=ui_ir.id, ui_ir=ui_ir, code_bundle=code_bundle)
 
 
-def apply_iteration(project_id: str, message: str) -> ProjectState:
+def create_project(
+    sketch: UploadSource, audio: Optional[UploadSource], transcript: Optional[str]
+) -> ProjectCreateResponse:
+    with span("create_project"):
+        with span("upload"):
+            sketch_upload, audio_upload = _save_uploads(sketch, audio)
+        with span("sketch"):
+            layout_tree = generation_cache.get_or_compute(
+                "sketch", sketch_upload.sha256, lambda: parse_sketch(sketch_upload)
+            )
+        transcript_text = transcript
+        if not transcript_text and audio_upload:
+            with span("audio"):
+                transcript_text = generation_cache.get_or_compute(
+                    "audio", audio_upload.sha256, lambda: transcribe_audio(audio_upload)
+                )
+        with span("intent"):
+            intent = (
+                generation_cache.get_or_compute(
+                    "intent", content_hash(transcript_text), lambda: interpret_intent(transcript_text)
+                )
+                if transcript_text
+                else interpret_intent(transcript_text)
+            )
+        with span("fuse"):
+            ui_ir = fuse_modalities(layout_tree, intent, _build_assets(sketch_upload, audio_upload, transcript_text))
+        with span("codegen"):
+            code_bundle = generation_cache.get_or_compute(
+                "codegen", _codegen_key(ui_ir), lambda: generate_code(ui_ir)
+            )
+        with span("store"):
+            return _persist(ui_ir, code_bundle)
+
+
+async def _run_cached_stage(stage: str, key: str, fn: Callable[..., T], *args: Any) -> T:
+    hit, value = await stage_executor.run("cache", generation_cache.lookup, stage, key)
+    if hit:
+        return value
+    value = await stage_executor.run(stage, fn, *args)
+    await stage_executor.run("cache", generation_cache.store, stage, key, value)
+    return value
+
+
+async def _resolve_transcript(audio: Optional[StoredUpload], transcript: Optional[str]) -> Optional[str]:
+    if transcript or not audio:
+        return transcript
+    return await _run_cached_stage("audio", audio.sha256, transcribe_audio, audio)
+
+
+async def create_project_async(
+    sketch: UploadSource,
+    audio: Optional[UploadSource],
+    transcript: Optional[str],
+    on_stage: Optional[Callable[[str], None]] = None,
+) -> ProjectCreateResponse:
+    """`create_project` 的异步版本：各阶段交给 `stage_executor`，不阻塞事件循环。
+
+    草图解析与语音转写互不依赖，会并发执行；每完成一个 `PIPELINE_STAGES` 中的阶段就回调 `on_stage`。
+    已通过 `stream_upload` 落盘的上传直接复用其路径与摘要，不再读入内存。
+    """
+    notify = on_stage or (lambda _stage: None)
+    with span("create_project"):
+        sketch_upload, audio_upload = await stage_executor.run("upload", _save_uploads, sketch, audio)
+
+        async def parse() -> LayoutNode:
+            layout = await _run_cached_stage("sketch", sketch_upload.sha256, parse_sketch, sketch_upload)
+            notify("sketch_parsed")
+            return layout
+
+        async def transcribe() -> Optional[str]:
+            text = await _resolve_transcript(audio_upload, transcript)
+            notify("transcript_ready")
+            return text
+
+        layout_tree, transcript_text = await asyncio.gather(parse(), transcribe())
+        if transcript_text:
+            intent = await _run_cached_stage(
+                "intent", content_hash(transcript_text), interpret_intent, transcript_text
+            )
+        else:
+            intent = interpret_intent(transcript_text)
+
+        with span("fuse"):
+            ui_ir = fuse_modalities(layout_tree, intent, _build_assets(sketch_upload, audio_upload, transcript_text))
+        notify("ui_ir_fused")
+        code_bundle = await _run_cached_stage("codegen", _codegen_key(ui_ir), generate_code, ui_ir)
+        notify("code_generated")
+        return await stage_executor.run("store", _persist, ui_ir, code_bundle)
+
+
+def _commit_revision(
+    project: ProjectState,
+    layout_tree: LayoutNode,
+    metadata: Dict[str, Any],
+    message: str,
+    index: Optional[LayoutIndex] = None,
+) -> IterationResult:
+    """以 `layout_tree`/`metadata` 生成项目的下一个版本，保存并写入版本日志；`index` 为规划 patch 时使用的私有索引。"""
+    previous = project.ui_ir
+    revision = previous.metadata.get("revision", 1)
+    ui_ir = previous.copy(update={"layout_tree": layout_tree, "metadata": {**metadata, "revision": revision + 1}})
+
+    changed = {"metadata.revision"}
+    if layout_tree is not previous.layout_tree:
+        changed.add("layout_tree")
+    changed.update(
+        f"metadata.{key}"
+        for key in set(metadata) | set(previous.metadata)
+        if metadata.get(key) != previous.metadata.get(key)
+    )
+    code_bundle = generate_code(ui_ir, previous=project.code_bundle, changed=changed)
+
+    # 新旧版本共享未修改的子树，旧的 ProjectState 保持不变，保留历史版本几乎没有额外开销。
+    index = index if index is not None else project.index
+    if index is not None and index.root is not layout_tree:
+        index = None
+    patches = diff_trees(previous.layout_tree, layout_tree)
+    # 上一版本已求解过布局时只重排 patch 影响到的子树；否则留给 layout_frame 按需整体求解。
+    frame = project.frame if project.frame is not None and project.frame.root is previous.layout_tree else None
+    if frame is not None and index is not None and patches:
+        frame = relayout(frame, index, dirty_nodes(frame, index, patches))
+    updated = replace(
+        project, ui_ir=ui_ir, code_bundle=code_bundle, updated_at=datetime.utcnow(), index=index, frame=frame
+    )
+    store.save(updated, expected_revision=revision)
+    revision_log.record(project.project_id, ui_ir, previous=previous, patches=patches, message=message)
+    return IterationResult(
+        project=updated,
+        patches=patches,
+        changed_files=changed_files(project.code_bundle, code_bundle),
+    )
+
+
+def run_iteration(project_id: str, message: str) -> IterationResult:
     project = store.get(project_id)
     if not project:
         raise ValueError("Project not found")
 
-    if "按钮" in message or "button" in message.lower():
-        hero = next((child for child in project.ui_ir.layout_tree.children if child.id == "hero"), None)
-        if hero:
-            new_button = LayoutNode(
-                id=f"cta-{uuid.uuid4().hex[:6]}",
-                type="button",
-                text="新增按钮",
-                events=[
-                    {
-                        "id": f"evt-{uuid.uuid4().hex[:6]}",
-                        "trigger": "onClick",
-                        "action": {"type": "emit", "payload": {"event": "custom"}},
-                    }
-                ],
-            )
-            hero.children.append(new_button)
+    # 已提交版本的索引可能被并发的迭代同时读取，在私有副本上规划 patch，提交成功后副本交给新版本。
+    index = project.layout_index.copy()
+    plan_patches(index, message)
+    return _commit_revision(project, index.root, project.ui_ir.metadata, message, index)
+
 
-    project.ui_ir.metadata["revision"] = project.ui_ir.metadata.get("revision", 1) + 1
-    project.code_bundle = generate_code(project.ui_ir)
-    project.updated_at = datetime.utcnow()
-    store.save(project)
-    return project
+def revert_project(project_id: str, revision: int) -> IterationResult:
+    """把项目恢复到历史版本 `revision` 的布局与元数据；恢复本身作为一个新版本提交，可再次撤销。"""
+    project = store.get(project_id)
+    if not project:
+        raise ValueError("Project not found")
+    target = revision_log.reconstruct(project_id, revision)
+    return _commit_revision(project, target.layout_tree, target.metadata, f"revert to revision {revision}")
+
+
+def get_revision(project_id: str, revision: int) -> Tuple[UIIRPayload, CodeBundle]:
+    """重建历史版本的 UI-IR 与代码包；代码包经阶段缓存，重复访问同一版本不会重新渲染。"""
+    if not store.get(project_id):
+        raise ValueError("Project not found")
+    ui_ir = revision_log.reconstruct(project_id, revision)
+    code_bundle = generation_cache.get_or_compute("codegen", _codegen_key(ui_ir), lambda: generate_code(ui_ir))
+    return ui_ir, code_bundle
+
+
+def apply_iteration(project_id: str, message: str) -> ProjectState:
+    return run_iteration(project_id, message).project
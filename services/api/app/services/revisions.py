@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import Settings, settings
+from ..schemas.project import RevisionSummary, UIIRPatch, UIIRPayload
+from .node_table import NodeTable
+from .patches import apply_patches
+from .serialization import dumps, loads, to_builtins
+
+
+class RevisionNotFoundError(LookupError):
+    """请求的版本不存在或已被压缩。"""
+
+
+@dataclass
+class RevisionEntry:
+    """版本日志中的一项：完整快照，或相对上一版本的 patch 与顶层字段变化。"""
+
+    revision: int
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    message: Optional[str] = None
+    snapshot: Optional[UIIRPayload] = None
+    patches: List[UIIRPatch] = field(default_factory=list)
+    header: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def is_snapshot(self) -> bool:
+        return self.snapshot is not None
+
+
+@dataclass(frozen=True)
+class CompactSnapshot:
+    """内存版本日志中的快照：布局树存为 `NodeTable`，其余字段浅拷贝，不持有提交时的 pydantic 对象。"""
+
+    header: Dict[str, Any]
+    fields_set: frozenset
+    table: NodeTable
+
+    @classmethod
+    def from_payload(cls, payload: UIIRPayload) -> "CompactSnapshot":
+        return cls(
+            header={name: value for name, value in payload.__dict__.items() if name != "layout_tree"},
+            fields_set=frozenset(payload.__fields_set__),
+            table=NodeTable.from_layout(payload.layout_tree),
+        )
+
+    def to_payload(self) -> UIIRPayload:
+        return UIIRPayload.construct(_fields_set=set(self.fields_set), layout_tree=self.table.to_layout(), **self.header)
+
+
+def _header_changes(previous: UIIRPayload, current: UIIRPayload) -> Dict[str, Any]:
+    before = previous.__dict__
+    return {
+        name: value
+        for name, value in current.__dict__.items()
+        if name != "layout_tree" and (before.get(name) is not value and before.get(name) != value)
+    }
+
+
+class RevisionLog(ABC):
+    """按项目记录版本历史：每 `snapshot_interval` 个版本保存一次完整快照，其余版本只保存增量。
+
+    重建任意版本最多回放 `snapshot_interval - 1` 个增量；超过 `retention` 的旧版本会被压缩，
+    压缩后最早保留的版本改写为快照。
+    """
+
+    def __init__(self, snapshot_interval: int = 10, retention: Optional[int] = 200) -> None:
+        self.snapshot_interval = max(snapshot_interval, 1)
+        self.retention = retention
+
+    @abstractmethod
+    def _append(self, project_id: str, entry: RevisionEntry) -> None:
+        ...
+
+    @abstractmethod
+    def _chain(self, project_id: str, revision: int) -> List[RevisionEntry]:
+        """返回 `revision` 之前最近的快照到 `revision` 的全部条目，按版本号升序。"""
+
+    @abstractmethod
+    def _truncate(self, project_id: str, base: RevisionEntry) -> None:
+        """删除早于 `base.revision` 的条目，并用快照 `base` 替换该版本。"""
+
+    @abstractmethod
+    def history(self, project_id: str) -> List[RevisionSummary]:
+        ...
+
+    @abstractmethod
+    def bounds(self, project_id: str) -> Optional[Tuple[int, int]]:
+        """(最早保留的版本, 最新版本)。"""
+
+    def _is_snapshot_revision(self, revision: int) -> bool:
+        return (revision - 1) % self.snapshot_interval == 0
+
+    def record(
+        self,
+        project_id: str,
+        current: UIIRPayload,
+        previous: Optional[UIIRPayload] = None,
+        patches: Optional[List[UIIRPatch]] = None,
+        message: Optional[str] = None,
+    ) -> RevisionEntry:
+        revision = int(current.metadata.get("revision", 1))
+        if previous is None or patches is None or self._is_snapshot_revision(revision):
+            entry = RevisionEntry(revision=revision, message=message, snapshot=current)
+        else:
+            entry = RevisionEntry(
+                revision=revision, message=message, patches=list(patches), header=_header_changes(previous, current)
+            )
+        self._append(project_id, entry)
+        if self.retention and self._is_snapshot_revision(revision):
+            self.compact(project_id, self.retention)
+        return entry
+
+    def reconstruct(self, project_id: str, revision: int) -> UIIRPayload:
+        chain = self._chain(project_id, revision)
+        if not chain or chain[-1].revision != revision or not chain[0].is_snapshot:
+            raise RevisionNotFoundError(f"Revision {revision} of project {project_id} is not available")
+        base = chain[0].snapshot
+        assert base is not None
+        tree = base.layout_tree
+        header: Dict[str, Any] = {}
+        for entry in chain[1:]:
+            tree = apply_patches(tree, entry.patches)
+            header.update(entry.header)
+        if tree is base.layout_tree and not header:
+            return base
+        return base.copy(update={**header, "layout_tree": tree})
+
+    def compact(self, project_id: str, keep: int) -> int:
+        """只保留最近 `keep` 个版本，返回删除的版本数。"""
+        bounds = self.bounds(project_id)
+        if bounds is None:
+            return 0
+        first, last = bounds
+        base_revision = last - keep + 1
+        if base_revision <= first:
+            return 0
+        base = self._chain(project_id, base_revision)[-1]
+        if not base.is_snapshot:
+            base = RevisionEntry(
+                revision=base.revision,
+                created_at=base.created_at,
+                message=base.message,
+                snapshot=self.reconstruct(project_id, base_revision),
+            )
+        self._truncate(project_id, base)
+        return base_revision - first
+
+
+class InMemoryRevisionLog(RevisionLog):
+    """快照以 `CompactSnapshot` 保存，读取时重建；增量条目原样保存。"""
+
+    def __init__(self, snapshot_interval: int = 10, retention: Optional[int] = 200) -> None:
+        super().__init__(snapshot_interval, retention)
+        self._entries: Dict[str, List[Tuple[RevisionEntry, Optional[CompactSnapshot]]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pack(entry: RevisionEntry) -> Tuple[RevisionEntry, Optional[CompactSnapshot]]:
+        if entry.snapshot is None:
+            return entry, None
+        return replace(entry, snapshot=None), CompactSnapshot.from_payload(entry.snapshot)
+
+    @staticmethod
+    def _unpack(item: Tuple[RevisionEntry, Optional[CompactSnapshot]]) -> RevisionEntry:
+        entry, snapshot = item
+        return entry if snapshot is None else replace(entry, snapshot=snapshot.to_payload())
+
+    def _append(self, project_id: str, entry: RevisionEntry) -> None:
+        item = self._pack(entry)
+        with self._lock:
+            entries = self._entries.setdefault(project_id, [])
+            if entries and entries[-1][0].revision >= entry.revision:
+                # 同一版本重复记录时以最新的为准，并丢弃其后的条目。
+                entries[:] = [stored for stored in entries if stored[0].revision < entry.revision]
+            entries.append(item)
+
+    def _chain(self, project_id: str, revision: int) -> List[RevisionEntry]:
+        with self._lock:
+            entries = self._entries.get(project_id, [])
+            end = bisect_right([entry.revision for entry, _ in entries], revision)
+            start = end - 1
+            while start >= 0 and entries[start][1] is None:
+                start -= 1
+            chain = entries[max(start, 0) : end]
+        return [self._unpack(item) for item in chain]
+
+    def _truncate(self, project_id: str, base: RevisionEntry) -> None:
+        item = self._pack(base)
+        with self._lock:
+            entries = self._entries.get(project_id, [])
+            self._entries[project_id] = [item] + [stored for stored in entries if stored[0].revision > base.revision]
+
+    def history(self, project_id: str) -> List[RevisionSummary]:
+        with self._lock:
+            entries = list(self._entries.get(project_id, []))
+        return [
+            RevisionSummary(
+                revision=entry.revision,
+                created_at=entry.created_at,
+                message=entry.message,
+                is_snapshot=snapshot is not None,
+            )
+            for entry, snapshot in entries
+        ]
+
+    def bounds(self, project_id: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            entries = self._entries.get(project_id)
+            return (entries[0][0].revision, entries[-1][0].revision) if entries else None
+
+
+class SQLiteRevisionLog(RevisionLog):
+    """与 `SQLiteProjectStore` 共用数据库文件的版本日志，快照与增量均以压缩 JSON 存储。"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS revisions (
+        project_id TEXT NOT NULL,
+        revision INTEGER NOT NULL,
+        is_snapshot INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        message TEXT,
+        body BLOB NOT NULL,
+        PRIMARY KEY (project_id, revision)
+    )
+    """
+
+    def __init__(self, path: str, snapshot_interval: int = 10, retention: Optional[int] = 200) -> None:
+        super().__init__(snapshot_interval, retention)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self._SCHEMA)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(entry: RevisionEntry) -> bytes:
+        if entry.snapshot is not None:
+            body: Any = to_builtins(entry.snapshot)
+        else:
+            body = {"patches": to_builtins(entry.patches), "header": to_builtins(entry.header)}
+        return zlib.compress(dumps(body))
+
+    @staticmethod
+    def _decode(row: tuple) -> RevisionEntry:
+        revision, is_snapshot, created_at, message, body = row
+        data = loads(zlib.decompress(body))
+        entry = RevisionEntry(revision=revision, created_at=datetime.fromisoformat(created_at), message=message)
+        if is_snapshot:
+            entry.snapshot = UIIRPayload.parse_obj(data)
+        else:
+            entry.patches = [UIIRPatch.parse_obj(patch) for patch in data["patches"]]
+            entry.header = data["header"]
+        return entry
+
+    def _row(self, project_id: str, entry: RevisionEntry) -> tuple:
+        created_at = entry.created_at.isoformat()
+        return (project_id, entry.revision, int(entry.is_snapshot), created_at, entry.message, self._encode(entry))
+
+    def _append(self, project_id: str, entry: RevisionEntry) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM revisions WHERE project_id = ? AND revision >= ?", (project_id, entry.revision)
+                )
+                self._conn.execute("INSERT INTO revisions VALUES (?, ?, ?, ?, ?, ?)", self._row(project_id, entry))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _chain(self, project_id: str, revision: int) -> List[RevisionEntry]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT revision, is_snapshot, created_at, message, body FROM revisions
+                WHERE project_id = ? AND revision <= ? AND revision >= COALESCE(
+                    (SELECT MAX(revision) FROM revisions WHERE project_id = ? AND revision <= ? AND is_snapshot = 1), 0
+                )
+                ORDER BY revision
+                """,
+                (project_id, revision, project_id, revision),
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _truncate(self, project_id: str, base: RevisionEntry) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM revisions WHERE project_id = ? AND revision <= ?", (project_id, base.revision)
+                )
+                self._conn.execute("INSERT INTO revisions VALUES (?, ?, ?, ?, ?, ?)", self._row(project_id, base))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def history(self, project_id: str) -> List[RevisionSummary]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT revision, created_at, message, is_snapshot FROM revisions WHERE project_id = ? ORDER BY revision",
+                (project_id,),
+            ).fetchall()
+        return [
+            RevisionSummary(
+                revision=revision,
+                created_at=datetime.fromisoformat(created_at),
+                message=message,
+                is_snapshot=bool(is_snapshot),
+            )
+            for revision, created_at, message, is_snapshot in rows
+        ]
+
+    def bounds(self, project_id: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            first, last = self._conn.execute(
+                "SELECT MIN(revision), MAX(revision) FROM revisions WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return (first, last) if first is not None else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_revision_log(config: Settings) -> RevisionLog:
+    retention = config.revision_retention or None
+    if config.store_backend == "sqlite":
+        return SQLiteRevisionLog(config.store_path, config.revision_snapshot_interval, retention)
+    return InMemoryRevisionLog(config.revision_snapshot_interval, retention)
+
+
+revision_log = create_revision_log(settings)
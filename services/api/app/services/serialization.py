@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, MutableMapping, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from ..core.config import settings
+from ..schemas.project import LayoutNode
+from .executor import stage_executor
+from .metrics import metrics
+
+try:  # 可选依赖，见 pyproject 中的 `fast` extra
+    import orjson
+except ImportError:  # pragma: no cover - 取决于安装环境
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore[assignment]
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # type: ignore[assignment]
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+EncodingKey = Tuple[str, Optional[str]]
+Encoded = Tuple[bytes, Optional[str]]
+
+encoded_responses = metrics.counter(
+    "protoweaver_encoded_responses",
+    "Encoded API responses by format, content coding and cache result",
+    ("format", "coding", "cache"),
+)
+
+
+def layout_to_builtins(node: LayoutNode) -> Dict[str, Any]:
+    """`LayoutNode.dict()` 的快速版本，结果与其相等。
+
+    布局树的字段都是 JSON 原生类型，只需要递归 `children`；`layout`/`style` 等字典直接引用原对象，
+    因此返回值只能用于序列化，不应修改。
+    """
+    data = node.__dict__.copy()
+    if node.bounds is not None:
+        data["bounds"] = node.bounds.__dict__.copy()
+    data["children"] = [layout_to_builtins(child) for child in node.children]
+    return data
+
+
+_ALIASES: Dict[type, Dict[str, str]] = {}
+
+
+def _aliases(model: type) -> Dict[str, str]:
+    aliases = _ALIASES.get(model)
+    if aliases is None:
+        aliases = {name: field.alias for name, field in model.__fields__.items() if field.alias != name}
+        _ALIASES[model] = aliases
+    return aliases
+
+
+def to_builtins(value: Any) -> Any:
+    """把 pydantic 模型（包括嵌套的 `LayoutNode`）转换为 dict/list 等内置类型，语义同 `.dict(by_alias=True)`。"""
+    if isinstance(value, LayoutNode):
+        return layout_to_builtins(value)
+    if isinstance(value, BaseModel):
+        aliases = _aliases(type(value))
+        if aliases:
+            return {aliases.get(key, key): to_builtins(item) for key, item in value.__dict__.items()}
+        return {key: to_builtins(item) for key, item in value.__dict__.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtins(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_builtins(item) for key, item in value.items()}
+    return value
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return to_builtins(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any, indent: bool = False) -> bytes:
+    """JSON 编码为 UTF-8 字节；安装了 orjson 时走快速路径，否则退回标准库。"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, default=_default, option=option)
+    if indent:
+        return json.dumps(value, default=_default, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _packb(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def _qualities(header: str) -> Dict[str, float]:
+    qualities: Dict[str, float] = {}
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, raw = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        qualities[token.strip().lower()] = quality
+    return qualities
+
+
+def negotiate(accept: str = "", accept_encoding: str = "") -> EncodingKey:
+    """根据 Accept / Accept-Encoding 选择响应格式与压缩方式；未安装的可选依赖不会被选中。"""
+    media = _qualities(accept)
+    fmt = "json"
+    if msgpack is not None:
+        msgpack_q = max((media.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES), default=0.0)
+        if msgpack_q > 0 and msgpack_q >= media.get(JSON_MEDIA_TYPE, 0.0):
+            fmt = "msgpack"
+
+    codings = _qualities(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    candidates = [("br", codings.get("br", wildcard))] if brotli is not None else []
+    candidates.append(("gzip", codings.get("gzip", wildcard)))
+    coding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return fmt, coding if quality > 0 else None
+
+
+def encode(value: Any, fmt: str, coding: Optional[str]) -> Encoded:
+    """编码并按需压缩，返回 (body, 实际使用的压缩方式)；小于阈值的响应不压缩。"""
+    body = _packb(to_builtins(value)) if fmt == "msgpack" else dumps(to_builtins(value))
+    if coding is None or len(body) < settings.response_compress_min_bytes:
+        return body, None
+    if coding == "br":
+        return brotli.compress(body, quality=settings.response_brotli_quality), coding
+    return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0), coding
+
+
+def request_encoding(request: Request) -> EncodingKey:
+    """按请求头协商 (格式, 压缩方式)。"""
+    return negotiate(request.headers.get("accept", ""), request.headers.get("accept-encoding", ""))
+
+
+def encoded_body_response(key: EncodingKey, encoded: Encoded, status_code: int = 200) -> Response:
+    """把已编码的 (body, 压缩方式) 包装成响应。"""
+    body, coding = encoded
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    media_type = MSGPACK_MEDIA_TYPES[0] if key[0] == "msgpack" else JSON_MEDIA_TYPE
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def encode_for(value: Any, key: EncodingKey) -> Encoded:
+    """在当前线程中按协商结果编码，供已经占用执行器名额的阶段直接调用。"""
+    encoded_responses.inc(format=key[0], coding=key[1] or "identity", cache="miss")
+    return encode(value, *key)
+
+
+async def encoded_response(
+    request: Request,
+    build: Callable[[], Any],
+    cache: Optional[MutableMapping[EncodingKey, Encoded]] = None,
+    status_code: int = 200,
+) -> Response:
+    """按请求头协商格式并编码 `build()` 的结果，编码与压缩在 `stage_executor` 中执行。
+
+    传入 `cache` 时按 (格式, 压缩方式) 缓存编码结果，命中时不再调用 `build`。
+    """
+    key = request_encoding(request)
+    encoded = cache.get(key) if cache is not None else None
+    encoded_responses.inc(format=key[0], coding=key[1] or "identity", cache="hit" if encoded else "miss")
+    if encoded is None:
+        encoded = await stage_executor.run("serialize", encode, build(), *key)
+        if cache is not None:
+            cache[key] = encoded
+    return encoded_body_response(key, encoded, status_code)
@@ -1,10 +1,26 @@
 from __future__ import annotations
 
+import queue
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Optional
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 
+from pydantic import BaseModel
+
+from ..core.config import Settings, settings
 from ..schemas.project import CodeBundle, UIIRPayload
+from .layout_index import LayoutIndex
+from .layout_solver import LayoutFrame, solve_layout
+from .node_table import NodeTable
+from .serialization import dumps, loads, to_builtins
 
 
 @dataclass
@@ -14,24 +30,422 @@ class ProjectState:
     code_bundle: CodeBundle
     created_at: datetime = field(default_factory=datetime.utcnow)
     updated_at: datetime = field(default_factory=datetime.utcnow)
+    index: Optional[LayoutIndex] = field(default=None, repr=False, compare=False)
+    frame: Optional[LayoutFrame] = field(default=None, repr=False, compare=False)
+    # 本版本响应的编码缓存，键为 (格式, 压缩方式)；`dataclasses.replace` 生成的新版本不会继承。
+    encoded: Dict[Tuple[str, Optional[str]], Tuple[bytes, Optional[str]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    @property
+    def layout_index(self) -> LayoutIndex:
+        """当前布局树的 id 索引，按需构建；索引已被其他版本接管时重新构建。"""
+        if self.index is None or self.index.root is not self.ui_ir.layout_tree:
+            self.index = LayoutIndex.build(self.ui_ir.layout_tree)
+        return self.index
+
+    @property
+    def layout_frame(self) -> LayoutFrame:
+        """当前布局树的绝对坐标，按需求解；迭代提交时由上一版本的结果增量重排得到。"""
+        if self.frame is None or self.frame.root is not self.ui_ir.layout_tree:
+            self.frame = solve_layout(self.ui_ir.layout_tree)
+        return self.frame
 
     def touch(self) -> None:
         self.updated_at = datetime.utcnow()
+        self.encoded.clear()
+
+
+class RevisionConflictError(RuntimeError):
+    """保存时发现存储中的 revision 与预期不一致（被其他请求抢先更新）。"""
+
+
+class ProjectStore(ABC):
+    """项目存储接口。`expected_revision` 用于乐观并发控制。"""
+
+    @abstractmethod
+    def save(self, project: ProjectState, expected_revision: Optional[int] = None) -> ProjectState:
+        ...
+
+    @abstractmethod
+    def save_many(self, projects: Iterable[ProjectState]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, project_id: str) -> Optional[ProjectState]:
+        ...
+
+    @abstractmethod
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> Dict[str, ProjectState]:
+        ...
+
+    def asset_digests(self, page_size: int = 256) -> Iterator[str]:
+        """各项目当前版本资产引用的 blob 摘要（每次引用产出一次）；默认分页遍历 `list`。"""
+        offset = 0
+        while True:
+            page = self.list(limit=page_size, offset=offset)
+            for project in page.values():
+                yield from _asset_digests(project.ui_ir.assets)
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+
+def _revision(project: ProjectState) -> int:
+    return int(project.ui_ir.metadata.get("revision", 1))
+
+
+def _asset_digests(assets: Iterable[Any]) -> Iterator[str]:
+    for asset in assets:
+        digest = asset.metadata.get("sha256")
+        if digest:
+            yield digest
 
 
-class InMemoryProjectStore:
+class InMemoryProjectStore(ProjectStore):
     def __init__(self) -> None:
         self._items: Dict[str, ProjectState] = {}
+        self._lock = threading.Lock()
 
-    def save(self, project: ProjectState) -> ProjectState:
-        self._items[project.project_id] = project
+    def save(self, project: ProjectState, expected_revision: Optional[int] = None) -> ProjectState:
+        with self._lock:
+            if expected_revision is not None:
+                current = self._items.get(project.project_id)
+                if current is None or _revision(current) != expected_revision:
+                    raise RevisionConflictError(project.project_id)
+            self._items[project.project_id] = project
         return project
 
+    def save_many(self, projects: Iterable[ProjectState]) -> None:
+        with self._lock:
+            self._items.update((project.project_id, project) for project in projects)
+
     def get(self, project_id: str) -> Optional[ProjectState]:
         return self._items.get(project_id)
 
-    def list(self) -> Dict[str, ProjectState]:
-        return dict(self._items)
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> Dict[str, ProjectState]:
+        with self._lock:
+            stop = offset + limit if limit is not None else None
+            return dict(islice(self._items.items(), offset, stop))
+
+    def asset_digests(self, page_size: int = 256) -> Iterator[str]:
+        with self._lock:
+            assets = [project.ui_ir.assets for project in self._items.values()]
+        for items in assets:
+            yield from _asset_digests(items)
+
+
+@dataclass
+class CompactProject:
+    """冷数据形式的项目：布局树存为 `NodeTable`，UI-IR 其余字段以浅拷贝的 dict 保存。"""
+
+    project_id: str
+    revision: int
+    header: Dict[str, Any]
+    fields_set: frozenset
+    table: NodeTable
+    code_bundle: CodeBundle
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_state(cls, project: ProjectState) -> "CompactProject":
+        ui_ir = project.ui_ir
+        return cls(
+            project_id=project.project_id,
+            revision=_revision(project),
+            header={name: value for name, value in ui_ir.__dict__.items() if name != "layout_tree"},
+            fields_set=frozenset(ui_ir.__fields_set__),
+            table=NodeTable.from_layout(ui_ir.layout_tree),
+            code_bundle=project.code_bundle,
+            created_at=project.created_at,
+            updated_at=project.updated_at,
+        )
+
+    def to_state(self) -> ProjectState:
+        ui_ir = UIIRPayload.construct(
+            _fields_set=set(self.fields_set), layout_tree=self.table.to_layout(), **self.header
+        )
+        return ProjectState(
+            project_id=self.project_id,
+            ui_ir=ui_ir,
+            code_bundle=self.code_bundle,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
+
+
+class CompactProjectStore(ProjectStore):
+    """内存存储的紧凑版本：最近访问的 `hot_entries` 个项目保持 pydantic 形式，
+    其余项目的布局树转换为 `NodeTable`，再次访问时才重建。
+    """
+
+    def __init__(self, hot_entries: int = 64) -> None:
+        self.hot_entries = hot_entries
+        self._hot: "OrderedDict[str, ProjectState]" = OrderedDict()
+        self._cold: Dict[str, CompactProject] = {}
+        self._lock = threading.Lock()
+
+    def _current_revision(self, project_id: str) -> Optional[int]:
+        if project_id in self._hot:
+            return _revision(self._hot[project_id])
+        cold = self._cold.get(project_id)
+        return cold.revision if cold is not None else None
+
+    def _promote(self, project: ProjectState) -> None:
+        self._cold.pop(project.project_id, None)
+        self._hot[project.project_id] = project
+        self._hot.move_to_end(project.project_id)
+        while len(self._hot) > self.hot_entries:
+            _, evicted = self._hot.popitem(last=False)
+            self._cold[evicted.project_id] = CompactProject.from_state(evicted)
+
+    def save(self, project: ProjectState, expected_revision: Optional[int] = None) -> ProjectState:
+        with self._lock:
+            if expected_revision is not None and self._current_revision(project.project_id) != expected_revision:
+                raise RevisionConflictError(project.project_id)
+            self._promote(project)
+        return project
+
+    def save_many(self, projects: Iterable[ProjectState]) -> None:
+        with self._lock:
+            for project in projects:
+                self._promote(project)
+
+    def get(self, project_id: str) -> Optional[ProjectState]:
+        with self._lock:
+            project = self._hot.get(project_id)
+            if project is not None:
+                self._hot.move_to_end(project_id)
+                return project
+            cold = self._cold.get(project_id)
+            if cold is None:
+                return None
+            project = cold.to_state()
+            self._promote(project)
+            return project
+
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> Dict[str, ProjectState]:
+        with self._lock:
+            stop = offset + limit if limit is not None else None
+            ids = islice(chain(self._cold, self._hot), offset, stop)
+            # 批量读取不提升为热数据，避免一次遍历把热点项目挤出去。
+            return {
+                project_id: self._hot[project_id] if project_id in self._hot else self._cold[project_id].to_state()
+                for project_id in ids
+            }
+
+    def asset_digests(self, page_size: int = 256) -> Iterator[str]:
+        # 冷数据的资产列表保存在 header 中，不需要重建布局树。
+        with self._lock:
+            assets = [project.ui_ir.assets for project in self._hot.values()]
+            assets.extend(cold.header["assets"] for cold in self._cold.values())
+        for items in assets:
+            yield from _asset_digests(items)
+
+
+class SQLiteProjectStore(ProjectStore):
+    """基于 SQLite（WAL 模式）的持久化存储，可在多个 API worker 进程间共享。
+
+    UI-IR 与代码包以压缩后的紧凑 JSON 存储；连接通过固定大小的连接池复用。
+    资产引用的 blob 摘要另存于 `project_assets`，与项目行在同一事务中更新，blob GC 只查询这张表。
+
+    最近读取的 `cache_entries` 个项目缓存在进程内，`get` 先用 `SELECT revision, updated_at` 校验，
+    未被其他进程修改时不再解压与解析整行。
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS projects (
+        project_id TEXT PRIMARY KEY,
+        revision INTEGER NOT NULL,
+        ui_ir BLOB NOT NULL,
+        code_bundle BLOB NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS project_assets (
+        project_id TEXT NOT NULL,
+        digest TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS project_assets_by_project ON project_assets (project_id)
+    """
+    _SCHEMA_VERSION = 1
+
+    def __init__(self, path: str, pool_size: int = 4, timeout: float = 30.0, cache_entries: int = 64) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, Tuple[int, str, ProjectState]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(self._SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < self._SCHEMA_VERSION:
+                self._backfill_assets(conn)
+
+    def _backfill_assets(self, conn: sqlite3.Connection) -> None:
+        """旧版本数据库没有 `project_assets`，首次打开时从已有项目补齐。"""
+        with self._transaction(conn):
+            conn.execute("DELETE FROM project_assets")
+            for row in conn.execute("SELECT * FROM projects").fetchall():
+                self._replace_assets(conn, self._decode(row))
+            conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _replace_assets(conn: sqlite3.Connection, project: ProjectState) -> None:
+        conn.execute("DELETE FROM project_assets WHERE project_id = ?", (project.project_id,))
+        conn.executemany(
+            "INSERT INTO project_assets VALUES (?, ?)",
+            [(project.project_id, digest) for digest in _asset_digests(project.ui_ir.assets)],
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @staticmethod
+    def _encode(model: BaseModel) -> bytes:
+        return zlib.compress(dumps(to_builtins(model)))
+
+    @staticmethod
+    def _row(project: ProjectState) -> tuple:
+        return (
+            project.project_id,
+            _revision(project),
+            SQLiteProjectStore._encode(project.ui_ir),
+            SQLiteProjectStore._encode(project.code_bundle),
+            project.created_at.isoformat(),
+            project.updated_at.isoformat(),
+        )
+
+    @staticmethod
+    def _decode(row: tuple) -> ProjectState:
+        project_id, _, ui_ir, code_bundle, created_at, updated_at = row
+        return ProjectState(
+            project_id=project_id,
+            ui_ir=UIIRPayload.parse_obj(loads(zlib.decompress(ui_ir))),
+            code_bundle=CodeBundle.parse_obj(loads(zlib.decompress(code_bundle))),
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+        )
+
+    def _remember(self, project: ProjectState, revision: int, updated_at: str) -> None:
+        if self.cache_entries <= 0:
+            return
+        with self._cache_lock:
+            self._cache[project.project_id] = (revision, updated_at, project)
+            self._cache.move_to_end(project.project_id)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _forget(self, project_id: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(project_id, None)
+
+    def save(self, project: ProjectState, expected_revision: Optional[int] = None) -> ProjectState:
+        row = self._row(project)
+        self._forget(project.project_id)
+        with self._connection() as conn, self._transaction(conn):
+            if expected_revision is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE projects SET revision = ?, ui_ir = ?, code_bundle = ?, updated_at = ? "
+                    "WHERE project_id = ? AND revision = ?",
+                    (row[1], row[2], row[3], row[5], project.project_id, expected_revision),
+                )
+                if cursor.rowcount == 0:
+                    raise RevisionConflictError(project.project_id)
+            self._replace_assets(conn, project)
+        self._remember(project, row[1], row[5])
+        return project
+
+    def save_many(self, projects: Iterable[ProjectState]) -> None:
+        projects = list(projects)
+        rows = [self._row(project) for project in projects]
+        for project in projects:
+            self._forget(project.project_id)
+        with self._connection() as conn, self._transaction(conn):
+            conn.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)", rows)
+            for project in projects:
+                self._replace_assets(conn, project)
+
+    def get(self, project_id: str) -> Optional[ProjectState]:
+        with self._cache_lock:
+            cached = self._cache.get(project_id)
+        with self._connection() as conn:
+            if cached is not None:
+                current = conn.execute(
+                    "SELECT revision, updated_at FROM projects WHERE project_id = ?", (project_id,)
+                ).fetchone()
+                if current == cached[:2]:
+                    with self._cache_lock:
+                        if project_id in self._cache:
+                            self._cache.move_to_end(project_id)
+                    return cached[2]
+            row = conn.execute("SELECT * FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+        if not row:
+            self._forget(project_id)
+            return None
+        project = self._decode(row)
+        self._remember(project, row[1], row[5])
+        return project
+
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> Dict[str, ProjectState]:
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM projects ORDER BY created_at, project_id LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return {row[0]: self._decode(row) for row in rows}
+
+    def asset_digests(self, page_size: int = 256) -> Iterator[str]:
+        with self._connection() as conn:
+            rows = conn.execute("SELECT digest FROM project_assets").fetchall()
+        return (digest for (digest,) in rows)
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def create_store(config: Settings) -> ProjectStore:
+    if config.store_backend == "sqlite":
+        return SQLiteProjectStore(
+            config.store_path, pool_size=config.store_pool_size, cache_entries=config.store_hot_entries
+        )
+    if config.store_backend == "memory":
+        return InMemoryProjectStore()
+    if config.store_backend == "compact":
+        return CompactProjectStore(hot_entries=config.store_hot_entries)
+    raise ValueError(f"Unknown store backend: {config.store_backend}")
 
 
-store = InMemoryProjectStore()
+store = create_store(settings)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_BLOCK = re.compile(r"\{\{>\s*(\w+)\s*\}\}")
+
+# 块插槽的取值：把内容追加到缓冲区，参数为插槽所在行的缩进。
+BlockRenderer = Callable[[List[str], str], None]
+
+
+@dataclass(frozen=True)
+class Slot:
+    name: str
+    indent: Optional[str] = None  # 块插槽记录所在列的缩进，行内插值为 None
+
+
+Part = Union[str, Slot]
+
+
+class Template:
+    """预编译模板。
+
+    `{{ name }}` 为行内插值，直接写入字符串值；独占一行的 `{{> name }}` 为块插槽，取值是
+    `BlockRenderer`，按插槽所在的缩进把内容写进同一个缓冲区。模板在构造时解析，
+    每个缩进层级的编译结果缓存在实例上，渲染时只做列表追加。
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = dedent(source).strip("\n") + "\n"
+        self._compiled: Dict[str, Tuple[Part, ...]] = {}
+        self.compile("")
+
+    def compile(self, indent: str) -> Tuple[Part, ...]:
+        compiled = self._compiled.get(indent)
+        if compiled is not None:
+            return compiled
+        parts: List[Part] = []
+        literal: List[str] = []
+
+        def flush() -> None:
+            if literal:
+                parts.append("".join(literal))
+                literal.clear()
+
+        for line in self.source.splitlines(keepends=True):
+            stripped = line.strip()
+            block = _BLOCK.fullmatch(stripped)
+            if block:
+                flush()
+                parts.append(Slot(block.group(1), indent + line[: len(line) - len(line.lstrip())]))
+                continue
+            if stripped:
+                literal.append(indent)
+            position = 0
+            for match in _PLACEHOLDER.finditer(line):
+                literal.append(line[position : match.start()])
+                flush()
+                parts.append(Slot(match.group(1)))
+                position = match.end()
+            literal.append(line[position:])
+        flush()
+        compiled = self._compiled[indent] = tuple(parts)
+        return compiled
+
+    def render_into(self, out: List[str], indent: str = "", **values: Union[str, BlockRenderer]) -> None:
+        for part in self.compile(indent):
+            if part.__class__ is str:
+                out.append(part)  # type: ignore[arg-type]
+            elif part.indent is None:  # type: ignore[union-attr]
+                out.append(values[part.name])  # type: ignore[union-attr,arg-type]
+            else:
+                values[part.name](out, part.indent)  # type: ignore[union-attr,operator]
+
+    def render(self, indent: str = "", **values: Union[str, BlockRenderer]) -> str:
+        out: List[str] = []
+        self.render_into(out, indent, **values)
+        return "".join(out)
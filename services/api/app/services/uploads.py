@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mmap
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple, Union
+
+from fastapi import UploadFile
+
+from ..core.config import settings
+from .blobs import blob_store
+
+
+class UploadTooLargeError(Exception):
+    """上传内容超过配置的大小上限。"""
+
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    """已存入 `blob_store` 的上传内容，`sha256` 在写入时增量计算，`path` 为 blob 路径。
+
+    对象只携带路径与摘要，可以安全地传给进程池中的流水线阶段。
+    """
+
+    path: str
+    sha256: str
+    size: int
+
+
+UploadSource = Union[bytes, StoredUpload]
+
+
+def source_digest(source: UploadSource) -> str:
+    if isinstance(source, StoredUpload):
+        return source.sha256
+    return hashlib.sha256(source).hexdigest()
+
+
+def _stored(digest: str) -> StoredUpload:
+    path = blob_store.path(digest)
+    return StoredUpload(path=str(path), sha256=digest, size=path.stat().st_size)
+
+
+def ingest_bytes(content: bytes) -> StoredUpload:
+    digest, _ = blob_store.put_bytes(content)
+    return _stored(digest)
+
+
+def ingest(source: UploadSource) -> StoredUpload:
+    return source if isinstance(source, StoredUpload) else ingest_bytes(source)
+
+
+@contextmanager
+def open_buffer(source: UploadSource) -> Iterator[Union[bytes, mmap.mmap]]:
+    """以只读 buffer 形式访问上传内容；落盘文件通过 mmap 映射，不整体读入内存。"""
+    if not isinstance(source, StoredUpload):
+        yield source
+        return
+    if source.size == 0:
+        yield b""
+        return
+    with open(source.path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        yield buffer
+
+
+async def stream_upload(upload: UploadFile, max_bytes: int, chunk_size: int = 1 << 20) -> StoredUpload:
+    """分块读取上传文件写入暂存区，边写边计算 sha256，超过 `max_bytes` 时中止。
+
+    写完后按摘要登记到 `blob_store`，内容已存在时直接复用；文件 I/O 在线程中执行，不阻塞事件循环。
+    """
+    part_path = blob_store.staging_path()
+    digest = hashlib.sha256()
+    size = 0
+    handle = await asyncio.to_thread(open, part_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            digest.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(part_path.unlink, True)
+        raise
+    await asyncio.to_thread(handle.close)
+    await asyncio.to_thread(blob_store.put_file, digest.hexdigest(), part_path)
+    return StoredUpload(path=str(blob_store.path(digest.hexdigest())), sha256=digest.hexdigest(), size=size)
+
+
+async def stream_form_uploads(
+    sketch: UploadFile, audio: Optional[UploadFile]
+) -> Tuple[StoredUpload, Optional[StoredUpload]]:
+    """按配置的分块大小与上限落盘表单中的草图与音频。
+
+    音频超限时已写入的草图不单独删除：它可能与其他项目共享，交由 blob GC 在宽限期后回收。
+    """
+    sketch_upload = await stream_upload(sketch, settings.max_sketch_bytes, settings.upload_chunk_size)
+    if audio is None:
+        return sketch_upload, None
+    audio_upload = await stream_upload(audio, settings.max_audio_bytes, settings.upload_chunk_size)
+    return sketch_upload, audio_upload
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from ..core.config import settings
+from ..schemas.project import Bounds, LayoutNode
+from .uploads import StoredUpload, UploadSource
+
+# 去噪与闭运算各需要 1 行邻域，分块处理时每块上下各多取 2 行。
+_HALO = 2
+
+
+class SketchDecodeError(ValueError):
+    """上传内容无法解码为图像，或像素数超过 `PROTOWEAVER_SKETCH_MAX_PIXELS`。"""
+
+
+@dataclass
+class Region:
+    """缩放后图像上的一个连通域外接框，`x1`/`y1` 不含。"""
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    pixels: int
+    children: List["Region"] = field(default_factory=list)
+    marks: int = 0  # 框内被过滤掉的小连通域（文字、图标笔画）数量
+
+    @property
+    def width(self) -> int:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> int:
+        return self.y1 - self.y0
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+    def contains(self, other: "Region") -> bool:
+        return self.x0 <= other.x0 and self.y0 <= other.y0 and other.x1 <= self.x1 and other.y1 <= self.y1
+
+
+def load_grayscale(source: UploadSource, max_side: Optional[int] = None) -> Tuple[np.ndarray, float]:
+    """解码并缩小为灰度图，返回 (uint8 数组, 原图与缩放图的比例)。
+
+    JPEG 通过 `draft` 在解码阶段直接按 1/2^n 缩小，其余格式解码后用 `reduce` 做整数倍面积平均，
+    再由 `thumbnail` 缩到 `max_side` 以内；面积平均同时起到低通去噪的作用。
+    """
+    max_side = max_side or settings.sketch_max_side
+    try:
+        image = Image.open(source.path if isinstance(source, StoredUpload) else io.BytesIO(source))
+        width, height = image.size
+        if width * height > settings.sketch_max_pixels:
+            raise SketchDecodeError(f"Sketch has {width * height} pixels, limit is {settings.sketch_max_pixels}")
+        image.draft("L", (max_side, max_side))
+        image = image.convert("L")
+        factor = max(image.width, image.height) // max_side
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail((max_side, max_side), Image.Resampling.BOX)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise SketchDecodeError(str(exc)) from exc
+    return np.asarray(image, dtype=np.uint8), width / image.width
+
+
+def otsu_threshold(histogram: np.ndarray) -> int:
+    """Otsu 阈值：使前景/背景类间方差最大的灰度值，小于阈值的像素视为笔画。"""
+    levels = np.arange(histogram.size, dtype=np.float64)
+    weight = np.cumsum(histogram, dtype=np.float64)
+    total = weight[-1]
+    cumulative = np.cumsum(histogram * levels)
+    background = total - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_dark = cumulative / weight
+        mean_light = (cumulative[-1] - cumulative) / background
+        variance = weight * background * (mean_dark - mean_light) ** 2
+    variance[~np.isfinite(variance)] = -1
+    return int(np.argmax(variance)) + 1
+
+
+def _neighbor_count(mask: np.ndarray) -> np.ndarray:
+    padded = np.pad(mask.astype(np.uint8), 1)
+    height, width = mask.shape
+    count = np.zeros(mask.shape, dtype=np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                count += padded[dy : dy + height, dx : dx + width]
+    return count
+
+
+def _clean_tile(tile: np.ndarray, threshold: int) -> np.ndarray:
+    """二值化、去掉孤立噪点，再做一次 3x3 膨胀以连接手绘线条中的细小断口。"""
+    dark = tile < threshold
+    dark &= _neighbor_count(dark) >= 2
+    return dark | (_neighbor_count(dark) > 0)
+
+
+def _tiles(height: int, tile_rows: int) -> Iterator[Tuple[int, int]]:
+    for top in range(0, height, tile_rows):
+        yield top, min(top + tile_rows, height)
+
+
+def find_runs(gray: np.ndarray, tile_rows: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按 `tile_rows` 行一块处理图像，返回前景游程 (行, 起点, 终点[不含])，按行、起点排序。
+
+    每块只在带 `_HALO` 行邻域的切片上分配临时数组，峰值内存与块大小成正比，与图像高度无关。
+    """
+    tile_rows = tile_rows or settings.sketch_tile_rows
+    height, width = gray.shape
+    histogram = np.zeros(256, dtype=np.int64)
+    for top, bottom in _tiles(height, tile_rows):
+        histogram += np.bincount(gray[top:bottom].ravel(), minlength=256)
+    threshold = otsu_threshold(histogram)
+
+    rows, starts, ends = [], [], []
+    for top, bottom in _tiles(height, tile_rows):
+        lo, hi = max(top - _HALO, 0), min(bottom + _HALO, height)
+        mask = _clean_tile(gray[lo:hi], threshold)[top - lo : top - lo + bottom - top]
+        edges = np.diff(mask.astype(np.int8), axis=1, prepend=0, append=0)
+        run_rows, run_starts = np.nonzero(edges == 1)
+        _, run_ends = np.nonzero(edges == -1)
+        rows.append(run_rows + top)
+        starts.append(run_starts)
+        ends.append(run_ends)
+    return (
+        np.concatenate(rows).astype(np.int64),
+        np.concatenate(starts).astype(np.int64),
+        np.concatenate(ends).astype(np.int64),
+    )
+
+
+def label_runs(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int) -> np.ndarray:
+    """8 连通意义下合并相邻行中重叠的游程，返回每个游程的连通域标签（该连通域最小游程下标）。"""
+    count = rows.size
+    labels = np.arange(count, dtype=np.int64)
+    if count == 0:
+        return labels
+    stride = width + 2
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    # 上一行中与当前游程 8 连通的游程：end >= start 且 start <= end（终点不含，斜向相邻也算）。
+    previous = (rows - 1) * stride
+    first = np.searchsorted(end_keys, previous + starts, side="left")
+    last = np.searchsorted(start_keys, previous + ends, side="right")
+    counts = np.clip(last - first, 0, None)
+    if counts.sum() == 0:
+        return labels
+    current = np.repeat(np.arange(count), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    above = np.repeat(first, counts) + offsets
+
+    while True:
+        merged = np.minimum(labels[current], labels[above])
+        updated = labels.copy()
+        np.minimum.at(updated, current, merged)
+        np.minimum.at(updated, above, merged)
+        # 指针跳跃：把标签压缩到根，迭代次数随连通域直径对数增长。
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_regions(gray: np.ndarray, tile_rows: Optional[int] = None) -> Tuple[List[Region], np.ndarray]:
+    """返回 (候选框, 小连通域外接框)：足够大且呈框线状的连通域作为候选框，其余视为文字或噪点笔画。"""
+    height, width = gray.shape
+    rows, starts, ends = find_runs(gray, tile_rows)
+    if rows.size == 0:
+        return [], np.empty((0, 4), dtype=np.int64)
+    labels = label_runs(rows, starts, ends, width)
+    _, component = np.unique(labels, return_inverse=True)
+    size = int(component.max()) + 1
+    x0 = np.full(size, width, dtype=np.int64)
+    y0 = np.full(size, height, dtype=np.int64)
+    x1 = np.zeros(size, dtype=np.int64)
+    y1 = np.zeros(size, dtype=np.int64)
+    np.minimum.at(x0, component, starts)
+    np.minimum.at(y0, component, rows)
+    np.maximum.at(x1, component, ends)
+    np.maximum.at(y1, component, rows + 1)
+    pixels = np.bincount(component, weights=ends - starts, minlength=size).astype(np.int64)
+
+    min_width = max(int(width * settings.sketch_min_box_ratio), 4)
+    min_height = max(int(height * settings.sketch_min_box_ratio), 4)
+    box_width, box_height = x1 - x0, y1 - y0
+    frame = (box_width >= 0.97 * width) & (box_height >= 0.97 * height)  # 纸张边框或扫描阴影
+    # 框线只占外接框的一小部分，实心色块或文字团的填充率则明显更高。
+    outline = pixels <= 0.5 * box_width * box_height
+    is_box = (box_width >= min_width) & (box_height >= min_height) & outline & ~frame
+    boxes = [
+        Region(int(x0[index]), int(y0[index]), int(x1[index]), int(y1[index]), int(pixels[index]))
+        for index in np.flatnonzero(is_box)
+    ]
+    boxes.sort(key=lambda region: region.area, reverse=True)
+    marks = np.stack([x0, y0, x1, y1], axis=1)[~is_box & ~frame]
+    return boxes[: settings.sketch_max_regions], marks
+
+
+def nest_regions(boxes: List[Region], marks: Optional[np.ndarray] = None) -> List[Region]:
+    """按包含关系组织候选框，返回顶层框；小连通域 `marks`（N×4 的 x0, y0, x1, y1）计入包含它的最内层框。"""
+    roots: List[Region] = []
+    ordered = sorted(boxes, key=lambda region: region.area, reverse=True)
+    for index, region in enumerate(ordered):
+        parent = next((other for other in reversed(ordered[:index]) if other.contains(region)), None)
+        (parent.children if parent else roots).append(region)
+    if marks is not None and len(marks) and ordered:
+        innermost = ordered[::-1]
+        frames = np.array([[region.x0, region.y0, region.x1, region.y1] for region in innermost])
+        inside = (
+            (marks[:, None, 0] >= frames[None, :, 0])
+            & (marks[:, None, 1] >= frames[None, :, 1])
+            & (marks[:, None, 2] <= frames[None, :, 2])
+            & (marks[:, None, 3] <= frames[None, :, 3])
+        )
+        owners = inside.argmax(axis=1)[inside.any(axis=1)]
+        for owner, count in zip(*np.unique(owners, return_counts=True)):
+            innermost[owner].marks += int(count)
+    return roots
+
+
+def group_rows(regions: List[Region]) -> List[List[Region]]:
+    """按垂直方向的重叠把同级框分成行，行内按 x 排序。"""
+    rows: List[Tuple[int, int, List[Region]]] = []
+    for region in sorted(regions, key=lambda item: (item.y0, item.x0)):
+        for position, (top, bottom, members) in enumerate(rows):
+            overlap = min(bottom, region.y1) - max(top, region.y0)
+            if overlap >= 0.5 * min(region.height, bottom - top):
+                members.append(region)
+                rows[position] = (min(top, region.y0), max(bottom, region.y1), members)
+                break
+        else:
+            rows.append((region.y0, region.y1, [region]))
+    rows.sort(key=lambda row: row[0])
+    return [sorted(members, key=lambda item: item.x0) for _, _, members in rows]
+
+
+class _LayoutBuilder:
+    def __init__(self, width: int, height: int, scale: float) -> None:
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.counters: Dict[str, int] = {}
+
+    def _id(self, node_type: str) -> str:
+        if node_type == "hero" and "hero" not in self.counters:
+            self.counters["hero"] = 1
+            return "hero"  # 新增按钮默认插入 id 为 hero 的节点，见 intents._container
+        self.counters[node_type] = self.counters.get(node_type, 0) + 1
+        return f"{node_type}-{self.counters[node_type]}"
+
+    def _bounds(self, x0: float, y0: float, x1: float, y1: float) -> Bounds:
+        scale = self.scale
+        return Bounds(
+            x=round(x0 * scale, 1),
+            y=round(y0 * scale, 1),
+            width=round((x1 - x0) * scale, 1),
+            height=round((y1 - y0) * scale, 1),
+        )
+
+    def _classify(self, region: Region, top_level: bool, first_row: bool) -> str:
+        width, height = region.width / self.width, region.height / self.height
+        if top_level and first_row and width >= 0.7 and region.y0 <= 0.4 * self.height:
+            return "hero"
+        if region.children:
+            return "section"
+        if width <= 0.4 and height <= 0.12 and region.width >= 1.8 * region.height:
+            # 线框图惯例：写了字的小横框是按钮，空白的是输入框。
+            return "button" if region.marks else "input"
+        if height <= 0.08 and width >= 0.3:
+            return "input"
+        return "card"
+
+    def _gap(self, row: List[Region]) -> int:
+        gaps = [right.x0 - left.x1 for left, right in zip(row, row[1:]) if right.x0 > left.x1]
+        return int(round(float(np.median(gaps)) * self.scale)) if gaps else 16
+
+    def children(self, regions: List[Region], top_level: bool = False) -> Tuple[List[LayoutNode], str]:
+        """构建子节点列表，返回 (节点, 父节点方向)；多行且行内多于一个框时用 `row` 节点包裹。"""
+        rows = group_rows(regions)
+        nodes: List[LayoutNode] = []
+        for row_index, row in enumerate(rows):
+            row_nodes = [self.node(region, top_level, row_index == 0) for region in row]
+            if len(row) > 1 and len(rows) > 1:
+                nodes.append(
+                    LayoutNode(
+                        id=self._id("row"),
+                        type="row",
+                        layout={"direction": "row", "gap": self._gap(row)},
+                        bounds=self._bounds(
+                            min(item.x0 for item in row),
+                            min(item.y0 for item in row),
+                            max(item.x1 for item in row),
+                            max(item.y1 for item in row),
+                        ),
+                        children=row_nodes,
+                    )
+                )
+            else:
+                nodes.extend(row_nodes)
+        direction = "row" if len(rows) == 1 and len(rows[0]) > 1 else "column"
+        return nodes, direction
+
+    def node(self, region: Region, top_level: bool, first_row: bool) -> LayoutNode:
+        node_type = self._classify(region, top_level, first_row)
+        children, direction = self.children(region.children)
+        layout = {"direction": direction}
+        if direction == "row" and len(children) > 1:
+            layout["gap"] = self._gap(sorted(region.children, key=lambda item: item.x0))
+        return LayoutNode(
+            id=self._id(node_type),
+            type=node_type,
+            layout=layout if children else {},
+            bounds=self._bounds(region.x0, region.y0, region.x1, region.y1),
+            children=children,
+        )
+
+
+def detect_layout(source: UploadSource) -> Optional[LayoutNode]:
+    """从草图检测布局树；无法解码或没有找到候选框时返回 None。
+
+    流程：解码缩放 → 分块二值化去噪 → 游程连通域 → 候选框嵌套 → 按行/列分组。
+    `Bounds` 使用原图像素坐标。
+    """
+    try:
+        gray, scale = load_grayscale(source)
+    except SketchDecodeError:
+        return None
+    height, width = gray.shape
+    boxes, marks = find_regions(gray)
+    if not boxes:
+        return None
+    builder = _LayoutBuilder(width, height, scale)
+    children, _ = builder.children(nest_regions(boxes, marks), top_level=True)
+    return LayoutNode(
+        id="root",
+        type="page",
+        name="GeneratedPage",
+        layout={"direction": "column", "gap": 24, "padding": [40, 40, 40, 40]},
+        bounds=Bounds(x=0, y=0, width=round(width * scale, 1), height=round(height * scale, 1)),
+        children=children,
+    )
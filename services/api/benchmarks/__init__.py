@@ -0,0 +1 @@
+"""ProtoWeaver API 的基准测试与压测工具，结果以 JSON 输出，便于在版本之间比较。"""
@@ -0,0 +1,111 @@
+"""流水线热点函数的微基准。
+
+    python -m benchmarks.bench_pipeline --depth 4 --fanout 4 --repeat 50 --output .bench/pipeline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.schemas.project import UIIRPatch, UIIRPayload
+from app.services.codegen import _render_next_page, fragment_cache, generate_code
+from app.services.intents import IntentEngine
+from app.services.layout_index import LayoutIndex
+from app.services.layout_solver import relayout, solve_layout
+from app.services.pipeline import apply_iteration
+from app.services.store import ProjectState, store
+from app.services.vision import detect_layout
+
+from .report import build_report, summarize, write_report
+from .synthetic import build_sketch, build_ui_ir, count_nodes
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 3) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples
+
+
+def _cases(ui_ir: UIIRPayload) -> Dict[str, Callable[[], object]]:
+    raw = ui_ir.dict()
+    encoded = ui_ir.json()
+    bundle = generate_code(ui_ir)
+    project = store.save(ProjectState(project_id=ui_ir.id, ui_ir=ui_ir, code_bundle=bundle))
+    sketch = build_sketch()
+    scan = build_sketch(6000, 4500, columns=4, rows=4)
+    uncached = IntentEngine(cache_size=0)
+    frame = solve_layout(ui_ir.layout_tree)
+    edited = LayoutIndex.build(ui_ir.layout_tree)
+    leaf = max(edited, key=edited.depth)
+    edited.apply(UIIRPatch(target_id=leaf, op="update", payload={"text": "一段更长的新文案"}))
+    command = "在 Hero 区域显示标题 ProtoWeaver，加一个立即体验按钮，下方放三个特性卡片，然后把所有按钮改成红色"
+    return {
+        "generate_code": lambda: generate_code(ui_ir),
+        "generate_code_incremental": lambda: generate_code(ui_ir, previous=bundle, changed={"metadata.tone"}),
+        "render_next_page": lambda: _render_next_page(ui_ir),
+        # 清空片段缓存，测量整棵树都需要渲染时的开销。
+        "render_next_page_cold": lambda: (fragment_cache.clear(), _render_next_page(ui_ir)),
+        "detect_layout": lambda: detect_layout(sketch),
+        "detect_layout_large_scan": lambda: detect_layout(scan),
+        "pydantic_parse": lambda: UIIRPayload.parse_obj(raw),
+        "pydantic_parse_json": lambda: UIIRPayload.parse_raw(encoded),
+        "pydantic_dict": ui_ir.dict,
+        "pydantic_json": ui_ir.json,
+        # 每次迭代都会往 hero 插入一个按钮，树会随重复次数缓慢增长。
+        "apply_iteration": lambda: apply_iteration(project.project_id, "添加一个按钮"),
+        "parse_intent_uncached": lambda: uncached.parse(command),
+        "solve_layout": lambda: solve_layout(ui_ir.layout_tree),
+        # 修改最深处一个叶子节点的文本后只重排受影响的子树。
+        "relayout_leaf": lambda: relayout(frame, edited, [leaf]),
+    }
+
+
+def run(depth: int, fanout: int, repeat: int, warmup: int, only: Optional[Sequence[str]] = None) -> Dict:
+    ui_ir = build_ui_ir(depth, fanout)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in _cases(ui_ir).items():
+        if only and name not in only:
+            continue
+        samples = measure(fn, repeat, warmup)
+        summary = summarize(samples)
+        summary["ops_per_sec"] = len(samples) / sum(samples) if sum(samples) else 0.0
+        results[name] = summary
+    params = {
+        "depth": depth,
+        "fanout": fanout,
+        "nodes": count_nodes(ui_ir.layout_tree),
+        "payload_bytes": len(ui_ir.json().encode("utf-8")),
+        "repeat": repeat,
+        "warmup": warmup,
+    }
+    return build_report("pipeline", params, results)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=4, help="布局树深度")
+    parser.add_argument("--fanout", type=int, default=4, help="每个容器节点的子节点数")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="只运行指定的用例")
+    parser.add_argument("--output", help="JSON 结果路径，缺省输出到 stdout")
+    args = parser.parse_args(argv)
+    write_report(run(args.depth, args.fanout, args.repeat, args.warmup, args.only), args.output)
+
+
+if __name__ == "__main__":
+    main()
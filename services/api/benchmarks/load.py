@@ -0,0 +1,153 @@
+"""本地压测：并发调用 `POST /v1/projects` 与 `POST /v1/projects/{id}/iterate`，统计 p50/p95/p99。
+
+    # 对运行中的服务压测
+    python -m benchmarks.load --base-url http://localhost:8000 --concurrency 16 --projects 200
+    # 不启动服务，直接在进程内驱动 ASGI 应用
+    python -m benchmarks.load --in-process --projects 50 --output .bench/load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from .report import build_report, summarize, write_report
+
+
+class LoadRecorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, elapsed: float, status: int) -> None:
+        self.statuses[endpoint][str(status)] += 1
+        if 200 <= status < 300:
+            self.latencies[endpoint].append(elapsed)
+
+    def results(self, wall_time: float) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        for endpoint, statuses in self.statuses.items():
+            summary = summarize(self.latencies[endpoint])
+            summary["statuses"] = dict(statuses)
+            summary["throughput_rps"] = sum(statuses.values()) / wall_time if wall_time else 0.0
+            results[endpoint] = summary
+        return results
+
+
+async def _timed(client: httpx.AsyncClient, recorder: LoadRecorder, endpoint: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.record(endpoint, time.perf_counter() - start, 0)
+        return None
+    recorder.record(endpoint, time.perf_counter() - start, response.status_code)
+    return response
+
+
+async def _session(
+    client: httpx.AsyncClient,
+    recorder: LoadRecorder,
+    sketches: Sequence[bytes],
+    iterations: int,
+    rng: random.Random,
+) -> None:
+    sketch = rng.choice(sketches)
+    response = await _timed(
+        client,
+        recorder,
+        "create_project",
+        "POST",
+        "/v1/projects",
+        files={"sketch": ("sketch.png", sketch, "image/png")},
+        data={"transcript": "创建一个带按钮的落地页"},
+    )
+    if response is None or response.status_code != 200:
+        return
+    project_id = response.json()["project_id"]
+    for _ in range(iterations):
+        await _timed(
+            client, recorder, "iterate", "POST", f"/v1/projects/{project_id}/iterate", json={"message": "添加一个按钮"}
+        )
+
+
+async def run(
+    base_url: str,
+    projects: int,
+    concurrency: int,
+    iterations: int,
+    distinct_sketches: int,
+    sketch_bytes: int,
+    in_process: bool = False,
+    seed: int = 0,
+) -> Dict:
+    rng = random.Random(seed)
+    # distinct_sketches 控制内容重复度，从而控制阶段缓存的命中率。
+    sketches = [os.urandom(sketch_bytes) for _ in range(distinct_sketches)]
+    recorder = LoadRecorder()
+    if in_process:
+        from app.main import app
+
+        transport: Optional[httpx.AsyncBaseTransport] = httpx.ASGITransport(app=app)
+    else:
+        transport = None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(client: httpx.AsyncClient) -> None:
+        async with semaphore:
+            await _session(client, recorder, sketches, iterations, rng)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(bounded(client) for _ in range(projects)))
+    wall_time = time.perf_counter() - start
+
+    params = {
+        "base_url": "in-process" if in_process else base_url,
+        "projects": projects,
+        "concurrency": concurrency,
+        "iterations_per_project": iterations,
+        "distinct_sketches": distinct_sketches,
+        "sketch_bytes": sketch_bytes,
+        "wall_time_s": wall_time,
+    }
+    return build_report("load", params, recorder.results(wall_time))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="在进程内通过 ASGI 调用应用，无需启动服务")
+    parser.add_argument("--projects", type=int, default=100, help="创建的项目总数")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=3, help="每个项目的迭代次数")
+    parser.add_argument("--distinct-sketches", type=int, default=10)
+    parser.add_argument("--sketch-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON 结果路径，缺省输出到 stdout")
+    args = parser.parse_args(argv)
+    report = asyncio.run(
+        run(
+            base_url="http://protoweaver.local" if args.in_process else args.base_url,
+            projects=args.projects,
+            concurrency=args.concurrency,
+            iterations=args.iterations,
+            distinct_sketches=args.distinct_sketches,
+            sketch_bytes=args.sketch_bytes,
+            in_process=args.in_process,
+            seed=args.seed,
+        )
+    )
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import random
+import uuid
+from typing import Dict, List, Optional
+
+from app.schemas.project import LayoutNode, UIIRPayload
+
+LEAF_TYPES = ("button", "text", "input", "image", "link")
+CONTAINER_TYPES = ("section", "card", "stack", "grid")
+
+
+def build_tree(depth: int, fanout: int, seed: int = 0) -> LayoutNode:
+    """生成深度为 `depth`、每个容器有 `fanout` 个子节点的布局树。
+
+    根节点下固定包含 id 为 `hero` 的节点，使迭代基准可以沿用默认的插入逻辑。
+    """
+    rng = random.Random(seed)
+    counter = iter(range(1 << 62))
+
+    def node(level: int) -> LayoutNode:
+        index = next(counter)
+        if level >= depth:
+            kind = rng.choice(LEAF_TYPES)
+            return LayoutNode(
+                id=f"{kind}-{index}",
+                type=kind,
+                text=f"{kind} {index}",
+                style={"padding": rng.choice([4, 8, 12, 16])},
+                events=[{"id": f"evt-{index}", "trigger": "onClick"}] if kind == "button" else [],
+            )
+        kind = rng.choice(CONTAINER_TYPES)
+        return LayoutNode(
+            id=f"{kind}-{index}",
+            type=kind,
+            layout={"direction": rng.choice(["row", "column"]), "gap": rng.choice([8, 16, 24])},
+            children=[node(level + 1) for _ in range(fanout)],
+        )
+
+    children: List[LayoutNode] = [LayoutNode(id="hero", type="hero", text="Benchmark")]
+    children.extend(node(2) for _ in range(fanout))
+    return LayoutNode(id="root", type="page", layout={"direction": "column"}, children=children)
+
+
+def count_nodes(node: LayoutNode) -> int:
+    return 1 + sum(count_nodes(child) for child in node.children)
+
+
+def build_ui_ir(depth: int, fanout: int, seed: int = 0, metadata: Optional[Dict[str, object]] = None) -> UIIRPayload:
+    return UIIRPayload(
+        id=str(uuid.uuid4()),
+        title="Synthetic Prototype",
+        metadata=metadata or {"source": "synthetic", "accent": "#2563eb", "revision": 1},
+        layout_tree=build_tree(depth, fanout, seed),
+    )
+
+
+def build_sketch(width: int = 1600, height: int = 1200, columns: int = 3, rows: int = 3, seed: int = 0) -> bytes:
+    """生成手绘风格的线框草图 PNG：顶部一个 hero 框，下方 `rows` × `columns` 个卡片框，带文字笔画与噪点。"""
+    import io
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(image)
+    stroke = max(width // 400, 2)
+    margin = width // 20
+    hero_bottom = height // 4
+    draw.rectangle([margin, margin, width - margin, hero_bottom], outline=30, width=stroke)
+    cell_width = (width - 2 * margin) / columns
+    cell_height = (height - hero_bottom - 2 * margin) / rows
+    for row in range(rows):
+        for column in range(columns):
+            x0 = margin + column * cell_width + margin / 2
+            y0 = hero_bottom + margin + row * cell_height + margin / 2
+            x1, y1 = x0 + cell_width - margin, y0 + cell_height - margin
+            draw.rectangle([x0, y0, x1, y1], outline=30, width=stroke)
+            draw.line([x0 + margin / 2, y0 + margin, x0 + (x1 - x0) / 2, y0 + margin], fill=40, width=stroke)
+    for _ in range(width * height // 5000):
+        draw.point((rng.randrange(width), rng.randrange(height)), fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
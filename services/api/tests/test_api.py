@@ -20,7 +20,46 @@ def test_create_project_and_iterate():
     data = response.json()
     project_id = data['project_id']
 
-    iterate = client.post(f'/v1/projects/{project_id}/iterate', json={'message': '新增一个按钮'})
+    iterate = client.post(f'/v1/projects/{project_id}/iterate?full=true', json={'message': '新增一个按钮'})
     assert iterate.status_code == 200
     body = iterate.json()
     assert body['ui_ir']['metadata']['revision'] >= 1
+
+
+def test_iterate_returns_only_patches_by_default():
+    sketch = io.BytesIO(b'fake-image-bytes')
+    project_id = client.post('/v1/projects', files={'sketch': ('sketch.png', sketch, 'image/png')}).json()['project_id']
+
+    body = client.post(f'/v1/projects/{project_id}/iterate', json={'message': 'add button'}).json()
+    assert body['ui_ir'] is None
+    assert body['code_bundle'] is None
+    assert body['revision'] == 2
+    assert [patch['op'] for patch in body['patches']] == ['insert']
+    assert body['patches'][0]['targetId'] == 'hero'
+    assert list(body['changed_files']) == ['app/page.tsx']
+
+
+def test_saturated_executor_maps_to_503_without_failing_committed_iterations(monkeypatch):
+    from app.services.executor import ExecutorSaturatedError, stage_executor
+    from app.services.store import store
+
+    sketch = io.BytesIO(b'fake-image-bytes')
+    project_id = client.post('/v1/projects', files={'sketch': ('sketch.png', sketch, 'image/png')}).json()['project_id']
+    run = stage_executor.run
+
+    async def reject_serialize(stage, fn, *args, **kwargs):
+        if stage == 'serialize':
+            raise ExecutorSaturatedError('Too many pending pipeline tasks (64)')
+        return await run(stage, fn, *args, **kwargs)
+
+    monkeypatch.setattr(stage_executor, 'run', reject_serialize)
+    rejected = client.get(f'/v1/projects/{project_id}')
+    assert rejected.status_code == 503
+    assert rejected.headers['retry-after'] == '1'
+
+    # 迭代提交后不再单独申请序列化名额，响应与已提交的版本一致。
+    iterate = client.post(f'/v1/projects/{project_id}/iterate', json={'message': 'add button'})
+    assert iterate.status_code == 200
+    assert iterate.json()['revision'] == store.get(project_id).ui_ir.metadata['revision'] == 2
+    revert = client.post(f'/v1/projects/{project_id}/revisions/1/revert')
+    assert revert.status_code == 200 and revert.json()['revision'] == 3
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import archives, codegen, pipeline
+
+client = TestClient(app)
+
+
+def _bundle():
+    layout = pipeline.parse_sketch(b"fake")
+    return codegen.generate_code(pipeline.fuse_modalities(layout, {"summary": "test"}, []))
+
+
+def test_archives_are_chunked_and_reproducible():
+    bundle = _bundle()
+    chunks = list(archives.iter_archive(bundle, "zip", chunk_size=256))
+    assert len(chunks) > 1
+    data = b"".join(chunks)
+    assert data == b"".join(archives.iter_archive(bundle, "zip"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read("app/page.tsx").decode("utf-8") == bundle.files["app/page.tsx"]
+
+    data = b"".join(archives.iter_archive(bundle, "tar.gz"))
+    assert data == b"".join(archives.iter_archive(bundle, "tar.gz", chunk_size=128))
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        assert sorted(archive.getnames()) == sorted(bundle.files)
+
+
+def test_bundle_and_file_endpoints_support_etags():
+    sketch = io.BytesIO(b"archive-sketch")
+    project_id = client.post("/v1/projects", files={"sketch": ("sketch.png", sketch, "image/png")}).json()["project_id"]
+
+    response = client.get(f"/v1/projects/{project_id}/bundle?format=tar.gz")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        assert "app/page.tsx" in archive.getnames()
+    etag = response.headers["etag"]
+    assert client.get(f"/v1/projects/{project_id}/bundle?format=tar.gz", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/v1/projects/{project_id}/bundle?format=rar").status_code == 422
+
+    page = client.get(f"/v1/projects/{project_id}/files/app/page.tsx")
+    assert page.status_code == 200
+    assert "data-node-id" in page.text
+    cached = client.get(f"/v1/projects/{project_id}/files/app/page.tsx", headers={"If-None-Match": page.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get(f"/v1/projects/{project_id}/files/missing.ts").status_code == 404
+
+    client.post(f"/v1/projects/{project_id}/iterate", json={"message": "add button"})
+    changed = client.get(f"/v1/projects/{project_id}/files/app/page.tsx", headers={"If-None-Match": page.headers["etag"]})
+    assert changed.status_code == 200
+    css = client.get(f"/v1/projects/{project_id}/files/globals.css")
+    assert css.headers["content-type"].startswith("text/css")
+
+
+def test_stream_archive_survives_saturation_and_closes_on_disconnect(monkeypatch):
+    from app.services.executor import ExecutorSaturatedError, stage_executor
+
+    bundle = _bundle()
+    run = stage_executor.run
+    calls = []
+
+    async def saturate_after_first(stage, fn, *args, **kwargs):
+        calls.append(stage)
+        if len(calls) > 1:
+            raise ExecutorSaturatedError("Too many pending pipeline tasks (64)")
+        return await run(stage, fn, *args, **kwargs)
+
+    async def collect():
+        return [chunk async for chunk in archives.stream_archive(bundle, "zip")]
+
+    monkeypatch.setattr(stage_executor, "run", saturate_after_first)
+    assert b"".join(asyncio.run(collect())) == b"".join(archives.iter_archive(bundle, "zip"))
+
+    closed = []
+
+    def tracked(*args):
+        try:
+            yield b"first"
+            yield b"second"
+        finally:
+            closed.append(True)
+
+    async def disconnect():
+        stream = archives.stream_archive(bundle, "zip")
+        assert await stream.__anext__() == b"first"
+        await stream.aclose()
+
+    monkeypatch.setattr(stage_executor, "run", run)
+    monkeypatch.setattr(archives, "iter_archive", tracked)
+    asyncio.run(disconnect())
+    assert closed == [True]
@@ -0,0 +1,128 @@
+import asyncio
+import io
+import json
+import struct
+import time
+import wave
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import audio, pipeline
+
+client = TestClient(app)
+
+
+def _speech_like(rate, pattern=(0.5, 0.8, 0.7, 0.6, 0.8, 0.5)):
+    """交替的静音（偶数位）与音调（奇数位），单位为秒。"""
+    pieces = []
+    rng = np.random.default_rng(0)
+    for index, seconds in enumerate(pattern):
+        count = int(seconds * rate)
+        if index % 2:
+            t = np.arange(count) / rate
+            pieces.append(0.4 * np.sin(2 * np.pi * 220 * t) * np.sin(np.pi * t / seconds))
+        else:
+            pieces.append(0.002 * rng.standard_normal(count))
+    return np.concatenate(pieces)
+
+
+def _wav(samples, rate=16000, channels=1, width=2):
+    data = np.repeat(samples[:, None], channels, axis=1)
+    if width == 1:
+        frames = (data * 127 + 128).astype(np.uint8).tobytes()
+    else:
+        frames = (data * 32767).astype("<i2").tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as handle:
+        handle.setnchannels(channels)
+        handle.setsampwidth(width)
+        handle.setframerate(rate)
+        handle.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _feed(frontend, data, chunk):
+    segments = []
+    for start in range(0, len(data), chunk):
+        segments.extend(frontend.feed(data[start : start + chunk]))
+    return segments + frontend.finish()
+
+
+def test_vad_splits_speech_and_drops_silence():
+    segments = _feed(audio.AudioFrontend(), _wav(_speech_like(16000)), 4096)
+    assert len(segments) == 3
+    for segment, expected in zip(segments, (0.5, 2.0, 3.3)):
+        assert abs(segment.start - expected) < 0.25
+        assert np.abs(segment.samples).max() <= 0.9 + 1e-6
+    assert sum(segment.duration for segment in segments) < 3.4
+
+
+def test_decoder_handles_tiny_chunks_formats_and_extra_chunks():
+    reference = [(s.start, s.end) for s in _feed(audio.AudioFrontend(), _wav(_speech_like(16000)), 1 << 20)]
+    stereo_44k = _wav(_speech_like(44100), rate=44100, channels=2)
+    for data, chunk in ((stereo_44k, 7), (_wav(_speech_like(8000), rate=8000, width=1), 333)):
+        spans = [(s.start, s.end) for s in _feed(audio.AudioFrontend(), data, chunk)]
+        assert len(spans) == len(reference)
+        assert all(abs(a - b) < 0.1 for span, ref in zip(spans, reference) for a, b in zip(span, ref))
+
+    # 在 fmt 与 data 之间插入奇数长度的 LIST 块，且 data 长度写为 0（流式录音）
+    raw = _wav(_speech_like(16000))
+    extra = b"LIST" + struct.pack("<I", 5) + b"abcde\x00"
+    patched = raw[:36] + extra + raw[36:40] + struct.pack("<I", 0) + raw[44:]
+    spans = [(s.start, s.end) for s in _feed(audio.AudioFrontend(), patched, 5)]
+    assert spans == reference
+
+
+def test_resampler_is_continuous_across_chunks():
+    signal = np.sin(np.linspace(0, 40 * np.pi, 44100)).astype(np.float32)
+    whole = audio.Resampler(44100, 16000).process(signal)
+    resampler = audio.Resampler(44100, 16000)
+    parts = np.concatenate([resampler.process(signal[i : i + 1001]) for i in range(0, signal.size, 1001)])
+    assert abs(parts.size - 16000) <= 1 and abs(whole.size - parts.size) <= 1
+    assert np.allclose(parts[: whole.size - 1], whole[: parts.size][: whole.size - 1], atol=1e-5)
+
+
+def test_rejects_non_wav_and_pipeline_falls_back():
+    try:
+        audio.AudioFrontend().feed(b"ID3\x04" + b"\x00" * 64)
+    except audio.AudioDecodeError:
+        pass
+    else:
+        raise AssertionError("expected AudioDecodeError")
+    assert pipeline.transcribe_audio(b"not a wav file") == audio.MOCK_TRANSCRIPT
+    assert pipeline.transcribe_audio(_wav(np.zeros(16000))) is None
+    assert pipeline.transcribe_audio(_wav(_speech_like(16000))) == "在 Hero 区域显示标题 ProtoWeaver，加一个立即体验按钮，下方放三个特性卡片"
+
+
+def test_stream_transcription_overlaps_and_keeps_order():
+    class SlowFirst(audio.ASRBackend):
+        def transcribe(self, segment):
+            if segment.index == 0:
+                time.sleep(0.05)
+            return f"seg{segment.index}"
+
+    data = _wav(_speech_like(16000))
+
+    async def chunks():
+        for start in range(0, len(data), 8192):
+            yield data[start : start + 8192]
+
+    async def collect():
+        return [part.text async for part in audio.stream_transcription(chunks(), SlowFirst())]
+
+    assert asyncio.run(collect()) == ["seg0", "seg1", "seg2"]
+
+
+def test_transcription_endpoint_streams_ndjson():
+    data = _wav(_speech_like(22050), rate=22050)
+    response = client.post("/v1/transcriptions", content=data, headers={"content-type": "audio/wav"})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines[:-1]] == [0, 1, 2]
+    assert lines[-1]["segments"] == 3
+    assert lines[-1]["text"].startswith("在 Hero 区域显示标题 ProtoWeaver")
+    assert lines[-1]["speech_seconds"] < lines[-1]["duration_seconds"]
+
+    assert client.post("/v1/transcriptions", content=b"\x00" * 64).status_code == 415
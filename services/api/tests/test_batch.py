@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+import tarfile
+
+from fastapi.testclient import TestClient
+
+from app import cli
+from app.main import app
+from app.services import batch
+
+client = TestClient(app)
+
+
+def _corpus(root, count=3):
+    for index in range(count):
+        (root / f"sketch-{index}.png").write_bytes(f"sketch-{index}".encode())
+    (root / "nested").mkdir()
+    (root / "nested" / "extra.jpg").write_bytes(b"nested")
+    (root / "nested" / "extra.txt").write_text("创建一个带按钮的落地页\n", encoding="utf-8")
+    (root / "notes.md").write_text("ignored", encoding="utf-8")
+    return root
+
+
+def test_discover_directory_and_manifest(tmp_path):
+    items = batch.discover(_corpus(tmp_path))
+    assert [item.key for item in items] == ["nested/extra.jpg", "sketch-0.png", "sketch-1.png", "sketch-2.png"]
+    assert items[0].transcript == "创建一个带按钮的落地页"
+    assert items[1].transcript is None
+
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        json.dumps({"sketch": "sketch-0.png", "transcript": "hi", "key": "first"}) + "\n\n"
+        + json.dumps({"sketch": "sketch-1.png"}) + "\n",
+        encoding="utf-8",
+    )
+    items = batch.discover(manifest)
+    assert [(item.key, item.transcript) for item in items] == [("first", "hi"), ("sketch-1.png", None)]
+    assert items[0].sketch == tmp_path / "sketch-0.png"
+
+
+def test_run_batch_writes_jsonl_and_resumes_from_checkpoint(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    items = batch.discover(_corpus(corpus))
+    missing = batch.BatchItem(key="missing.png", sketch=tmp_path / "missing.png")
+    output = tmp_path / "out" / "results.jsonl"
+
+    progress = asyncio.run(batch.run_batch([*items, missing], output, concurrency=2))
+    assert (progress.succeeded, progress.failed, progress.skipped) == (4, 1, 0)
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert {record["key"] for record in records} == {item.key for item in items} | {"missing.png"}
+    succeeded = [record for record in records if record["status"] == "succeeded"]
+    assert all("app/page.tsx" in record["code_bundle"]["files"] for record in succeeded)
+
+    seen = []
+    progress = asyncio.run(
+        batch.run_batch([*items, missing], output, concurrency=2, resume=True, on_progress=seen.append)
+    )
+    assert (progress.succeeded, progress.failed, progress.skipped) == (0, 1, 4)
+    assert len(seen) == 1 and seen[0].completed == 5
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 6
+
+
+def test_cli_batch_writes_tar_bundle(tmp_path, capsys):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _corpus(corpus, count=1)
+    output = tmp_path / "bundle.tar"
+
+    assert cli.main(["batch", str(corpus), "--output", str(output), "--concurrency", "2"]) == 0
+    with tarfile.open(output) as archive:
+        names = archive.getnames()
+    assert "sketch-0/ui-ir.json" in names
+    assert "nested/extra/app/page.tsx" in names
+    assert "2/2 done" in capsys.readouterr().err
+
+
+def test_batch_endpoint_streams_ndjson():
+    files = [
+        ("sketches", ("a.png", io.BytesIO(b"batch-a"), "image/png")),
+        ("sketches", ("b.png", io.BytesIO(b"batch-b"), "image/png")),
+    ]
+    response = client.post("/v1/projects/batch?full=false", files=files, data={"transcripts": ["落地页"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(record["key"] for record in records) == ["a.png", "b.png"]
+    assert all(record["status"] == "succeeded" and "ui_ir" not in record for record in records)
+    assert client.get(f"/v1/projects/{records[0]['project_id']}").status_code == 200
+
+
+def test_batch_endpoint_encodes_inline_when_serialize_is_saturated(monkeypatch):
+    from app.services.executor import ExecutorSaturatedError, stage_executor
+
+    run = stage_executor.run
+
+    async def reject_serialize(stage, fn, *args, **kwargs):
+        if stage == "serialize":
+            raise ExecutorSaturatedError("Too many pending pipeline tasks (64)")
+        return await run(stage, fn, *args, **kwargs)
+
+    monkeypatch.setattr(stage_executor, "run", reject_serialize)
+    files = [("sketches", ("a.png", io.BytesIO(b"batch-saturated"), "image/png"))]
+    response = client.post("/v1/projects/batch", files=files)
+    assert response.status_code == 200
+    (record,) = [json.loads(line) for line in response.text.splitlines()]
+    assert record["status"] == "succeeded" and record["ui_ir"]["layout_tree"]["id"] == "root"
@@ -0,0 +1,25 @@
+from benchmarks.bench_pipeline import run
+from benchmarks.report import percentile, summarize
+from benchmarks.synthetic import build_tree, count_nodes
+
+
+def test_percentile_interpolates():
+    samples = [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert percentile(samples, 50) == 0.3
+    assert abs(percentile(samples, 95) - 0.48) < 1e-9
+    assert summarize([])['count'] == 0
+
+
+def test_synthetic_tree_has_requested_shape():
+    tree = build_tree(depth=3, fanout=2, seed=1)
+    assert tree.children[0].id == 'hero'
+    assert count_nodes(tree) == 2 + 2 + 4
+    assert build_tree(depth=3, fanout=2, seed=1) == tree
+
+
+def test_pipeline_benchmark_reports_every_case():
+    report = run(depth=2, fanout=2, repeat=2, warmup=0)
+    assert report['benchmark'] == 'pipeline'
+    assert report['params']['nodes'] == 4
+    assert {'generate_code', 'render_next_page', 'pydantic_parse', 'apply_iteration'} <= set(report['results'])
+    assert report['results']['generate_code']['count'] == 2
@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+from app.services import pipeline
+from app.services.cache import (
+    DiskCacheBackend,
+    MemoryCacheBackend,
+    StageCache,
+    content_hash,
+    generation_cache,
+)
+
+
+def test_content_hash_is_stable_and_separates_parts():
+    assert content_hash(b"ab", b"c") == content_hash(b"ab", b"c")
+    assert content_hash(b"ab", b"c") != content_hash(b"a", b"bc")
+    assert content_hash("文本") == content_hash("文本".encode("utf-8"))
+
+
+def test_memory_backend_evicts_lru_and_expires():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+
+    expiring = MemoryCacheBackend(ttl_seconds=0.01)
+    expiring.set("a", 1)
+    time.sleep(0.02)
+    assert expiring.get("a", "missing") == "missing"
+
+
+def test_disk_backend_round_trip_and_eviction(tmp_path):
+    backend = DiskCacheBackend(tmp_path, max_entries=2)
+    backend.set("sketch-aa", {"value": 1})
+    backend.set("sketch-bb", {"value": 2})
+    backend.set("sketch-cc", {"value": 3})
+    assert len(backend) == 2
+    assert backend.get("sketch-cc") == {"value": 3}
+    assert DiskCacheBackend(tmp_path).get("sketch-cc") == {"value": 3}
+
+
+def test_stage_cache_counts_hits_and_returns_copies():
+    cache = StageCache(MemoryCacheBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"items": []}
+
+    first = cache.get_or_compute("intent", "k", compute)
+    first["items"].append("mutated")
+    second = cache.get_or_compute("intent", "k", compute)
+    assert second == {"items": []}
+    assert len(calls) == 1
+    assert cache.stats["intent"].hits == 1
+    assert cache.stats["intent"].misses == 1
+
+
+def test_repeated_upload_hits_generation_cache():
+    generation_cache.clear()
+    pipeline.create_project(b"same-sketch", None, "同样的描述")
+    pipeline.create_project(b"same-sketch", None, "同样的描述")
+    for stage in ("sketch", "intent", "codegen"):
+        assert generation_cache.stats[stage].hits == 1
+
+
+def test_disk_backend_ttl_counts_from_set_and_eviction_is_batched(tmp_path):
+    backend = DiskCacheBackend(tmp_path, max_entries=10, ttl_seconds=60)
+    backend.set("sketch-aa", "fresh")
+    path = backend._path("sketch-aa")
+    written = time.time() - 50
+    os.utime(path, (written, written))
+    assert backend.get("sketch-aa") == "fresh"
+    # 读取只刷新 atime，有效期仍从写入时算起。
+    assert path.stat().st_mtime == pytest.approx(written)
+    os.utime(path, (time.time(), time.time() - 61))
+    assert backend.get("sketch-aa", "expired") == "expired"
+
+    for number in range(10):
+        backend.set(f"sketch-{number:02d}", number)
+        stamp = 1_000_000 + number
+        os.utime(backend._path(f"sketch-{number:02d}"), (stamp, time.time()))
+    backend.get("sketch-00")
+    backend.set("sketch-new", "new")
+    # 超出上限时一次淘汰到 90%，最近读过的条目保留。
+    assert len(backend) == 9
+    assert backend.get("sketch-00") == 0 and backend.get("sketch-01") is None and backend.get("sketch-new") == "new"
+
+
+def test_disk_backend_tolerates_concurrent_removal(tmp_path, monkeypatch):
+    backend = DiskCacheBackend(tmp_path)
+    backend.set("sketch-aa", "value")
+    real_utime = os.utime
+
+    def vanished(path, *args, **kwargs):
+        os.unlink(path)
+        return real_utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "utime", vanished)
+    assert backend.get("sketch-aa") == "value"
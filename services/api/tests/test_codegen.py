@@ -0,0 +1,89 @@
+from app.services import codegen, pipeline
+from app.services.templates import Template
+
+
+def _ui_ir():
+    layout = pipeline.parse_sketch(b"fake")
+    return pipeline.fuse_modalities(layout, {"summary": "test"}, [])
+
+
+def test_generate_code_records_file_hashes():
+    bundle = codegen.generate_code(_ui_ir())
+    assert set(bundle.hashes) == set(bundle.files)
+    assert bundle.hashes["globals.css"] == codegen.file_hash(bundle.files["globals.css"])
+
+
+def test_incremental_generation_only_rerenders_dirty_files(monkeypatch):
+    ui_ir = _ui_ir()
+    previous = codegen.generate_code(ui_ir)
+    ui_ir.metadata["accent"] = "#ff0000"
+
+    rendered = []
+    original = codegen.RENDERERS
+    monkeypatch.setattr(
+        codegen,
+        "RENDERERS",
+        tuple(
+            codegen.FileRenderer(r.path, lambda ir, r=r: rendered.append(r.path) or r.render(ir), r.depends_on)
+            for r in original
+        ),
+    )
+    bundle = codegen.generate_code(ui_ir, previous=previous, changed={"metadata.accent"})
+
+    assert rendered == ["globals.css"]
+    assert "#ff0000" in bundle.files["globals.css"]
+    assert codegen.changed_files(previous, bundle) == ["globals.css"]
+
+
+def test_apply_iteration_keeps_static_files_unchanged():
+    project = pipeline.create_project(b"sketch", None, "Hero section")
+    before = project.code_bundle.hashes.copy()
+    updated = pipeline.apply_iteration(project.project_id, "add button")
+    assert updated.code_bundle.hashes["app/page.tsx"] != before["app/page.tsx"]
+    assert updated.code_bundle.hashes["package.json"] == before["package.json"]
+
+
+def test_template_compiles_inline_and_block_slots():
+    template = Template("""
+        <div id={{ id }}>
+          {{> children }}
+        </div>
+    """)
+    rendered = template.render(
+        "  ", id='{"a"}', children=lambda out, indent: out.append(f"{indent}<span />\n")
+    )
+    assert rendered == '  <div id={"a"}>\n    <span />\n  </div>\n'
+    assert set(template._compiled) == {"", "  "}
+
+
+def test_page_renders_jsx_per_node_and_escapes_text():
+    ui_ir = _ui_ir()
+    hero = ui_ir.layout_tree.children[0]
+    tree = ui_ir.layout_tree.copy(
+        update={"children": [hero.copy(update={"text": 'say "hi" {now}'}), *ui_ir.layout_tree.children[1:]]}
+    )
+    page = codegen._render_next_page(ui_ir.copy(update={"layout_tree": tree}))
+    assert '<section data-node-id={"hero"}' in page
+    assert '{"say \\"hi\\" {now}"}' in page
+    assert 'href={"/app"}' in page
+    assert "const data" not in page
+
+
+def test_unchanged_subtrees_reuse_cached_fragments():
+    ui_ir = _ui_ir()
+    codegen.fragment_cache.clear()
+    first = codegen._render_next_page(ui_ir)
+    cached = len(codegen.fragment_cache)
+
+    hero = ui_ir.layout_tree.children[0]
+    button = hero.children[0].copy(update={"id": "new-button", "text": "新按钮"})
+    tree = ui_ir.layout_tree.copy(
+        update={"children": [hero.copy(update={"children": [*hero.children, button]}), *ui_ir.layout_tree.children[1:]]}
+    )
+    second = codegen._render_next_page(ui_ir.copy(update={"layout_tree": tree}))
+
+    # 只新增 root、hero 与新按钮三个片段，feature-section 等未修改的子树直接复用。
+    assert len(codegen.fragment_cache) == cached + 3
+    assert '{"新按钮"}' in second and second != first
+    assert codegen._render_next_page(ui_ir) == first
+    assert len(codegen.fragment_cache) == cached + 3
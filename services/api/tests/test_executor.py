@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import pipeline
+from app.services.executor import ExecutorSaturatedError, StageExecutor
+
+
+def test_stage_runs_off_the_event_loop():
+    executor = StageExecutor(thread_workers=2)
+
+    async def scenario():
+        return await executor.run("sketch", threading.get_ident)
+
+    assert asyncio.run(scenario()) != threading.get_ident()
+    executor.shutdown()
+
+
+def test_stage_concurrency_cap():
+    executor = StageExecutor(thread_workers=8, stage_limits={"sketch": 2})
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+
+    async def scenario():
+        await asyncio.gather(*(executor.run("sketch", work) for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert max(peak) == 2
+    executor.shutdown()
+
+
+def test_backpressure_rejects_when_saturated():
+    executor = StageExecutor(thread_workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run("codegen", time.sleep, 0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run("codegen", time.sleep, 0)
+        await first
+
+    asyncio.run(scenario())
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_create_project_async_matches_sync_pipeline():
+    project = asyncio.run(pipeline.create_project_async(b"async-sketch", b"audio", None))
+    assert project.ui_ir.layout_tree.id == "root"
+    assert project.ui_ir.metadata["source"] == "mixed"
+    assert pipeline.store.get(project.project_id) is not None
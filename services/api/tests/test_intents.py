@@ -0,0 +1,110 @@
+import pytest
+
+from app.services import intents, pipeline
+from app.services.layout_index import LayoutIndex
+from app.services.patches import apply_patches
+
+
+def _index():
+    return LayoutIndex(pipeline.parse_sketch(b"fake"))
+
+
+def test_automaton_prefers_leftmost_longest_and_word_boundaries():
+    automaton = intents.Automaton({"加": "add", "加粗": "bold", "button": "button", "最后": "last", "最后面": "end"})
+    found = [(match.start, match.value) for match in automaton.find("加粗最后面的按钮 button cta-button buttons")]
+    assert found == [(0, "bold"), (2, "end"), (9, "button")]
+
+
+def test_parse_extracts_slots_in_chinese_and_english():
+    engine = intents.IntentEngine()
+    (add,) = engine.parse('Add a "Buy now" button to the HERO')
+    assert (add.action, add.subject.type, add.destination.type, add.text) == ("add", "button", "hero", "Buy now")
+
+    button, cards = engine.parse("在 Hero 区域显示标题 ProtoWeaver，加一个立即体验按钮，下方放三个特性卡片")
+    assert (button.subject.type, button.text) == ("button", "立即体验")
+    assert (cards.subject.type, cards.count, cards.text, cards.position) == ("card", 3, "特性", "end")
+
+    (remove,) = engine.parse("删除第二个卡片")
+    assert (remove.action, remove.subject.type, remove.subject.ordinal) == ("remove", "card", 1)
+    (restyle,) = engine.parse("make all buttons #112233")
+    assert restyle.subject.all and restyle.style == (("color", "#112233"),)
+    (move,) = engine.parse("把 #feature-voice 移到 hero")
+    assert (move.subject.ref, move.destination.type) == ("feature-voice", "hero")
+
+    assert engine.parse("ＡＤＤ   Button") is engine.parse("add button")
+    assert engine.cache_info().hits >= 1
+
+
+@pytest.mark.parametrize(
+    "message, check",
+    [
+        ("add button", lambda tree: [child.text for child in tree.children[0].children] == ["立即体验", "新增按钮"]),
+        ("remove the second card", lambda tree: [c.id for c in tree.children[1].children] == ["feature-detection", "feature-code"]),
+        ("删除所有卡片", lambda tree: tree.children[1].children == []),
+        ("把最后一张卡片移到顶部", lambda tree: tree.children[1].children[0].id == "feature-code"),
+        ("move the first card to the hero", lambda tree: tree.children[0].children[-1].id == "feature-detection"),
+        ("把按钮改成红色并且加粗", lambda tree: tree.children[0].children[0].style == {"background": "#ef4444", "fontWeight": 700}),
+        ("在 hero 里加两个“了解更多”按钮", lambda tree: [c.text for c in tree.children[0].children[1:]] == ["了解更多 1", "了解更多 2"]),
+    ],
+)
+def test_plan_patches_replay_to_the_same_tree(message, check):
+    index = _index()
+    original = index.root
+    patches = intents.plan_patches(index, message)
+    assert patches
+    assert check(index.root)
+    assert apply_patches(original, patches) == index.root
+
+
+def test_unknown_or_unresolvable_commands_produce_no_patches():
+    index = _index()
+    root = index.root
+    assert intents.plan_patches(index, "随便聊聊天气") == []
+    assert intents.plan_patches(index, "delete missing-node") == []
+    assert intents.plan_patches(index, "move the hero into cta-button") == []
+    assert index.root is root
+
+
+@pytest.mark.parametrize("message", ["remove red", "删除红色", "delete the bold", "去掉红色", "把红色移到顶部"])
+def test_remove_or_move_without_component_is_ignored(message):
+    index = _index()
+    root = index.root
+    assert intents.plan_patches(index, message) == []
+    assert index.root is root
+    assert "accent_color" in intents.describe(message)
+
+
+def test_interpret_intent_uses_mentioned_color():
+    assert pipeline.interpret_intent("把按钮改成绿色")["accent_color"] == "#22c55e"
+    assert pipeline.interpret_intent("加一个按钮")["accent_color"] == "#3b82f6"
+    assert pipeline.interpret_intent(None) == {}
+
+
+@pytest.mark.parametrize("message", ["I like the red button", "我喜欢红色按钮", "改成红色", "make it blue", "把它们染成绿色"])
+def test_style_without_action_or_antecedent_is_ignored(message):
+    index = _index()
+    root = index.root
+    assert intents.plan_patches(index, message) == []
+    assert index.root is root
+
+
+def test_pronouns_and_elided_subjects_refer_to_the_previous_command():
+    index = _index()
+    patches = intents.plan_patches(index, "add two cards then make them green")
+    new_ids = [patch.payload["id"] for patch in patches if patch.op == "insert"]
+    assert [patch.target_id for patch in patches if patch.op == "update"] == new_ids
+    assert all(index.get(node_id).style == {"background": "#22c55e"} for node_id in new_ids)
+    assert index.root.style == {}
+
+    index = _index()
+    intents.plan_patches(index, "加一个按钮，把它删掉")
+    assert [child.id for child in index.root.children[0].children] == ["cta-button"]
+
+    index = _index()
+    intents.plan_patches(index, "把按钮改成红色，加粗")
+    assert index.get("cta-button").style == {"background": "#ef4444", "fontWeight": 700}
+
+
+def test_describe_picks_up_colors_outside_commands():
+    assert intents.describe("主题用紫色，按钮要 #112233")["accent_color"] == "#8b5cf6"
+    assert intents.describe("I like the red button")["accent_color"] == "#ef4444"
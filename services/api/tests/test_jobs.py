@@ -0,0 +1,85 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.jobs import JobManager, JobQueueFullError, job_manager
+from app.services.pipeline import PIPELINE_STAGES
+
+client = TestClient(app)
+
+
+def _submit():
+    sketch = io.BytesIO(b'job-sketch-bytes')
+    response = client.post('/v1/jobs', files={'sketch': ('sketch.png', sketch, 'image/png')}, data={'transcript': 'Hero'})
+    assert response.status_code == 202
+    body = response.json()
+    assert body['status'] in ('queued', 'running', 'succeeded')
+    return body['job_id']
+
+
+def _wait(job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f'/v1/jobs/{job_id}').json()
+        if body['status'] in ('succeeded', 'failed'):
+            return body
+        time.sleep(0.02)
+    raise AssertionError('job did not finish in time')
+
+
+def test_job_runs_pipeline_and_reports_stages():
+    body = _wait(_submit())
+    assert body['status'] == 'succeeded'
+    stages = [event['stage'] for event in body['events']]
+    assert stages[0] == 'started'
+    assert stages[-1] == 'completed'
+    assert set(PIPELINE_STAGES) <= set(stages)
+
+    project_id = body['result']['project_id']
+    assert client.get(f'/v1/projects/{project_id}').status_code == 200
+
+
+def test_job_event_stream():
+    job_id = _submit()
+    with client.stream('GET', f'/v1/jobs/{job_id}/events') as response:
+        assert response.headers['content-type'].startswith('text/event-stream')
+        lines = [line for line in response.iter_lines() if line.startswith('event: ')]
+    assert lines[-1] == 'event: completed'
+    assert 'event: code_generated' in lines
+
+
+def test_unknown_job_returns_404():
+    assert client.get('/v1/jobs/missing').status_code == 404
+    assert client.get('/v1/jobs/missing/events').status_code == 404
+
+
+def test_full_job_queue_returns_503(monkeypatch):
+    monkeypatch.setattr(job_manager, 'max_queued', 0)
+    sketch = io.BytesIO(b'job-sketch-bytes')
+    response = client.post('/v1/jobs', files={'sketch': ('sketch.png', sketch, 'image/png')})
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+    with pytest.raises(JobQueueFullError):
+        job_manager.submit(b'job-sketch-bytes', None, None)
+
+
+def test_stream_replays_job_evicted_before_subscribing():
+    manager = JobManager(consumers=1, retention=0)
+    try:
+        job = manager.submit(b'job-sketch-bytes', None, 'Hero')
+        deadline = time.monotonic() + 5
+        while job.status not in ('succeeded', 'failed') and time.monotonic() < deadline:
+            time.sleep(0.02)
+        manager._evict_finished()
+        assert manager.get(job.job_id) is None and manager.queue_depth == 0
+
+        async def collect():
+            return [event.stage async for event in manager.stream(job)]
+
+        assert asyncio.run(collect())[-1] == 'completed'
+    finally:
+        manager.shutdown()
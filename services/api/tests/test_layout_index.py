@@ -0,0 +1,49 @@
+from app.schemas.project import UIIRPatch
+from app.services import pipeline
+from app.services.layout_index import LayoutIndex
+from app.services.patches import apply_patches
+
+
+def _snapshot(index):
+    return {
+        node_id: (index.get(node_id), index.parent(node_id).id if index.parent(node_id) else None, index.depth(node_id))
+        for node_id in index
+    }
+
+
+def test_lookup_parent_depth_and_path():
+    index = LayoutIndex.build(pipeline.parse_sketch(b"fake"))
+    assert index.get("cta-button").type == "button"
+    assert index.parent("cta-button").id == "hero"
+    assert index.depth("cta-button") == 2
+    assert index.path("feature-code") == ["root", "feature-section", "feature-code"]
+    assert index.parent("root") is None
+    assert "missing" not in index
+
+
+def test_index_stays_consistent_with_patches():
+    tree = pipeline.parse_sketch(b"fake")
+    patches = [
+        UIIRPatch(target_id="cta-button", op="insert", payload={"id": "icon", "type": "image"}),
+        UIIRPatch(target_id="feature-voice", op="remove"),
+        UIIRPatch(target_id="feature-section", op="update", payload={"children": [{"id": "only", "type": "card"}]}),
+        UIIRPatch(target_id="hero", op="update", payload={"text": "新的标题"}),
+    ]
+    index = LayoutIndex.build(tree)
+    root = index.apply_all(patches)
+
+    assert root == apply_patches(tree, patches)
+    assert _snapshot(index) == _snapshot(LayoutIndex.build(root))
+    assert index.get("icon") is root.children[0].children[0].children[0]
+    assert index.get("hero") is root.children[0]
+    assert "feature-code" not in index
+
+
+def test_copy_is_independent_of_the_original():
+    index = LayoutIndex.build(pipeline.parse_sketch(b"fake"))
+    before = _snapshot(index)
+    clone = index.copy()
+    clone.apply(UIIRPatch(target_id="feature-voice", op="remove"))
+    assert "feature-voice" in index and "feature-voice" not in clone
+    assert _snapshot(index) == before
+    assert _snapshot(clone) == _snapshot(LayoutIndex.build(clone.root))
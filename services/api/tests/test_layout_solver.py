@@ -0,0 +1,123 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas.project import LayoutNode, UIIRPatch
+from app.services import layout_solver, pipeline
+from app.services.layout_index import LayoutIndex
+from app.services.patches import diff_trees
+from app.services.store import store
+from benchmarks.synthetic import build_tree
+
+
+def _assert_same_frame(left, right):
+    assert left.boxes.keys() == right.boxes.keys()
+    for node_id, box in right.boxes.items():
+        assert left.boxes[node_id] == pytest.approx(box), node_id
+    assert left.parents == right.parents
+    assert left.nodes == right.nodes
+
+
+def test_column_layout_with_padding_gap_and_alignment():
+    root = LayoutNode(
+        id="root",
+        type="page",
+        layout={"direction": "column", "gap": 8, "padding": [10, 20, 10, 20]},
+        children=[
+            LayoutNode(id="ok", type="button", text="OK"),
+            LayoutNode(id="name", type="input", constraints={"horizontalAlign": "center"}),
+            LayoutNode(id="cover", type="image", layout={"width": 100}),
+        ],
+    )
+    frame = layout_solver.solve_layout(root, viewport_width=400)
+    assert frame.boxes == {
+        "root": (0, 0, 400, 296),
+        "ok": (20, 10, 360, 40),  # 交叉轴默认拉伸
+        "name": (80, 58, 240, 40),
+        "cover": (20, 106, 100, 180),
+    }
+    assert frame.bounds("name").dict() == {"x": 80, "y": 58, "width": 240, "height": 40}
+
+
+def test_row_layout_distributes_free_space_and_shrinks_overflow():
+    children = [
+        LayoutNode(id="a", type="button", constraints={"grow": 1}),
+        LayoutNode(id="b", type="button", constraints={"grow": 3, "maxWidth": 200}),
+        LayoutNode(id="c", type="text", text="abc", constraints={"verticalAlign": "end"}),
+    ]
+    root = LayoutNode(id="row", type="section", layout={"direction": "row", "gap": 10}, children=children)
+    frame = layout_solver.solve_layout(root, viewport_width=500)
+    assert frame.boxes["a"] == (0, 0, 174, 40)
+    assert frame.boxes["b"] == (184, 0, 200, 40)
+    assert frame.boxes["c"] == (394, 16, 24, 24)
+
+    narrow = layout_solver.solve_layout(root, viewport_width=200)
+    widths = [narrow.boxes[node_id][2] for node_id in "abc"]
+    assert sum(widths) + 20 == pytest.approx(200)
+    assert widths[0] == pytest.approx(widths[1]) and widths[0] / widths[2] == pytest.approx(5)
+
+
+def test_container_text_is_laid_out_as_a_heading_line():
+    frame = layout_solver.solve_layout(pipeline.parse_sketch(b"fake"))
+    hero, button = frame.boxes["hero"], frame.boxes["cta-button"]
+    assert button[1] == hero[1] + layout_solver.TEXT_LINE_HEIGHT
+    assert hero[3] == layout_solver.TEXT_LINE_HEIGHT + button[3]
+    detection, voice = frame.boxes["feature-detection"], frame.boxes["feature-voice"]
+    assert voice[0] == detection[0] + detection[2] + 16
+
+
+def test_incremental_relayout_matches_full_solve():
+    rng = random.Random(7)
+    index = LayoutIndex.build(build_tree(4, 4))
+    frame = layout_solver.solve_layout(index.root)
+    for step in range(80):
+        target = rng.choice(list(index))
+        roll = rng.random()
+        if roll < 0.15 and target != "root":
+            patch = UIIRPatch(target_id=target, op="remove")
+        elif roll < 0.55:
+            payload = {"id": f"new-{step}", "type": "button", "text": "x" * rng.randint(1, 30)}
+            patch = UIIRPatch(target_id=target, op="insert", payload=payload, position=0)
+        else:
+            payload = {
+                "layout": {"direction": rng.choice(["row", "column"]), "gap": rng.choice([0, 8]), "padding": 4},
+                "constraints": {"grow": rng.choice([0, 1]), "verticalAlign": rng.choice(["center", "stretch"])},
+            }
+            patch = UIIRPatch(target_id=target, op="update", payload=payload)
+        previous = index.root
+        index.apply(patch)
+        patches = diff_trees(previous, index.root)
+        frame = layout_solver.relayout(frame, index, layout_solver.dirty_nodes(frame, index, patches))
+        assert frame.root is index.root
+        _assert_same_frame(frame, layout_solver.solve_layout(index.root))
+
+
+def test_apply_bounds_shares_unchanged_subtrees():
+    tree = pipeline.parse_sketch(b"fake")
+    frame = layout_solver.solve_layout(tree)
+    placed = layout_solver.apply_bounds(tree, frame)
+    assert placed.children[1].children[2].bounds == frame.bounds("feature-code")
+    assert layout_solver.apply_bounds(placed, frame) is placed
+
+
+def test_iteration_relayouts_cached_frame_and_serves_it():
+    client = TestClient(app)
+    created = client.post("/v1/projects", files={"sketch": ("sketch.png", b"fake", "image/png")}).json()
+    project_id = created["project_id"]
+
+    response = client.get(f"/v1/projects/{project_id}/layout")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["viewport_width"] == 1280 and body["boxes"]["root"]["width"] == 1280
+    assert store.get(project_id).frame is not None
+
+    assert client.post(f"/v1/projects/{project_id}/iterate", json={"message": "在 hero 里加两个按钮"}).status_code == 200
+    project = store.get(project_id)
+    # 新版本的布局由上一版本增量重排得到，与整体求解一致。
+    assert project.frame is not None and project.frame.root is project.ui_ir.layout_tree
+    _assert_same_frame(project.frame, layout_solver.solve_layout(project.ui_ir.layout_tree))
+    assert len(client.get(f"/v1/projects/{project_id}/layout").json()["boxes"]) == len(project.layout_index)
+
+    assert client.get("/v1/projects/missing/layout").status_code == 404
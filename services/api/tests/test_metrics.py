@@ -0,0 +1,91 @@
+import io
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import Metric, MetricsRegistry, SamplingProfiler, Tracer
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ('stage',), buckets=(0.1, 1.0))
+    latency.observe(0.05, stage='sketch')
+    latency.observe(0.1, stage='sketch')
+    latency.observe(3.0, stage='sketch')
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="sketch",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="sketch",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="sketch",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="sketch"} 3' in text
+
+
+def test_registry_reuses_metrics_and_checks_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter('demo', 'Demo counter', ('result',))
+    assert registry.counter('demo', 'Demo counter', ('result',)) is counter
+    counter.inc(result='hit')
+    assert 'demo_total{result="hit"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(stage='sketch')
+    with pytest.raises(ValueError):
+        registry.gauge('demo', 'Demo gauge')
+    with pytest.raises(TypeError):
+        Metric('untyped', 'Metric without samples')
+
+
+def test_gauge_function_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.gauge('demo_depth', 'Queue depth').set_function(lambda: depth[0])
+    assert 'demo_depth 3' in registry.render()
+    depth[0] = 5
+    assert 'demo_depth 5' in registry.render()
+
+
+def test_spans_nest_within_a_trace():
+    tracer = Tracer(buffer_size=8)
+    with tracer.span('outer') as outer:
+        with tracer.span('inner') as inner:
+            pass
+    with pytest.raises(RuntimeError):
+        with tracer.span('failing'):
+            raise RuntimeError('boom')
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert [item.name for item in tracer.recent()] == ['inner', 'outer', 'failing']
+    assert tracer.recent()[-1].error == 'RuntimeError'
+
+
+def test_profiler_collects_folded_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=stop.wait, name='profiled')
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.05)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    assert 'threading:wait' in profiler.folded()
+
+
+def test_metrics_endpoint_exposes_pipeline_spans():
+    response = client.post('/v1/projects', files={'sketch': ('sketch.png', io.BytesIO(b'metrics-sketch'), 'image/png')})
+    assert response.status_code == 200
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    assert metrics.headers['content-type'].startswith('text/plain')
+    body = metrics.text
+    for stage in ('create_project', 'sketch', 'codegen', 'store'):
+        assert f'protoweaver_span_duration_seconds_count{{span="{stage}"}}' in body
+    assert 'protoweaver_cache_requests_total{stage="sketch",result="miss"}' in body
+    assert 'protoweaver_executor_pending 0' in body
+    assert 'protoweaver_payload_bytes_count{kind="sketch"}' in body
+    traces = client.get('/debug/traces', params={'limit': 5}).json()
+    assert 'create_project' in {item['name'] for item in traces}
@@ -0,0 +1,140 @@
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import audio, models
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SegmentModel(models.Model):
+    def predict(self, inputs):
+        return [f"segment {segment.index}" for segment in inputs]
+
+
+def _registry(tmp_path, **kwargs):
+    models.write_mock_model(tmp_path, "cv", "detector", dims=(64, 16))
+    models.write_mock_model(tmp_path, "asr", "tiny", dims=(128, 32), seed=1)
+    models.write_mock_model(tmp_path, "nlu", "intent", dims=(32, 8), seed=2)
+    return models.ModelRegistry(tmp_path, **kwargs)
+
+
+def test_lazy_load_with_warmup_and_mapped_weights(tmp_path):
+    registry = _registry(tmp_path)
+    assert registry.names() == ["asr/tiny", "cv/detector", "nlu/intent"]
+    assert not any(stats.loaded for stats in registry.stats())
+
+    model = registry.get("cv/detector")
+    assert isinstance(model, models.MockModel)
+    assert model.calls == 1  # 预热批次
+    assert isinstance(model.weights["projection"], np.memmap)
+    assert not model.weights["projection"].flags.writeable
+
+    output = model.predict([np.ones(64)])
+    expected = np.ones(64, dtype=np.float32) @ np.load(tmp_path / "cv/detector/projection.npy")
+    assert np.allclose(output[0], expected)
+
+    assert registry.get("cv/detector") is model
+    stats = {item.name: item for item in registry.stats()}["cv/detector"]
+    assert stats.loaded and stats.loads == 1 and stats.uses == 2
+    assert stats.load_seconds is not None and stats.warmup_seconds is not None
+    assert stats.mapped_bytes == 64 * 16 * 4 and stats.private_bytes == 0
+    assert stats.resident_bytes is None or stats.resident_bytes <= stats.mapped_bytes + 4096
+
+    with pytest.raises(KeyError):
+        registry.get("cv/missing")
+
+
+def test_concurrent_first_use_loads_once(tmp_path):
+    registry = _registry(tmp_path)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("asr/tiny"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(model) for model in results}) == 1
+    assert {item.name: item for item in registry.stats()}["asr/tiny"].loads == 1
+
+
+def test_memory_cap_evicts_least_recently_used(tmp_path):
+    clock = FakeClock()
+    # cv 4KiB、asr 16KiB、nlu 1KiB；上限只能同时容纳 asr 与其中一个较小的模型
+    registry = _registry(tmp_path, memory_cap=20 * 1024, clock=clock)
+    registry.get("cv/detector")
+    clock.now = 1
+    registry.get("nlu/intent")
+    clock.now = 2
+    with registry.use("cv/detector"):
+        clock.now = 3
+        registry.get("asr/tiny")
+        loaded = {item.name for item in registry.stats() if item.loaded}
+        # nlu 最久未使用被卸载，cv 使用中保留
+        assert loaded == {"cv/detector", "asr/tiny"}
+    clock.now = 4
+    registry.get("nlu/intent")
+    loaded = {item.name for item in registry.stats() if item.loaded}
+    assert loaded == {"asr/tiny", "nlu/intent"}
+    assert {item.name: item for item in registry.stats()}["nlu/intent"].loads == 2
+
+
+def test_idle_models_are_unloaded(tmp_path):
+    clock = FakeClock()
+    registry = _registry(tmp_path, idle_seconds=60, clock=clock)
+    registry.preload(["cv/detector", "nlu/intent"])
+    clock.now = 30
+    registry.get("nlu/intent")
+    clock.now = 70
+    with registry.use("asr/tiny"):
+        clock.now = 200
+        assert registry.evict_idle() == ["cv/detector", "nlu/intent"]
+    assert [item.name for item in registry.stats() if item.loaded] == ["asr/tiny"]
+
+
+def test_models_debug_endpoint():
+    response = TestClient(app).get("/debug/models")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+def test_resident_bytes_reads_cached_stats(tmp_path, monkeypatch):
+    registry = _registry(tmp_path)
+    registry.get("cv/detector")
+    cached = registry.resident_bytes()
+
+    def unexpected(paths):
+        raise AssertionError("scrape must not read smaps")
+
+    monkeypatch.setattr(models, "_mapped_rss", unexpected)
+    assert registry.resident_bytes() == cached
+
+
+def test_models_dir_is_resolved_from_the_package(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = models.create_model_registry(models.Settings(models_dir="../../models"))
+    assert registry.root == models.API_ROOT.parent.parent / "models"
+
+
+def test_asr_backend_uses_registry_model(tmp_path):
+    directory = tmp_path / "asr" / "segments"
+    directory.mkdir(parents=True)
+    np.save(directory / "vocab.npy", np.zeros(4, dtype=np.float32))
+    (directory / models.MANIFEST).write_text(f'{{"loader": "{__name__}:SegmentModel"}}', encoding="utf-8")
+    registry = models.ModelRegistry(tmp_path)
+    backend = audio.load_asr_backend("model:asr/segments")
+    assert isinstance(backend, audio.RegistryASRBackend) and backend.registry is models.model_registry
+
+    backend.registry = registry
+    segment = audio.SpeechSegment(index=2, start=0.0, end=1.0, samples=np.zeros(16000, dtype=np.float32), sample_rate=16000)
+    assert backend.transcribe(segment) == "segment 2"
+    stats = {item.name: item for item in registry.stats()}["asr/segments"]
+    assert stats.loaded and stats.uses == 1 and stats.in_use == 0
@@ -0,0 +1,47 @@
+import sys
+
+from app.schemas.project import LayoutNode
+from app.services.node_table import NodeTable
+from benchmarks.synthetic import build_tree
+
+
+def test_round_trip_preserves_tree_and_field_order():
+    tree = build_tree(depth=4, fanout=3, seed=2)
+    table = NodeTable.from_layout(tree)
+    rebuilt = table.to_layout()
+    assert len(table) == 1 + 1 + 3 + 9 + 27
+    assert rebuilt == tree
+    assert rebuilt.json() == tree.json()
+    assert list(rebuilt.__dict__) == list(LayoutNode.__fields__)
+
+
+def test_sparse_columns_skip_empty_values():
+    tree = LayoutNode(
+        id='root',
+        type='page',
+        children=[LayoutNode(id='a', type='text', text=''), LayoutNode(id='b', type='button', style={'color': 'red'})],
+    )
+    table = NodeTable.from_layout(tree)
+    assert set(table.columns) == {'text', 'style'}
+    assert table.get(1, 'text') == ''
+    assert table.get(2, 'style') == {'color': 'red'}
+    assert table.get(0, 'layout') is None
+    assert table.to_layout().children[0].text == ''
+
+
+def test_columnar_index_queries():
+    tree = build_tree(depth=3, fanout=2)
+    table = NodeTable.from_layout(tree)
+    assert list(table.parents[:2]) == [-1, 0]
+    assert [table.ids[index] for index in table.children(0)] == [child.id for child in tree.children]
+    assert table.index_of('hero') == 1
+    assert table.index_of('missing') is None
+    assert all(node_type is sys.intern(node_type) for node_type in table.types)
+
+
+def test_rebuilt_tree_supports_copy_on_write():
+    table = NodeTable.from_layout(build_tree(depth=3, fanout=2))
+    rebuilt = table.to_layout()
+    updated = rebuilt.copy(update={'text': 'changed'})
+    assert updated.text == 'changed'
+    assert table.to_layout().text is None
@@ -0,0 +1,74 @@
+import pytest
+
+from app.schemas.project import LayoutNode, UIIRPatch
+from app.services import pipeline
+from app.services.patches import PatchError, apply_patch, apply_patches, diff_trees
+
+
+def _tree():
+    return pipeline.parse_sketch(b"fake")
+
+
+def test_apply_patch_shares_untouched_subtrees():
+    tree = _tree()
+    patched = apply_patch(tree, UIIRPatch(target_id="feature-voice", op="update", payload={"text": "语音"}))
+
+    assert tree.children[1].children[1].text == "语音描述转交互"
+    assert patched.children[1].children[1].text == "语音"
+    assert patched.children[0] is tree.children[0]
+    assert patched.children[1].children[0] is tree.children[1].children[0]
+
+
+def test_insert_and_remove():
+    tree = _tree()
+    patched = apply_patches(
+        tree,
+        [
+            UIIRPatch(target_id="hero", op="insert", position=0, payload={"id": "logo", "type": "image"}),
+            UIIRPatch(target_id="feature-code", op="remove"),
+        ],
+    )
+    assert [child.id for child in patched.children[0].children] == ["logo", "cta-button"]
+    assert [child.id for child in patched.children[1].children] == ["feature-detection", "feature-voice"]
+
+    with pytest.raises(PatchError):
+        apply_patch(tree, UIIRPatch(target_id="root", op="remove"))
+    with pytest.raises(PatchError):
+        apply_patch(tree, UIIRPatch(target_id="missing", op="update", payload={}))
+
+
+def test_diff_round_trips_updates_moves_and_inserts():
+    old = _tree()
+    new = apply_patches(
+        old,
+        [
+            UIIRPatch(target_id="feature-detection", op="remove"),
+            UIIRPatch(target_id="feature-section", op="insert", position=2, payload={"id": "feature-detection", "type": "card"}),
+            UIIRPatch(target_id="cta-button", op="remove"),
+            UIIRPatch(target_id="feature-section", op="insert", position=0, payload={"id": "cta-button", "type": "button"}),
+            UIIRPatch(target_id="hero", op="update", payload={"text": "新的标题", "style": {"tone": "info"}}),
+        ],
+    )
+
+    patches = diff_trees(old, new)
+    assert apply_patches(old, patches) == new
+    assert {patch.op for patch in patches} == {"remove", "insert", "update"}
+
+
+def test_diff_of_shared_tree_is_empty():
+    tree = _tree()
+    assert diff_trees(tree, tree) == []
+    renamed = LayoutNode(id="other-root", type="page")
+    assert apply_patches(tree, diff_trees(tree, renamed)).id == "other-root"
+
+
+def test_patch_wire_format_matches_ui_ir_package():
+    from app.services.serialization import dumps, loads, to_builtins
+
+    patch = UIIRPatch(target_id="hero", op="insert", payload={"id": "logo", "type": "image"}, position=0)
+    wire = loads(dumps(patch))
+    assert wire == {"targetId": "hero", "op": "insert", "payload": {"id": "logo", "type": "image"}, "position": 0}
+    assert to_builtins(patch) == patch.dict(by_alias=True)
+    # 旧版本以字段名存储的修订记录仍可读取。
+    legacy = {"target_id": "hero", "op": "insert", "payload": {"id": "logo", "type": "image"}, "position": 0}
+    assert UIIRPatch.parse_obj(wire) == UIIRPatch.parse_obj(legacy) == patch
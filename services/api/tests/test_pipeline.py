@@ -1,6 +1,10 @@
+import threading
+
 import pytest
 
 from app.services import pipeline
+from app.services.layout_index import LayoutIndex
+from app.services.store import RevisionConflictError, store
 
 
 def test_parse_sketch_generates_layout():
@@ -23,3 +27,37 @@ def test_apply_iteration_adds_button(message):
     updated = pipeline.apply_iteration(project.project_id, message)
     hero = next(child for child in updated.ui_ir.layout_tree.children if child.id == "hero")
     assert len(hero.children) >= before
+
+
+def test_concurrent_iterations_do_not_leak_into_committed_versions():
+    project = store.get(pipeline.create_project(b"sketch", None, "Hero section").project_id)
+    committed = project.ui_ir.layout_tree
+    index = project.layout_index
+    barrier = threading.Barrier(4)
+    outcomes = []
+
+    def iterate():
+        barrier.wait()
+        try:
+            pipeline.run_iteration(project.project_id, "添加一个按钮")
+            outcomes.append("ok")
+        except RevisionConflictError:
+            outcomes.append("conflict")
+
+    for _ in range(10):
+        threads = [threading.Thread(target=iterate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    current = store.get(project.project_id)
+    succeeded = outcomes.count("ok")
+    hero = next(child for child in current.ui_ir.layout_tree.children if child.id == "hero")
+    # 被 409 拒绝的迭代不会在已保存的树里留下节点，版本号与成功次数一致。
+    assert len(hero.children) == 1 + succeeded
+    assert current.ui_ir.metadata["revision"] == 1 + succeeded
+    assert len(current.layout_index) == len(LayoutIndex.build(current.ui_ir.layout_tree))
+    # 已提交版本持有的索引保持不变。
+    assert project.index is index and index.root is committed
+    assert len(index) == len(LayoutIndex.build(committed))
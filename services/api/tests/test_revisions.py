@@ -0,0 +1,132 @@
+import gc
+import io
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas.project import LayoutNode, UIIRPayload
+from app.services import pipeline
+from app.services.patches import diff_trees
+from app.services.revisions import InMemoryRevisionLog, RevisionNotFoundError, SQLiteRevisionLog
+
+client = TestClient(app)
+
+
+def _history(count):
+    layout = pipeline.parse_sketch(b"fake")
+    versions = [pipeline.fuse_modalities(layout, {"summary": "test"}, [])]
+    for revision in range(2, count + 1):
+        previous = versions[-1]
+        hero = previous.layout_tree.children[0]
+        button = hero.children[-1].copy(update={"id": f"button-{revision}", "text": f"按钮 {revision}"})
+        tree = previous.layout_tree.copy(
+            update={"children": [hero.copy(update={"children": [*hero.children, button]}), *previous.layout_tree.children[1:]]}
+        )
+        versions.append(
+            previous.copy(update={"layout_tree": tree, "metadata": {**previous.metadata, "revision": revision}})
+        )
+    return versions
+
+
+def _record(log, versions):
+    project_id = versions[0].id
+    log.record(project_id, versions[0], message="create")
+    for previous, current in zip(versions, versions[1:]):
+        log.record(project_id, current, previous, diff_trees(previous.layout_tree, current.layout_tree))
+    return project_id
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_log(request, tmp_path):
+    logs = []
+
+    def factory(**kwargs):
+        if request.param == "memory":
+            log = InMemoryRevisionLog(**kwargs)
+        else:
+            log = SQLiteRevisionLog(str(tmp_path / f"revisions-{len(logs)}.db"), **kwargs)
+        logs.append(log)
+        return log
+
+    yield factory
+    for log in logs:
+        if isinstance(log, SQLiteRevisionLog):
+            log.close()
+
+
+def test_snapshots_every_interval_and_reconstruct_any_revision(make_log):
+    versions = _history(12)
+    log = make_log(snapshot_interval=5, retention=None)
+    project_id = _record(log, versions)
+
+    history = log.history(project_id)
+    assert [entry.revision for entry in history if entry.is_snapshot] == [1, 6, 11]
+    for version in versions:
+        rebuilt = log.reconstruct(project_id, version.metadata["revision"])
+        assert rebuilt.layout_tree == version.layout_tree
+        assert rebuilt.metadata == version.metadata
+
+
+def test_compaction_keeps_recent_revisions_reconstructable(make_log):
+    versions = _history(12)
+    log = make_log(snapshot_interval=5, retention=4)
+    project_id = _record(log, versions)
+
+    # 记录快照版本 11 时触发压缩：保留 8..11，版本 8 改写为快照。
+    assert log.bounds(project_id) == (8, 12)
+    assert [entry.revision for entry in log.history(project_id) if entry.is_snapshot] == [8, 11]
+    with pytest.raises(RevisionNotFoundError):
+        log.reconstruct(project_id, 7)
+    assert log.reconstruct(project_id, 9).layout_tree == versions[8].layout_tree
+    assert log.compact(project_id, keep=2) == 3
+    assert log.reconstruct(project_id, 11).layout_tree == versions[10].layout_tree
+
+
+def test_revision_endpoints_time_travel_and_revert():
+    sketch = io.BytesIO(b"fake-image-bytes")
+    project_id = client.post("/v1/projects", files={"sketch": ("sketch.png", sketch, "image/png")}).json()["project_id"]
+    original = client.get(f"/v1/projects/{project_id}").json()["ui_ir"]
+    for _ in range(2):
+        client.post(f"/v1/projects/{project_id}/iterate", json={"message": "add button"})
+
+    history = client.get(f"/v1/projects/{project_id}/revisions").json()
+    assert history["current_revision"] == 3
+    assert [entry["revision"] for entry in history["revisions"]] == [1, 2, 3]
+
+    first = client.get(f"/v1/projects/{project_id}/revisions/1").json()
+    assert first["ui_ir"]["layout_tree"] == original["layout_tree"]
+    assert "app/page.tsx" in first["code_bundle"]["files"]
+    assert client.get(f"/v1/projects/{project_id}/revisions/9").status_code == 404
+
+    reverted = client.post(f"/v1/projects/{project_id}/revisions/1/revert?full=true").json()
+    assert reverted["revision"] == 4
+    assert reverted["ui_ir"]["layout_tree"] == original["layout_tree"]
+    assert [patch["op"] for patch in reverted["patches"]] == ["remove", "remove"]
+
+
+def _reachable(root):
+    """从 `root` 出发可达的对象（跳过类型、模块与函数，避免经由类遍历到全局对象）。"""
+    seen = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+            continue
+        seen[id(obj)] = obj
+        stack.extend(gc.get_referents(obj))
+    return seen
+
+
+def test_in_memory_snapshots_do_not_keep_committed_payloads_alive():
+    versions = _history(7)
+    log = InMemoryRevisionLog(snapshot_interval=3, retention=None)
+    project_id = _record(log, versions)
+
+    reachable = _reachable(log)
+    assert not any(isinstance(obj, (UIIRPayload, LayoutNode)) for obj in reachable.values())
+    assert [entry.revision for entry in log.history(project_id) if entry.is_snapshot] == [1, 4, 7]
+    for version in versions:
+        rebuilt = log.reconstruct(project_id, version.metadata["revision"])
+        assert rebuilt == version and rebuilt.__fields_set__ == version.__fields_set__
@@ -0,0 +1,66 @@
+import gzip
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import serialization
+from app.services.serialization import dumps, layout_to_builtins, negotiate, to_builtins
+from app.services.store import store
+from benchmarks.synthetic import build_ui_ir
+
+client = TestClient(app)
+
+
+def _create_project():
+    sketch = io.BytesIO(b'serialization-sketch')
+    response = client.post('/v1/projects', files={'sketch': ('sketch.png', sketch, 'image/png')}, data={'transcript': 'Hero'})
+    assert response.status_code == 200
+    return response.json()['project_id']
+
+
+def test_fast_conversion_matches_pydantic():
+    ui_ir = build_ui_ir(depth=3, fanout=3)
+    assert layout_to_builtins(ui_ir.layout_tree) == ui_ir.layout_tree.dict()
+    assert to_builtins(ui_ir) == ui_ir.dict()
+    assert json.loads(dumps(to_builtins(ui_ir))) == json.loads(ui_ir.json())
+
+
+def test_negotiate_respects_quality_values():
+    assert negotiate('', '') == ('json', None)
+    assert negotiate('application/json', 'gzip, deflate') == ('json', 'gzip')
+    assert negotiate('', 'gzip;q=0, identity') == ('json', None)
+    assert negotiate('application/msgpack', '*')[1] is not None
+
+
+def test_negotiate_ignores_missing_optional_codecs(monkeypatch):
+    monkeypatch.setattr(serialization, 'msgpack', None)
+    monkeypatch.setattr(serialization, 'brotli', None)
+    assert negotiate('application/msgpack', 'br, gzip;q=0.5') == ('json', 'gzip')
+
+
+def test_get_project_caches_encoding_per_revision():
+    project_id = _create_project()
+    first = client.get(f'/v1/projects/{project_id}', headers={'Accept-Encoding': 'identity'})
+    assert first.status_code == 200
+    assert first.headers['vary'] == 'Accept, Accept-Encoding'
+    state = store.get(project_id)
+    assert ('json', None) in state.encoded
+    assert client.get(f'/v1/projects/{project_id}', headers={'Accept-Encoding': 'identity'}).content == first.content
+
+    client.post(f'/v1/projects/{project_id}/iterate', json={'message': '添加一个按钮'})
+    updated = client.get(f'/v1/projects/{project_id}', headers={'Accept-Encoding': 'identity'}).json()
+    assert updated['ui_ir']['metadata']['revision'] == 2
+    assert store.get(project_id) is not state
+    assert list(store.get(project_id).encoded) == [('json', None)]
+
+
+def test_gzip_response_round_trips():
+    project_id = _create_project()
+    response = client.get(f'/v1/projects/{project_id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    # httpx 会自动解压；直接检查缓存中的压缩数据
+    body, coding = store.get(project_id).encoded[('json', 'gzip')]
+    assert coding == 'gzip'
+    assert json.loads(gzip.decompress(body)) == response.json()
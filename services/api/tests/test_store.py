@@ -0,0 +1,151 @@
+import threading
+from dataclasses import replace
+
+import pytest
+
+from app.schemas.project import Asset
+from app.services import pipeline
+from app.services.store import (
+    CompactProjectStore,
+    InMemoryProjectStore,
+    ProjectState,
+    ProjectStore,
+    RevisionConflictError,
+    SQLiteProjectStore,
+)
+
+
+def _project(revision=1):
+    layout = pipeline.parse_sketch(b"fake")
+    ui_ir = pipeline.fuse_modalities(layout, {"summary": "test"}, [])
+    ui_ir.metadata["revision"] = revision
+    return ProjectState(project_id=ui_ir.id, ui_ir=ui_ir, code_bundle=pipeline.generate_code(ui_ir))
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def project_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryProjectStore()
+    elif request.param == "compact":
+        yield CompactProjectStore(hot_entries=1)
+    else:
+        sqlite_store = SQLiteProjectStore(str(tmp_path / "projects.db"), pool_size=2)
+        yield sqlite_store
+        sqlite_store.close()
+
+
+def test_round_trip_and_pagination(project_store):
+    projects = [_project() for _ in range(5)]
+    project_store.save_many(projects)
+
+    loaded = project_store.get(projects[0].project_id)
+    assert loaded.ui_ir == projects[0].ui_ir
+    assert loaded.code_bundle == projects[0].code_bundle
+    assert project_store.get("missing") is None
+
+    first_page = project_store.list(limit=2)
+    rest = project_store.list(offset=2)
+    assert len(first_page) == 2
+    assert len(rest) == 3
+    assert set(first_page) | set(rest) == {project.project_id for project in projects}
+
+
+def test_optimistic_concurrency_on_revision(project_store):
+    project = _project(revision=1)
+    project_store.save(project)
+
+    ui_ir = project.ui_ir.copy(update={"metadata": {**project.ui_ir.metadata, "revision": 2}})
+    updated = replace(project, ui_ir=ui_ir)
+    project_store.save(updated, expected_revision=1)
+    with pytest.raises(RevisionConflictError):
+        project_store.save(updated, expected_revision=1)
+
+
+def test_sqlite_store_is_shared_between_instances_and_threads(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer = SQLiteProjectStore(path)
+    reader = SQLiteProjectStore(path)
+    projects = [_project() for _ in range(8)]
+
+    threads = [threading.Thread(target=writer.save, args=(project,)) for project in projects]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(reader.list()) == 8
+    writer.close()
+    reader.close()
+
+
+def test_compact_store_rehydrates_cold_projects():
+    compact_store = CompactProjectStore(hot_entries=1)
+    first, second = _project(), _project()
+    compact_store.save(first)
+    compact_store.save(second)
+
+    loaded = compact_store.get(first.project_id)
+    assert loaded is not first
+    assert loaded.ui_ir == first.ui_ir
+    assert loaded.ui_ir.json() == first.ui_ir.json()
+    assert loaded.layout_index.get("hero") is not None
+    assert compact_store.get(first.project_id) is loaded
+
+
+def _with_assets(*digests, revision=1):
+    project = _project(revision)
+    project.ui_ir.assets = [
+        Asset(id=f"asset-{number}", kind="sketch", uri=f"blob://{digest}", metadata={"sha256": digest})
+        for number, digest in enumerate(digests)
+    ]
+    return project
+
+
+def test_asset_digests_follow_the_current_revision(project_store):
+    first, second = _with_assets("aa", "bb"), _with_assets("aa")
+    project_store.save_many([first, second])
+    project_store.save(_with_assets("cc"))
+    assert sorted(project_store.asset_digests()) == ["aa", "aa", "bb", "cc"]
+
+    ui_ir = first.ui_ir.copy(update={"assets": [], "metadata": {**first.ui_ir.metadata, "revision": 2}})
+    project_store.save(replace(first, ui_ir=ui_ir), expected_revision=1)
+    assert sorted(project_store.asset_digests()) == ["aa", "cc"]
+    assert sorted(ProjectStore.asset_digests(project_store, page_size=1)) == ["aa", "cc"]
+
+
+def test_sqlite_store_backfills_asset_digests_for_existing_databases(tmp_path):
+    path = str(tmp_path / "projects.db")
+    legacy = SQLiteProjectStore(path)
+    legacy.save(_with_assets("aa"))
+    with legacy._connection() as conn:
+        conn.execute("DROP TABLE project_assets")
+        conn.execute("PRAGMA user_version = 0")
+    legacy.close()
+
+    reopened = SQLiteProjectStore(path)
+    assert list(reopened.asset_digests()) == ["aa"]
+    reopened.close()
+
+
+def test_sqlite_get_reuses_cached_project_until_another_process_writes(tmp_path, monkeypatch):
+    path = str(tmp_path / "cached.db")
+    reader, writer = SQLiteProjectStore(path, cache_entries=2), SQLiteProjectStore(path)
+    project = _project(revision=1)
+    writer.save(project)
+
+    first = reader.get(project.project_id)
+    decodes = []
+    monkeypatch.setattr(SQLiteProjectStore, "_decode", staticmethod(lambda row: decodes.append(row) or None))
+    assert reader.get(project.project_id) is first
+    assert decodes == []
+    monkeypatch.undo()
+
+    ui_ir = project.ui_ir.copy(update={"metadata": {**project.ui_ir.metadata, "revision": 2}})
+    writer.save(replace(project, ui_ir=ui_ir), expected_revision=1)
+    reloaded = reader.get(project.project_id)
+    assert reloaded is not first and reloaded.ui_ir.metadata["revision"] == 2
+    # 同一 revision 被覆盖写入（updated_at 变化）也会重新读取。
+    writer.save(replace(project, ui_ir=ui_ir, updated_at=project.updated_at.replace(year=2030)))
+    assert reader.get(project.project_id).updated_at.year == 2030
+    writer.close()
+    reader.close()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services import uploads
+from app.services.blobs import LocalBlobStore
+from app.services.uploads import (
+    StoredUpload,
+    UploadTooLargeError,
+    ingest,
+    open_buffer,
+    source_digest,
+    stream_upload,
+)
+
+
+def _upload(content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename='sketch.png')
+
+
+def test_stream_upload_hashes_in_chunks():
+    content = os.urandom(10_000)
+    stored = asyncio.run(stream_upload(_upload(content), max_bytes=20_000, chunk_size=1024))
+    assert stored.size == len(content)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    with open(stored.path, 'rb') as handle:
+        assert handle.read() == content
+    assert source_digest(stored) == source_digest(content)
+
+
+def test_stream_upload_deduplicates_identical_content(tmp_path, monkeypatch):
+    blobs = LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(uploads, 'blob_store', blobs)
+    first = asyncio.run(stream_upload(_upload(b'same-sketch'), max_bytes=1024))
+    second = asyncio.run(stream_upload(_upload(b'same-sketch'), max_bytes=1024))
+    assert first == second
+    assert len(list(blobs.iter_blobs())) == 1
+    assert list((tmp_path / 'staging').iterdir()) == []
+
+
+def test_stream_upload_rejects_oversized_content_and_cleans_up(tmp_path, monkeypatch):
+    blobs = LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(uploads, 'blob_store', blobs)
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(stream_upload(_upload(b'x' * 5000), max_bytes=4096, chunk_size=1024))
+    assert list(blobs.iter_blobs()) == []
+    assert list((tmp_path / 'staging').iterdir()) == []
+
+
+def test_open_buffer_maps_stored_upload():
+    stored = ingest(b'sketch-content')
+    assert ingest(stored) is stored
+    with open_buffer(stored) as buffer:
+        assert buffer[:6] == b'sketch'
+        assert len(buffer) == stored.size
+    with open_buffer(StoredUpload(path=stored.path, sha256='', size=0)) as buffer:
+        assert buffer == b''
+
+
+def test_generate_returns_413_for_oversized_sketch(monkeypatch):
+    monkeypatch.setattr(settings, 'max_sketch_bytes', 16)
+    client = TestClient(app)
+    response = client.post('/v1/projects', files={'sketch': ('sketch.png', io.BytesIO(b'x' * 64), 'image/png')})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize('path', ['/v1/projects', '/v1/jobs', '/v1/projects/batch'])
+def test_oversized_multipart_is_rejected_before_form_parsing(monkeypatch, path):
+    from app.api_v1.endpoints import generation, jobs
+
+    def unexpected(*args):
+        raise AssertionError('form should not be parsed')
+
+    monkeypatch.setattr(settings, 'max_sketch_bytes', 16)
+    monkeypatch.setattr(settings, 'max_audio_bytes', 16)
+    monkeypatch.setattr(settings, 'batch_max_items', 1)
+    monkeypatch.setattr(generation, 'stream_form_uploads', unexpected)
+    monkeypatch.setattr(jobs, 'stream_form_uploads', unexpected)
+    client = TestClient(app)
+    field = 'sketches' if path.endswith('batch') else 'sketch'
+    files = {field: ('sketch.png', io.BytesIO(b'x' * (3 << 20)), 'image/png')}
+    response = client.post(path, files=files)
+    assert response.status_code == 413
+
+    # 未声明 Content-Length 的分块上传在读取过程中计数，超限即中止。
+    def chunks():
+        boundary = b'--limit\r\nContent-Disposition: form-data; name="sketch"; filename="a.png"\r\n\r\n'
+        yield boundary
+        for _ in range(3):
+            yield b'x' * (1 << 20)
+
+    headers = {'content-type': 'multipart/form-data; boundary=limit'}
+    response = client.post(path, content=chunks(), headers=headers)
+    assert response.status_code == 413
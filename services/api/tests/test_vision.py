@@ -0,0 +1,110 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services import pipeline, vision
+
+
+def _sketch(width=1600, height=1200):
+    image = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(image)
+    scale = width / 800
+
+    def box(x0, y0, x1, y1):
+        draw.rectangle([x0 * scale, y0 * scale, x1 * scale, y1 * scale], outline=30, width=int(3 * scale))
+
+    def scribble(x0, y0, x1):
+        draw.line([x0 * scale, y0 * scale, x1 * scale, y0 * scale], fill=40, width=int(4 * scale))
+
+    box(40, 40, 760, 300)
+    scribble(80, 90, 400)
+    box(300, 200, 500, 260)
+    scribble(340, 230, 460)
+    for index in range(3):
+        left = 40 + index * 245
+        box(left, 340, left + 225, 560)
+        scribble(left + 20, 380, left + 140)
+    for x, y in np.random.default_rng(0).integers(0, (width, height), size=(300, 2)):
+        draw.point((int(x), int(y)), fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_detect_layout_groups_boxes_into_rows_with_bounds():
+    tree = vision.detect_layout(_sketch())
+    assert tree is not None
+    assert (tree.bounds.width, tree.bounds.height) == (1600, 1200)
+    hero, row = tree.children
+    assert hero.id == "hero"
+    assert [child.type for child in hero.children] == ["button"]
+    assert row.type == "row" and row.layout["direction"] == "row"
+    assert [child.type for child in row.children] == ["card", "card", "card"]
+    xs = [child.bounds.x for child in row.children]
+    assert xs == sorted(xs)
+    card = row.children[0].bounds
+    # 框线位于 (80, 680)-(530, 1120)，允许笔画宽度与缩放带来的误差。
+    assert abs(card.x - 80) < 12 and abs(card.y - 680) < 12
+    assert abs(card.width - 450) < 24 and abs(card.height - 440) < 24
+
+
+def test_tiling_does_not_change_runs_or_components():
+    gray, _ = vision.load_grayscale(_sketch(800, 600))
+    small = vision.find_runs(gray, tile_rows=7)
+    large = vision.find_runs(gray, tile_rows=10_000)
+    for left, right in zip(small, large):
+        np.testing.assert_array_equal(left, right)
+
+
+def test_label_runs_uses_eight_connectivity():
+    mask = np.array(
+        [
+            [1, 0, 0, 1, 0],
+            [0, 1, 0, 1, 0],
+            [0, 0, 1, 1, 0],
+            [0, 0, 0, 0, 0],
+            [1, 1, 0, 0, 1],
+        ],
+        dtype=bool,
+    )
+    edges = np.diff(mask.astype(np.int8), axis=1, prepend=0, append=0)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    labels = vision.label_runs(rows, starts, ends, mask.shape[1])
+    # 对角线与右侧竖线在第 3 行汇合成一个连通域，底部两段各自独立。
+    assert len(set(labels.tolist())) == 3
+    assert len(set(labels[:5].tolist())) == 1
+
+
+def test_otsu_threshold_splits_bimodal_histogram():
+    histogram = np.zeros(256, dtype=np.int64)
+    histogram[30] = 100
+    histogram[240] = 900
+    assert 30 < vision.otsu_threshold(histogram) <= 240
+
+
+def test_parse_sketch_falls_back_for_undecodable_input():
+    assert vision.detect_layout(b"not an image") is None
+    assert pipeline.parse_sketch(b"not an image").children[0].id == "hero"
+    blank = io.BytesIO()
+    Image.new("L", (64, 64), 255).save(blank, "PNG")
+    assert vision.detect_layout(blank.getvalue()) is None
+
+
+def test_detected_layout_supports_iteration():
+    project = pipeline.create_project(_sketch(), None, None)
+    assert project.ui_ir.layout_tree.children[0].bounds is not None
+    updated = pipeline.apply_iteration(project.project_id, "add button")
+    hero = updated.ui_ir.layout_tree.children[0]
+    assert len(hero.children) == 2
+    assert hero.children[0].bounds == project.ui_ir.layout_tree.children[0].children[0].bounds
+
+
+def test_bounds_survive_compact_and_builtin_round_trips():
+    from app.services.node_table import NodeTable
+    from app.services.serialization import layout_to_builtins
+
+    tree = vision.detect_layout(_sketch(800, 600))
+    assert NodeTable.from_layout(tree).to_layout() == tree
+    assert layout_to_builtins(tree) == tree.dict()
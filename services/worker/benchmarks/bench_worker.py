@@ -0,0 +1,140 @@
+"""InferenceWorker 的吞吐与延迟基准：按泊松到达提交任务，统计端到端 p50/p95/p99 与批大小分布。
+
+    cd services/worker
+    PYTHONPATH=src python benchmarks/bench_worker.py --tasks 2000 --rate 500 --output ../../.bench/worker.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from protoweaver_worker import InferenceWorker, MockTask
+from protoweaver_worker.worker import MODEL_TYPES
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    if not samples:
+        return math.nan
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+async def run(
+    tasks: int,
+    rate: float,
+    consumers: int,
+    max_batch_size: int,
+    max_wait_ms: float,
+    infer_ms: float,
+    per_item_ms: float,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    batch_sizes: Counter = Counter()
+    latencies: List[float] = []
+    submitted_at: Dict[str, float] = {}
+
+    async def handler(model: str, batch: List[MockTask]) -> List[Dict[str, Any]]:
+        # 固定开销 + 按条目线性增长的耗时，模拟 GPU 批量推理的成本结构。
+        batch_sizes[len(batch)] += 1
+        await asyncio.sleep((infer_ms + per_item_ms * len(batch)) / 1000)
+        return [{"taskId": task.id, "model": model} for task in batch]
+
+    async def callback(result: Dict[str, Any]) -> None:
+        latencies.append(time.perf_counter() - submitted_at[result["taskId"]])
+
+    worker = InferenceWorker(
+        max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, consumers=consumers, batch_handler=handler
+    )
+    runner = asyncio.create_task(worker.run())
+    start = time.perf_counter()
+    for index in range(tasks):
+        task_id = f"bench-{index}"
+        submitted_at[task_id] = time.perf_counter()
+        await worker.submit(
+            MockTask(id=task_id, payload={}, callback=callback, model=MODEL_TYPES[index % len(MODEL_TYPES)])
+        )
+        if rate > 0:
+            await asyncio.sleep(rng.expovariate(rate))
+    await worker.join()
+    wall_time = time.perf_counter() - start
+    await worker.shutdown()
+    await runner
+
+    return {
+        "benchmark": "worker",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {
+            "tasks": tasks,
+            "rate": rate,
+            "consumers": consumers,
+            "max_batch_size": max_batch_size,
+            "max_wait_ms": max_wait_ms,
+            "infer_ms": infer_ms,
+            "per_item_ms": per_item_ms,
+        },
+        "results": {
+            "completed": len(latencies),
+            "dead_letters": len(worker.dead_letters),
+            "wall_time_s": wall_time,
+            "throughput_tps": len(latencies) / wall_time if wall_time else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies, default=math.nan) * 1000,
+            "batch_sizes": {str(size): count for size, count in sorted(batch_sizes.items())},
+        },
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=500, help="每秒到达的任务数，0 表示一次性全部提交")
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--infer-ms", type=float, default=5, help="每批推理的固定耗时")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="批内每个任务增加的耗时")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON 结果路径，缺省输出到 stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(
+        run(
+            args.tasks,
+            args.rate,
+            args.consumers,
+            args.max_batch_size,
+            args.max_wait_ms,
+            args.infer_ms,
+            args.per_item_ms,
+            args.seed,
+        )
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
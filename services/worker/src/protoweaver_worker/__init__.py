@@ -3,6 +3,16 @@
 该 worker 负责模拟模型推理（CV、ASR、LLM 等），并提供简单的事件总线示例。
 """
 
-from .worker import InferenceWorker, MockTask
+from .resilience import CircuitBreaker, CircuitOpenError, CircuitState, RetryBudget
+from .worker import DeadLetter, InferenceWorker, MockTask, Priority
 
-__all__ = ["InferenceWorker", "MockTask"]
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "CircuitState",
+    "DeadLetter",
+    "InferenceWorker",
+    "MockTask",
+    "Priority",
+    "RetryBudget",
+]
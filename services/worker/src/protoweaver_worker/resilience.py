@@ -0,0 +1,128 @@
+"""推理后端的容错原语：熔断器、重试预算与带抖动的指数退避。"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from enum import Enum
+from typing import Callable
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求未发送到后端。"""
+
+
+class CircuitBreaker:
+    """单个后端的熔断器。
+
+    连续失败 `failure_threshold` 次后打开；`reset_timeout` 秒后进入半开状态，
+    放行最多 `half_open_max_calls` 个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        """距离熔断器允许探测请求还需等待的秒数。"""
+        if self.state is not CircuitState.OPEN:
+            return 0.0
+        return max(self.reset_timeout - (self._clock() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = CircuitState.OPEN
+            self._opened_at = self._clock()
+            self._failures = 0
+
+
+class RetryBudget:
+    """全局重试预算（令牌桶）。
+
+    每个首次请求存入 `ratio` 个令牌，每次重试消耗 1 个；另外每秒补充 `min_per_second` 个，
+    保证低流量时也能重试。令牌上限为 `max_tokens`，因此故障期间重试量最多为正常流量的 `ratio` 倍。
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        max_tokens: float = 50.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = max_tokens
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 10.0, rng: Callable[[], float] = random.random) -> float:
+    """第 `attempt` 次重试（从 1 开始）的等待时间，采用 full jitter 指数退避。"""
+    return rng() * min(cap, base * (2 ** (attempt - 1)))
@@ -1,84 +1,370 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import json
 import logging
-from dataclasses import dataclass
+import math
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Awaitable, Callable, Dict
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
 
-from tenacity import retry, stop_after_attempt, wait_fixed
+from .resilience import CircuitBreaker, CircuitOpenError, RetryBudget, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+# 与 API 侧 `/v1/jobs` 推送的阶段名保持一致。
+PIPELINE_STAGES = ("sketch_parsed", "transcript_ready", "ui_ir_fused", "code_generated")
+
+# 支持批量推理的模型类型。
+MODEL_TYPES = ("cv", "asr", "nlu")
+
+
+class Priority(IntEnum):
+    """任务优先级，数值越小越先处理。"""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
 
 @dataclass
 class MockTask:
-    """描述一个需要异步执行的推理任务。"""
+    """描述一个需要异步执行的推理任务。
+
+    `deadline` 为 `time.monotonic()` 时间戳，超过后任务在处理前被丢弃。
+    """
 
     id: str
     payload: Dict[str, Any]
     callback: Callable[[Dict[str, Any]], Awaitable[None]]
+    on_progress: Optional[Callable[[str], Awaitable[None]]] = None
+    model: str = "nlu"
+    priority: int = Priority.NORMAL
+    deadline: Optional[float] = None
+    attempts: int = 0
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.deadline is not None and (now if now is not None else time.monotonic()) >= self.deadline
+
+
+QueueEntry = Tuple[int, float, int, MockTask]
+
+
+@dataclass
+class DeadLetter:
+    """重试耗尽后进入死信队列的任务。"""
+
+    task: MockTask
+    error: str
+    attempts: int
+    failed_at: datetime = field(default_factory=datetime.utcnow)
+
+
+BatchHandler = Callable[[str, List[MockTask]], Awaitable[List[Dict[str, Any]]]]
 
 
 class InferenceWorker:
-    """极简事件循环 worker，模拟调度多模态推理。"""
+    """极简事件循环 worker，模拟调度多模态推理。
 
-    def __init__(self) -> None:
-        self.queue: "asyncio.Queue[MockTask]" = asyncio.Queue()
+    消费者每次最多攒 `max_batch_size` 个任务或等待 `max_wait_ms` 毫秒，
+    按 `MockTask.model` 分组后每组调用一次批量推理，再把结果分发给各任务的回调。
+    队列按 (priority, deadline) 排序；过期或已取消的任务在推理前被丢弃。
+
+    每种模型后端有独立的熔断器。失败的任务按带抖动的指数退避延迟后重新入队，
+    等待期间不占用消费者；重试受全局 `RetryBudget` 限制，超过 `max_attempts`
+    或预算耗尽的任务进入 `dead_letters`。
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        consumers: int = 1,
+        batch_handler: Optional[BatchHandler] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 5.0,
+        retry_budget: Optional[RetryBudget] = None,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+        dead_letter_size: int = 1000,
+    ) -> None:
+        self.queue: "asyncio.PriorityQueue[QueueEntry]" = asyncio.PriorityQueue()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.consumers = consumers
+        self.batch_handler = batch_handler or self.infer_batch
         self._running = False
+        self._consumer_tasks: List["asyncio.Task[None]"] = []
+        self._sequence = itertools.count()
+        self._queued: Set[str] = set()
+        self._cancelled: Set[str] = set()
+        self._inflight: Dict[str, "asyncio.Task[List[Dict[str, Any]]]"] = {}
+        self._inflight_groups: Dict[str, List[str]] = {}
+        self.dropped: Dict[str, int] = {"expired": 0, "cancelled": 0}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker_factory = breaker_factory
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.dead_letters: Deque[DeadLetter] = deque(maxlen=dead_letter_size)
+        self._retrying: Dict[str, asyncio.TimerHandle] = {}
+        self._retries_idle = asyncio.Event()
+        self._retries_idle.set()
+
+    def _enqueue(self, task: MockTask) -> None:
+        self._queued.add(task.id)
+        deadline = task.deadline if task.deadline is not None else math.inf
+        self.queue.put_nowait((int(task.priority), deadline, next(self._sequence), task))
 
     async def submit(self, task: MockTask) -> None:
-        logger.info("收到新任务 %s", task.id)
-        await self.queue.put(task)
-
-    async def _process(self, task: MockTask) -> None:
-        logger.debug("开始处理任务 %s", task.id)
-        await asyncio.sleep(0.2)
-        result = {
-            "taskId": task.id,
-            "finishedAt": datetime.utcnow().isoformat(),
-            "uiIR": {
-                "id": task.payload.get("project_id", "mock"),
-                "status": "processed",
-            },
-        }
-        await task.callback(result)
-
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def _safe_process(self, task: MockTask) -> None:
-        await self._process(task)
+        logger.info("收到新任务 %s（优先级 %s）", task.id, task.priority)
+        self.retry_budget.record_request()
+        self._enqueue(task)
 
-    async def run(self) -> None:
-        self._running = True
-        logger.info("Inference worker started")
+    async def join(self) -> None:
+        """等待队列清空且没有等待重试的任务。"""
+        while True:
+            await self.queue.join()
+            if not self._retrying:
+                return
+            await self._retries_idle.wait()
+
+    def cancel(self, task_id: str) -> bool:
+        """取消排队中或处理中的任务，返回任务是否存在。
+
+        排队中的任务在出队时丢弃；处理中的任务不再触发回调，若整批任务都被取消则直接中断推理。
+        """
+        if task_id in self._queued:
+            self._cancelled.add(task_id)
+            return True
+        handle = self._retrying.pop(task_id, None)
+        if handle is not None:
+            handle.cancel()
+            self.dropped["cancelled"] += 1
+            self._mark_retries_idle()
+            return True
+        inference = self._inflight.get(task_id)
+        if inference is None:
+            return False
+        self._cancelled.add(task_id)
+        if all(member in self._cancelled for member in self._inflight_groups[task_id]):
+            inference.cancel()
+        return True
+
+    def _admit(self, task: MockTask, now: float) -> bool:
+        """出队时检查任务是否仍需处理；被丢弃的任务在此处完成 `task_done`。"""
+        self._queued.discard(task.id)
+        if task.id in self._cancelled:
+            reason = "cancelled"
+            self._cancelled.discard(task.id)
+        elif task.expired(now):
+            reason = "expired"
+        else:
+            return True
+        self.dropped[reason] += 1
+        logger.info("丢弃任务 %s（%s）", task.id, reason)
+        self.queue.task_done()
+        return False
+
+    async def _collect_batch(self) -> List[MockTask]:
+        batch: List[MockTask] = []
+        loop = asyncio.get_running_loop()
+        while not batch:
+            *_, task = await self.queue.get()
+            if self._admit(task, time.monotonic()):
+                batch.append(task)
+        deadline = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            try:
+                *_, task = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    *_, task = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if self._admit(task, time.monotonic()):
+                batch.append(task)
+        return batch
+
+    async def infer_batch(self, model: str, tasks: List[MockTask]) -> List[Dict[str, Any]]:
+        """默认的批量推理实现：一次模拟推理覆盖整批任务。"""
+        logger.debug("开始批量处理 %s 任务 %d 个", model, len(tasks))
+        for stage in PIPELINE_STAGES:
+            await asyncio.sleep(0.05)
+            await asyncio.gather(*(task.on_progress(stage) for task in tasks if task.on_progress is not None))
+        finished_at = datetime.utcnow().isoformat()
+        return [
+            {
+                "taskId": task.id,
+                "model": model,
+                "batchSize": len(tasks),
+                "finishedAt": finished_at,
+                "uiIR": {
+                    "id": task.payload.get("project_id", "mock"),
+                    "status": "processed",
+                },
+            }
+            for task in tasks
+        ]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = self.breaker_factory()
+        return self.breakers[model]
+
+    async def _infer(self, model: str, tasks: List[MockTask]) -> List[Dict[str, Any]]:
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{model} 后端熔断中")
+        try:
+            results = await self.batch_handler(model, tasks)
+            if len(results) != len(tasks):
+                raise ValueError(f"批量推理返回 {len(results)} 个结果，期望 {len(tasks)} 个")
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return results
+
+    def _mark_retries_idle(self) -> None:
+        if not self._retrying:
+            self._retries_idle.set()
+
+    def _schedule_retry(self, task: MockTask, delay: float) -> None:
+        def requeue() -> None:
+            self._retrying.pop(task.id, None)
+            self._enqueue(task)
+            self._mark_retries_idle()
+
+        self._retries_idle.clear()
+        self._retrying[task.id] = asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _dead_letter(self, task: MockTask, error: str) -> None:
+        logger.warning("任务 %s 在 %d 次尝试后进入死信队列: %s", task.id, task.attempts, error)
+        self.dead_letters.append(DeadLetter(task=task, error=error, attempts=task.attempts))
+
+    def _handle_failure(self, model: str, tasks: List[MockTask], exc: Exception) -> None:
+        for task in tasks:
+            if task.id in self._cancelled:
+                self._cancelled.discard(task.id)
+                self.dropped["cancelled"] += 1
+                continue
+            if isinstance(exc, CircuitOpenError):
+                # 后端未被调用，不计入尝试次数也不消耗重试预算。熔断打开时等到允许探测；
+                # 半开时探测请求仍在进行，等一个完整的 reset_timeout 再试，加抖动避免同时涌入。
+                breaker = self.breaker(model)
+                wait = breaker.retry_after() or breaker.reset_timeout
+                self._schedule_retry(task, wait + backoff_delay(1, self.backoff_base, self.backoff_cap))
+                continue
+            task.attempts += 1
+            if task.attempts >= self.max_attempts:
+                self._dead_letter(task, repr(exc))
+            elif self.retry_budget.try_spend():
+                self._schedule_retry(task, backoff_delay(task.attempts, self.backoff_base, self.backoff_cap))
+            else:
+                self._dead_letter(task, f"retry budget exhausted: {exc!r}")
+
+    async def _process_group(self, model: str, tasks: List[MockTask]) -> None:
+        ids = [task.id for task in tasks]
+        inference = asyncio.ensure_future(self._infer(model, tasks))
+        for task_id in ids:
+            self._inflight[task_id] = inference
+            self._inflight_groups[task_id] = ids
+        try:
+            results = await inference
+        except asyncio.CancelledError:
+            if not all(task_id in self._cancelled for task_id in ids):
+                raise
+            self._cancelled.difference_update(ids)
+            self.dropped["cancelled"] += len(ids)
+            logger.info("%s 批次已全部取消（%s）", model, ", ".join(ids))
+            return
+        except Exception as exc:
+            logger.warning("%s 批次失败（%s）: %r", model, ", ".join(ids), exc)
+            self._handle_failure(model, tasks, exc)
+            return
+        finally:
+            for task_id in ids:
+                self._inflight.pop(task_id, None)
+                self._inflight_groups.pop(task_id, None)
+        delivered = []
+        for task, result in zip(tasks, results):
+            if task.id in self._cancelled:
+                self._cancelled.discard(task.id)
+                self.dropped["cancelled"] += 1
+                continue
+            delivered.append(task.callback(result))
+        await asyncio.gather(*delivered)
+
+    async def _process_batch(self, batch: List[MockTask]) -> None:
+        groups: Dict[str, List[MockTask]] = defaultdict(list)
+        now = time.monotonic()
+        for task in batch:
+            if task.expired(now):
+                # 攒批等待期间过期的任务同样不再推理。
+                self.dropped["expired"] += 1
+                continue
+            groups[task.model].append(task)
+        await asyncio.gather(*(self._process_group(model, tasks) for model, tasks in groups.items()))
+
+    async def _consume(self) -> None:
         while self._running:
-            task = await self.queue.get()
+            batch = await self._collect_batch()
             try:
-                await self._safe_process(task)
+                await self._process_batch(batch)
             except Exception as exc:  # pragma: no cover - logging branch
-                logger.exception("任务 %s 失败: %s", task.id, exc)
+                logger.exception("批次处理失败: %s", exc)
             finally:
-                self.queue.task_done()
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def run(self) -> None:
+        self._running = True
+        logger.info("Inference worker started with %d consumer(s)", self.consumers)
+        self._consumer_tasks = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+        try:
+            await asyncio.gather(*self._consumer_tasks)
+        except asyncio.CancelledError:
+            pass
 
     async def shutdown(self) -> None:
         self._running = False
+        for task in self._consumer_tasks:
+            task.cancel()
+        for handle in self._retrying.values():
+            handle.cancel()
+        self._retrying.clear()
+        self._mark_retries_idle()
         logger.info("Inference worker shutting down")
 
 
 async def main() -> None:  # pragma: no cover - demo entrypoint
     logging.basicConfig(level=logging.INFO)
-    worker = InferenceWorker()
+    worker = InferenceWorker(consumers=2)
 
     async def print_callback(result: Dict[str, Any]) -> None:
         logger.info("任务完成: %s", json.dumps(result, ensure_ascii=False))
 
     async def produce() -> None:
-        for index in range(3):
+        for index in range(6):
             await worker.submit(
-                MockTask(id=f"demo-{index}", payload={"project_id": f"demo-{index}"}, callback=print_callback)
+                MockTask(
+                    id=f"demo-{index}",
+                    payload={"project_id": f"demo-{index}"},
+                    callback=print_callback,
+                    model=MODEL_TYPES[index % len(MODEL_TYPES)],
+                    priority=Priority.INTERACTIVE if index == 5 else Priority.BULK,
+                )
             )
-        await worker.queue.join()
+        await worker.join()
         await worker.shutdown()
 
     await asyncio.gather(worker.run(), produce())
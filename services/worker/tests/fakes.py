@@ -0,0 +1,90 @@
+"""测试用的假后端、假时钟与任务工厂。"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from protoweaver_worker import InferenceWorker, MockTask
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class BackendError(RuntimeError):
+    pass
+
+
+class FakeBackend:
+    """记录每次批量调用的 `batch_handler`。
+
+    `fail(call_index)` 为真时该次调用抛出 `BackendError`；设置 `gate` 后调用会阻塞到 `release()`。
+    """
+
+    def __init__(self, fail: Callable[[int], bool] = lambda call: False, gated: bool = False) -> None:
+        self.calls: List[Tuple[str, List[str]]] = []
+        self.fail = fail
+        self.gated = gated
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+        self._gate: Optional[asyncio.Event] = None
+
+    @property
+    def gate(self) -> asyncio.Event:
+        if self._gate is None:
+            self._gate = asyncio.Event()
+        return self._gate
+
+    def release(self) -> None:
+        self.gate.set()
+
+    async def wait_active(self, count: int) -> None:
+        while self.active < count:
+            await asyncio.sleep(0)
+
+    async def __call__(self, model: str, tasks: List[MockTask]) -> List[Dict[str, Any]]:
+        call = len(self.calls)
+        self.calls.append((model, [task.id for task in tasks]))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.gated:
+                await self.gate.wait()
+            else:
+                await asyncio.sleep(0)
+            if self.fail(call):
+                raise BackendError(f"call {call} failed")
+            return [{"taskId": task.id, "model": model, "batchSize": len(tasks)} for task in tasks]
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+def make_task(task_id: str, results: Dict[str, Dict[str, Any]], **kwargs: Any) -> MockTask:
+    """回调结果写入 `results[task_id]` 的任务。"""
+
+    async def callback(result: Dict[str, Any]) -> None:
+        results[task_id] = result
+
+    return MockTask(id=task_id, payload={"project_id": task_id}, callback=callback, **kwargs)
+
+
+async def drain(worker: InferenceWorker, tasks: List[MockTask]) -> None:
+    """提交全部任务后启动 worker，等待处理完毕并关闭。任务先入队，首批的组成不受调度时机影响。"""
+    for task in tasks:
+        await worker.submit(task)
+    runner = asyncio.ensure_future(worker.run())
+    await worker.join()
+    await worker.shutdown()
+    await runner
@@ -0,0 +1,92 @@
+import asyncio
+
+from fakes import FakeBackend, drain, make_task
+from protoweaver_worker import InferenceWorker
+
+
+def test_tasks_are_micro_batched_up_to_max_batch_size():
+    backend = FakeBackend()
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=2, max_wait_ms=50, batch_handler=backend)
+        await drain(worker, [make_task(f"t{index}", results) for index in range(5)])
+
+    asyncio.run(scenario())
+    assert backend.calls == [("nlu", ["t0", "t1"]), ("nlu", ["t2", "t3"]), ("nlu", ["t4"])]
+    assert sorted(results) == ["t0", "t1", "t2", "t3", "t4"]
+    assert results["t2"]["batchSize"] == 2 and results["t4"]["batchSize"] == 1
+
+
+def test_batch_is_split_into_one_call_per_model():
+    backend = FakeBackend()
+    results = {}
+    models = ["cv", "asr", "cv", "nlu", "asr", "cv"]
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=50, batch_handler=backend)
+        await drain(worker, [make_task(f"t{index}", results, model=model) for index, model in enumerate(models)])
+
+    asyncio.run(scenario())
+    assert sorted(backend.calls) == [("asr", ["t1", "t4"]), ("cv", ["t0", "t2", "t5"]), ("nlu", ["t3"])]
+    assert {task_id: result["model"] for task_id, result in results.items()} == {
+        f"t{index}": model for index, model in enumerate(models)
+    }
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    backend = FakeBackend()
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=10, batch_handler=backend)
+        runner = asyncio.ensure_future(worker.run())
+        await worker.submit(make_task("early", results))
+        # 远超 max_wait_ms，第一批只包含 early。
+        await asyncio.sleep(0.2)
+        assert backend.calls == [("nlu", ["early"])] and "early" in results
+        await worker.submit(make_task("late", results))
+        await worker.join()
+        await worker.shutdown()
+        await runner
+
+    asyncio.run(scenario())
+    assert backend.calls == [("nlu", ["early"]), ("nlu", ["late"])]
+
+
+def test_consumers_run_batches_concurrently():
+    backend = FakeBackend(gated=True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=1, max_wait_ms=0, consumers=3, batch_handler=backend)
+        for index in range(4):
+            await worker.submit(make_task(f"t{index}", results))
+        runner = asyncio.ensure_future(worker.run())
+        await asyncio.wait_for(backend.wait_active(3), 1)
+        assert not results
+        backend.release()
+        await worker.join()
+        await worker.shutdown()
+        await runner
+
+    asyncio.run(scenario())
+    assert backend.peak == 3
+    assert len(backend.calls) == 4 and sorted(results) == ["t0", "t1", "t2", "t3"]
+
+
+def test_result_count_mismatch_fails_the_batch():
+    results = {}
+
+    async def short_handler(model, tasks):
+        return [{"taskId": tasks[0].id}]
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=2, max_wait_ms=50, batch_handler=short_handler, max_attempts=1)
+        await drain(worker, [make_task("a", results), make_task("b", results)])
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert not results
+    assert [(letter.task.id, letter.attempts) for letter in worker.dead_letters] == [("a", 1), ("b", 1)]
+    assert "ValueError" in worker.dead_letters[0].error
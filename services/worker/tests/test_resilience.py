@@ -0,0 +1,123 @@
+import asyncio
+
+from fakes import FakeBackend, FakeClock, drain, make_task
+from protoweaver_worker import CircuitBreaker, CircuitState, InferenceWorker, RetryBudget
+from protoweaver_worker.resilience import backoff_delay
+
+
+def test_circuit_breaker_transitions():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN and not breaker.allow()
+    clock.advance(4)
+    assert breaker.retry_after() == 6
+
+    clock.advance(6)
+    assert breaker.state is CircuitState.HALF_OPEN and breaker.retry_after() == 0
+    assert breaker.allow() and not breaker.allow()  # 只放行一个探测请求
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN and breaker.retry_after() == 10
+
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED and breaker.allow()
+
+
+def test_retry_budget_refills_from_requests_and_time():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.5, min_per_second=0.1, max_tokens=2, clock=clock)
+    assert budget.try_spend() and budget.try_spend() and not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend() and not budget.try_spend()
+    clock.advance(10)
+    assert budget.tokens == 1
+    clock.advance(100)
+    assert budget.tokens == 2
+
+
+def test_backoff_is_exponential_with_cap():
+    assert [backoff_delay(attempt, 0.1, 1.0, rng=lambda: 1.0) for attempt in (1, 2, 3, 4, 5)] == [
+        0.1,
+        0.2,
+        0.4,
+        0.8,
+        1.0,
+    ]
+    assert backoff_delay(3, 0.1, 1.0, rng=lambda: 0.5) == 0.2
+
+
+def test_failed_task_is_retried_until_success():
+    backend = FakeBackend(fail=lambda call: call < 2)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_attempts=3, backoff_base=0.001, batch_handler=backend)
+        task = make_task("a", results)
+        await drain(worker, [task])
+        return worker, task
+
+    worker, task = asyncio.run(scenario())
+    assert len(backend.calls) == 3 and "a" in results
+    assert task.attempts == 2 and not worker.dead_letters
+
+
+def test_exhausted_attempts_go_to_dead_letter_queue():
+    backend = FakeBackend(fail=lambda call: True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_attempts=3, backoff_base=0.001, batch_handler=backend)
+        await drain(worker, [make_task("a", results)])
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert len(backend.calls) == 3 and not results
+    (letter,) = worker.dead_letters
+    assert letter.task.id == "a" and letter.attempts == 3 and "BackendError" in letter.error
+
+
+def test_exhausted_retry_budget_dead_letters_immediately():
+    backend = FakeBackend(fail=lambda call: True)
+    results = {}
+
+    async def scenario():
+        budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=0)
+        worker = InferenceWorker(max_attempts=5, backoff_base=0.001, retry_budget=budget, batch_handler=backend)
+        await drain(worker, [make_task("a", results)])
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert len(backend.calls) == 1
+    (letter,) = worker.dead_letters
+    assert letter.attempts == 1 and letter.error.startswith("retry budget exhausted")
+
+
+def test_circuit_open_rejections_do_not_consume_attempts():
+    backend = FakeBackend(fail=lambda call: True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(
+            max_batch_size=1,
+            max_wait_ms=0,
+            max_attempts=3,
+            backoff_base=0.001,
+            backoff_cap=0.001,
+            retry_budget=RetryBudget(max_tokens=100),
+            breaker_factory=lambda: CircuitBreaker(failure_threshold=1, reset_timeout=0.01),
+            batch_handler=backend,
+        )
+        await asyncio.wait_for(drain(worker, [make_task(f"t{index}", results) for index in range(4)]), 5)
+        return worker
+
+    worker = asyncio.run(scenario())
+    # 每个任务都真正调用了后端 max_attempts 次才进入死信队列，熔断拒绝不计入尝试次数。
+    assert len(backend.calls) == 4 * 3
+    assert sorted(letter.task.id for letter in worker.dead_letters) == ["t0", "t1", "t2", "t3"]
+    assert all(letter.attempts == 3 and "BackendError" in letter.error for letter in worker.dead_letters)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from fakes import FakeBackend, drain, make_task
+from protoweaver_worker import InferenceWorker, Priority
+from protoweaver_worker import worker as worker_module
+
+
+def test_queue_orders_by_priority_then_deadline_then_submission():
+    backend = FakeBackend()
+    results = {}
+    now = time.monotonic()
+    tasks = [
+        make_task("bulk", results, priority=Priority.BULK),
+        make_task("normal-late", results, deadline=now + 100),
+        make_task("normal-none", results),
+        make_task("interactive", results, priority=Priority.INTERACTIVE),
+        make_task("normal-early", results, deadline=now + 50),
+        make_task("normal-none-2", results),
+    ]
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=1, max_wait_ms=0, batch_handler=backend)
+        await drain(worker, tasks)
+
+    asyncio.run(scenario())
+    assert [ids[0] for _, ids in backend.calls] == [
+        "interactive",
+        "normal-early",
+        "normal-late",
+        "normal-none",
+        "normal-none-2",
+        "bulk",
+    ]
+
+
+def test_expired_tasks_are_shed_before_inference():
+    backend = FakeBackend()
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=200, batch_handler=backend)
+        now = time.monotonic()
+        # stale 出队时已过期；short 在攒批等待的 200ms 内过期
+        await drain(
+            worker,
+            [
+                make_task("stale", results, deadline=now - 1),
+                make_task("short", results, deadline=now + 0.05),
+                make_task("fresh", results, deadline=now + 60),
+            ],
+        )
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert backend.calls == [("nlu", ["fresh"])]
+    assert list(results) == ["fresh"]
+    assert worker.dropped == {"expired": 2, "cancelled": 0}
+
+
+def test_cancel_queued_task():
+    backend = FakeBackend()
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=10, batch_handler=backend)
+        for task_id in ("keep", "drop"):
+            await worker.submit(make_task(task_id, results))
+        assert worker.cancel("drop")
+        assert not worker.cancel("unknown")
+        runner = asyncio.ensure_future(worker.run())
+        await worker.join()
+        await worker.shutdown()
+        await runner
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert backend.calls == [("nlu", ["keep"])] and list(results) == ["keep"]
+    assert worker.dropped["cancelled"] == 1
+
+
+def test_cancel_in_flight_task_suppresses_its_callback():
+    backend = FakeBackend(gated=True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=10, batch_handler=backend)
+        for task_id in ("a", "b"):
+            await worker.submit(make_task(task_id, results))
+        runner = asyncio.ensure_future(worker.run())
+        await asyncio.wait_for(backend.wait_active(1), 1)
+        assert worker.cancel("a")
+        backend.release()
+        await worker.join()
+        await worker.shutdown()
+        await runner
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert backend.calls == [("nlu", ["a", "b"])] and backend.cancelled == 0
+    assert list(results) == ["b"]
+    assert worker.dropped["cancelled"] == 1
+
+
+def test_cancelling_whole_batch_interrupts_inference():
+    backend = FakeBackend(gated=True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=8, max_wait_ms=10, batch_handler=backend)
+        for task_id in ("a", "b"):
+            await worker.submit(make_task(task_id, results))
+        runner = asyncio.ensure_future(worker.run())
+        await asyncio.wait_for(backend.wait_active(1), 1)
+        assert worker.cancel("a") and worker.cancel("b")
+        # 后端从未放行，join 能返回说明推理已被中断。
+        await asyncio.wait_for(worker.join(), 1)
+        await worker.shutdown()
+        await runner
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert backend.cancelled == 1 and not results
+    assert worker.dropped["cancelled"] == 2
+
+
+def test_cancel_task_waiting_for_retry(monkeypatch):
+    monkeypatch.setattr(worker_module, "backoff_delay", lambda attempt, base, cap: 30.0)
+    backend = FakeBackend(fail=lambda call: True)
+    results = {}
+
+    async def scenario():
+        worker = InferenceWorker(max_batch_size=1, max_wait_ms=0, batch_handler=backend)
+        await worker.submit(make_task("a", results))
+        runner = asyncio.ensure_future(worker.run())
+        await asyncio.wait_for(worker.queue.join(), 1)
+        assert worker.cancel("a")
+        await asyncio.wait_for(worker.join(), 1)
+        await worker.shutdown()
+        await runner
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert len(backend.calls) == 1 and not results and not worker.dead_letters
+    assert worker.dropped["cancelled"] == 1